@@ -1,28 +1,242 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
-import joblib
+# Imported eagerly (unlike the optional LLM and semantic-cache clients): the
+# forecast modules need them at module level and every forecast uses them
 import numpy as np
 import pandas as pd
 import os
 import traceback
+import hmac
 import json
-from .regressor_utils import generate_features_for_forecast
-from .chatbot_utils import call_qwen
+import time
+import tempfile
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from .regressor_utils import (
+    parse_history,
+    format_predictions,
+    format_ndjson,
+    format_columns,
+    forecast_batch,
+    forecast_batch_chunks,
+    forecast_chunks,
+    forecast_scenarios,
+)
+from .registry_utils import ModelRegistry
+from .cache_utils import cache_from_env
+from .forecast_cache_utils import forecast_cache_from_env
+from .history_store_utils import history_store_from_env, UnknownDriver
+from .aggregation_utils import SessionAggregator
+from .session_utils import sessions_from_env
+from .semantic_cache_utils import semantic_cache_from_env
+from .fallback_utils import (
+    WELLNESS_SCALE, breaker_from_env, invalid_wellness_levels, wellness_fallback, fin_tips_fallback,
+)
+from .chatbot_utils import call_qwen, stream_qwen, response_text, get_gateway, preload_clients
+from .startup_utils import StartupReport, warm_models
+from .gateway_utils import GatewayOverloaded
+from .metrics_utils import (
+    metrics,
+    stats_metric,
+    timed,
+    start_trace,
+    use_trace,
+    end_trace,
+    REQUEST_SECONDS,
+    REQUESTS_IN_FLIGHT,
+)
+from .structured_utils import (
+    StructuredSpec,
+    StructuredOutputError,
+    CircuitOpenError,
+    call_structured,
+    structured_stats,
+    structured_flights,
+    FIN_TIPS_SCHEMA,
+    WELLNESS_SCHEMA,
+    INVEST_SCHEMA,
+)
 
 from dotenv import load_dotenv
 load_dotenv()
 
-# Load pre-trained earnings_model
-MODEL_PATH = os.getenv("MODEL_PATH", "./app/earnings_model.pkl")
-try:
-    earnings_model = joblib.load(MODEL_PATH)
-except Exception as e:
-    raise RuntimeError(f"Failed to load earnings_model: {e}")
-MODEL_PATH = os.getenv("MODEL_PATH", "./app/hours_model.pkl")
-try:
-    hours_model = joblib.load(MODEL_PATH)
-except Exception as e:
-    raise RuntimeError(f"Failed to load hours_model: {e}")
+# Pre-trained models. Each model has its own path, which may point to a
+# single .pkl or to a directory of versioned artifacts (latest name wins).
+# create_app loads and warms them (see warm_up); scripts that only import the
+# package load them on their first snapshot.
+model_registry = ModelRegistry(
+    {
+        "earnings": os.getenv("EARNINGS_MODEL_PATH", "./app/earnings_model.pkl"),
+        "hours": os.getenv("HOURS_MODEL_PATH", "./app/hours_model.pkl"),
+    },
+    # Inference backend: "xgboost" (sklearn wrapper) or "native" (flat NumPy tree arrays
+    # for batches of up to 64 rows, the booster above that; lower latency on short
+    # windows at the cost of holding both in memory)
+    backend=os.getenv("INFERENCE_BACKEND", "xgboost"),
+    # Seconds between artifact change checks, 0 disables hot reload on file change
+    reload_interval=float(os.getenv("MODEL_RELOAD_INTERVAL", "0")),
+    # File through which /admin/models/reload reaches every gunicorn worker, "off" to disable
+    signal_path=None if os.getenv("MODEL_RELOAD_SIGNAL") == "off" else os.getenv(
+        "MODEL_RELOAD_SIGNAL", os.path.join(tempfile.gettempdir(), "fairleap-model-reload.json")
+    ),
+)
+
+# What start-up did in this process, served by /ready.
+# STARTUP_WARMUP=off skips the warm-up forecast and the eager SDK imports.
+startup = StartupReport()
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "on") != "off"
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Response cache for the deterministic /llm/fin_tips, /llm/invest and /llm/wellness prompts
+llm_cache = cache_from_env()
+
+# Responses and per-history feature state of /predict/earnings
+forecast_cache = forecast_cache_from_env()
+
+# Daily logs per driver, so forecast requests can send a driver_id instead of the whole history
+history_store = history_store_from_env()
+
+# Folds raw work sessions into the daily totals and keeps each driver's lag/rolling state
+session_aggregator = SessionAggregator(
+    history_store, max_drivers=int(os.getenv("HISTORY_STATE_MAX_DRIVERS", "10000"))
+) if history_store is not None else None
+
+# Server-side /llm/chatbot histories
+chat_sessions = sessions_from_env()
+
+# Answers to first-turn /llm/chatbot questions, matched by similarity to earlier questions
+semantic_cache = semantic_cache_from_env()
+
+# Schema, retry cap and latency budget of each structured LLM endpoint
+# (LLM_MAX_ATTEMPTS / LLM_DEADLINE_SECONDS). fin_tips and wellness have a
+# tighter SLO and a circuit breaker: past the deadline, or while the LLM keeps
+# failing, they answer from fallback_utils instead (LLM_FALLBACK=off to disable).
+FIN_TIPS_SPEC = StructuredSpec(
+    "fin_tips", FIN_TIPS_SCHEMA,
+    deadline=float(os.getenv("FIN_TIPS_DEADLINE_SECONDS", "8")), breaker=breaker_from_env("fin_tips"),
+)
+WELLNESS_SPEC = StructuredSpec(
+    "wellness", WELLNESS_SCHEMA,
+    deadline=float(os.getenv("WELLNESS_DEADLINE_SECONDS", "8")), breaker=breaker_from_env("wellness"),
+)
+LLM_FALLBACK = os.getenv("LLM_FALLBACK", "on") != "off"
+INVEST_SPEC = StructuredSpec("invest", INVEST_SCHEMA)
+
+# Opt-in Server-Timing header with per-stage durations: "request" (default) adds it
+# when the client sends `X-Timing: 1`, "always" to every response, "off" never
+TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "request")
+
+# Upper bound on scenarios x days scored by one /predict/earnings/scenarios request
+SCENARIO_MAX_ROWS = int(os.getenv("SCENARIO_MAX_ROWS", "100000"))
+
+# Streamed forecasts ("stream": "ndjson" | "columnar") are scored and written in
+# chunks: days per chunk of a single forecast, rows per chunk of a batch
+FORECAST_STREAM_FORMATS = {"ndjson": format_ndjson, "columnar": format_columns}
+FORECAST_STREAM_CHUNK_DAYS = int(os.getenv("FORECAST_STREAM_CHUNK_DAYS", "92"))
+FORECAST_STREAM_CHUNK_ROWS = int(os.getenv("FORECAST_STREAM_CHUNK_ROWS", "4096"))
+
+# Bounded pool running the forecast and LLM sections of /dashboard concurrently.
+# Threads start on first use, so workers forked after import each get their own.
+dashboard_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DASHBOARD_MAX_WORKERS", "16")), thread_name_prefix="dashboard"
+)
+
+# Seconds a /dashboard section may take before it is returned as "timeout"
+DASHBOARD_DEADLINES = {
+    "forecast": float(os.getenv("DASHBOARD_FORECAST_DEADLINE_SECONDS", "5")),
+    "wellness": float(os.getenv("DASHBOARD_LLM_DEADLINE_SECONDS", "30")),
+    "fin_tips": float(os.getenv("DASHBOARD_LLM_DEADLINE_SECONDS", "30")),
+    "invest": float(os.getenv("DASHBOARD_LLM_DEADLINE_SECONDS", "30")),
+}
+
+# A section that misses its deadline keeps running on the pool; at most this many
+# runs of each section may be queued or running, further dashboards report it "overloaded"
+# instead of stacking more work behind the stuck calls
+DASHBOARD_SECTION_LIMIT = int(os.getenv("DASHBOARD_SECTION_LIMIT", "4"))
+dashboard_slots = {name: threading.BoundedSemaphore(DASHBOARD_SECTION_LIMIT) for name in DASHBOARD_DEADLINES}
+
+
+def collect_stats():
+    """Export the counters the cache, structured-output and gateway modules already keep."""
+    cache = llm_cache.stats()
+    yield stats_metric("fairleap_llm_cache_hits_total", "counter", "LLM response cache hits", cache["hits"])
+    yield stats_metric("fairleap_llm_cache_misses_total", "counter", "LLM response cache misses", cache["misses"])
+    yield stats_metric("fairleap_llm_cache_entries", "gauge", "LLM response cache entries", cache["entries"])
+
+    endpoints = structured_stats.snapshot()
+    for field in ("requests", "llm_calls", "retries", "wasted_calls", "repaired", "coalesced", "failures",
+                  "budget_exhausted", "short_circuits", "fallbacks"):
+        yield stats_metric(
+            f"fairleap_structured_{field}_total", "counter", f"Structured LLM calls: {field} per endpoint",
+            {endpoint: counts[field] for endpoint, counts in endpoints.items()}, labelname="endpoint",
+        )
+
+    semantic = semantic_cache.stats()
+    yield stats_metric("fairleap_semantic_cache_hits_total", "counter", "Chatbot semantic cache hits", semantic["hits"])
+    yield stats_metric(
+        "fairleap_semantic_cache_misses_total", "counter", "Chatbot semantic cache misses", semantic["misses"]
+    )
+    yield stats_metric(
+        "fairleap_semantic_cache_evictions_total", "counter", "Chatbot answers evicted or expired",
+        semantic["evictions"] + semantic["expirations"],
+    )
+    yield stats_metric("fairleap_semantic_cache_entries", "gauge", "Chatbot semantic cache entries", semantic["entries"])
+
+    forecasts = forecast_cache.stats()
+    yield stats_metric("fairleap_forecast_cache_hits_total", "counter", "Forecast cache exact hits", forecasts["hits"])
+    yield stats_metric(
+        "fairleap_forecast_cache_prefix_hits_total", "counter",
+        "Forecasts that reused a parsed history prefix (every row is still scored)",
+        forecasts["prefix_hits"],
+    )
+    yield stats_metric("fairleap_forecast_cache_misses_total", "counter", "Forecasts computed from scratch", forecasts["misses"])
+    yield stats_metric("fairleap_forecast_cache_bytes", "gauge", "Approximate size of cached forecasts", forecasts["bytes"])
+
+    yield stats_metric(
+        "fairleap_structured_circuit_open", "gauge", "1 while an endpoint's LLM circuit breaker is open",
+        {spec.name: int(spec.breaker.stats()["state"] == "open") for spec in (FIN_TIPS_SPEC, WELLNESS_SPEC)},
+        labelname="endpoint",
+    )
+
+    flights = structured_flights.stats()
+    yield stats_metric("fairleap_llm_coalesced_in_flight", "gauge", "Distinct structured prompts in flight", flights["in_flight"])
+
+    gateway = get_gateway()
+    if gateway is not None:
+        stats = gateway.stats()
+        yield stats_metric("fairleap_llm_gateway_in_flight", "gauge", "Upstream LLM calls in flight", stats["in_flight"])
+        yield stats_metric(
+            "fairleap_llm_gateway_pending", "gauge", "LLM requests waiting or in flight",
+            stats["pending"], labelname="endpoint",
+        )
+        yield stats_metric(
+            "fairleap_llm_gateway_shed_total", "counter", "LLM requests shed with 429",
+            stats["shed"], labelname="endpoint",
+        )
+
+
+metrics.add_collector(collect_stats)
+
+
+def warm_up():
+    """
+    Load and warm what this configuration serves with, so the first request does
+    no one-time work. create_app runs it, which with `gunicorn --preload` happens in
+    the master: workers fork warm and share the models copy-on-write.
+    The LLM gateway is left to start on first use, because the event loop thread
+    it runs would not survive the fork.
+    """
+    with startup.phase("models"):
+        model_registry.ensure_loaded()
+    if STARTUP_WARMUP:
+        with startup.phase("warmup"):
+            models = model_registry.snapshot()
+            warm_models(models["earnings"], models["hours"])
+            semantic_cache.warm()
+            preload_clients()
+    startup.ready = True
 
 # Load historical data (update path if needed)
 # HISTORICAL_DATA_PATH = "./app/synthetic_driver_data.csv"
@@ -38,6 +252,47 @@ def create_app():
     app = Flask(__name__, static_folder='static')
     CORS(app, resources={r"/*": {"origins": "*"}})
 
+    @app.before_request
+    def start_request_metrics():
+        # Label by URL rule, not path, so ids in the URL do not create new series
+        g.metrics_route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        g.metrics_status = 500
+        g.metrics_trace = start_trace(g.metrics_route)
+        REQUESTS_IN_FLIGHT.inc(route=g.metrics_route)
+
+    @app.after_request
+    def add_timing_header(response):
+        g.metrics_status = response.status_code
+        trace = g.get("metrics_trace")
+        wanted = TIMING_HEADER == "always" or (TIMING_HEADER == "request" and request.headers.get("X-Timing") == "1")
+        if trace is not None and wanted:
+            # Streamed bodies are still being produced, so their header only covers setup
+            response.headers["Server-Timing"] = trace.server_timing()
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        # stream_with_context tears the request down twice: when the view returns and
+        # after the last event. Streamed replies are timed to the second one.
+        if g.pop("metrics_streaming", False):
+            return
+        trace = g.pop("metrics_trace", None)
+        if trace is None:
+            return
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - trace.started,
+            route=trace.route, method=request.method, status=g.get("metrics_status", 500),
+        )
+        REQUESTS_IN_FLIGHT.dec(route=trace.route)
+        end_trace()
+
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        """
+        Prometheus text exposition of request, stage, LLM and cache metrics (per worker process).
+        """
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
     @app.route("/", methods=["GET"])
     def root():
         # Dapatkan semua route rules (endpoint, methods, url)
@@ -57,12 +312,92 @@ def create_app():
             "message": "Healthcheck OK",
             "routes": routes
         })
+
+    @app.route("/ready", methods=["GET"])
+    def readiness():
+        """
+        Readiness probe, unlike the `/` liveness check: 200 once start-up has loaded
+        and warmed every model, 503 before. Reports the start-up phase durations.
+        """
+        models = model_registry.describe()
+        ready = startup.ready and len(models) == len(model_registry.paths)
+        return jsonify({
+            "status": "ready" if ready else "starting",
+            "startup": startup.describe(),
+            "models": models
+        }), 200 if ready else 503
         
+    def answer_with_fallback(spec, ask, fallback, *args):
+        """
+        Ask the LLM within `spec`'s deadline; when it fails, times out, is shed or
+        its circuit is open, answer from the local `fallback` instead. Returns the
+        response body fields, with "fallback" telling the client which one it got.
+        """
+        try:
+            return {"response": ask(*args), "fallback": False}
+        except (StructuredOutputError, GatewayOverloaded) as e:
+            if not LLM_FALLBACK:
+                raise
+            if isinstance(e, CircuitOpenError):
+                reason = "circuit_open"
+            elif isinstance(e, GatewayOverloaded):
+                reason = "overloaded"
+            else:
+                reason = "llm_unavailable"
+            app.logger.warning(f"{spec.name}: answering from fallback ({reason}): {str(e)}")
+            structured_stats.incr(spec.name, "fallbacks")
+            with timed("fallback"):
+                return {"response": fallback(*args), "fallback": True, "fallback_reason": reason}
+
+    def ask_fin_tips(pendapatan, pengeluaran, toleransi_risiko):
+        """Saving, investment and insurance tips for the driver's income, expenses and risk tolerance."""
+        # Bucket inputs so near-identical requests share a cached answer
+        inputs = llm_cache.normalize({
+            "pendapatan": pendapatan,
+            "pengeluaran": pengeluaran,
+            "toleransi_risiko": toleransi_risiko,
+        })
+        pendapatan, pengeluaran, toleransi_risiko = inputs["pendapatan"], inputs["pengeluaran"], inputs["toleransi_risiko"]
+
+        # Build system prompt
+        messages = [{
+            "role": "system",
+            "content": f"""You are a helpful assistant giving financial advice to Gojek drivers.
+            The driver has a monthly income of IDR {pendapatan}, spends IDR {pengeluaran} per month,
+            and has a '{toleransi_risiko}' risk tolerance.
+
+            Provide clear, structured advice on:
+            - 💰 Saving strategies (e.g., % of income to save, emergency fund)
+            - 📈 Investment options (based on risk profile)
+            - 🛡️ Recommended insurance types (health, accident, vehicle)
+
+            Answer in a clean format containing only this structure:
+            {{
+                "saving_strategies": <your_answer>,
+                "investment_strategies": <your_answer>,
+                "insurance_strategies": <your_answer>
+            }}              
+            """
+        }]
+
+        user_prompt = (
+            f"Saya ingin mendapatkan saran keuangan berdasarkan pendapatan dan pengeluaran saya. "
+            f"Pendapatan bulanan saya adalah Rp{pendapatan}, sedangkan pengeluaran bulanan saya Rp{pengeluaran}. "
+            f"Toleransi risiko saya adalah {toleransi_risiko}. Berikan saya strategi tabungan, rekomendasi investasi, "
+            f"dan jenis asuransi yang cocok untuk saya."
+        )
+        messages.append({"role": "user", "content": user_prompt})
+
+        # Call Qwen LLM, retrying malformed output within the endpoint's budget
+        with timed("structured"):
+            return call_structured(FIN_TIPS_SPEC, messages, cache=llm_cache)
+
     @app.route("/llm/fin_tips", methods=["POST"])
     def fin_tips_bot():
         """
         Endpoint to get financial advice based on income, expense, and risk tolerance.
-        Returns JSON-formatted investment and savings tips from Qwen LLM.
+        Returns JSON-formatted investment and savings tips from Qwen LLM, or templated
+        tips with "fallback": true when the LLM misses FIN_TIPS_DEADLINE_SECONDS.
         """
         try:
             data = request.get_json(force=True)
@@ -73,49 +408,23 @@ def create_app():
             if None in [pendapatan, pengeluaran, toleransi_risiko]:
                 return jsonify({"error": "Missing required fields: pendapatan, pengeluaran, toleransi_risiko"}), 400
 
-            # Build system prompt
-            messages = [{
-                "role": "system",
-                "content": f"""You are a helpful assistant giving financial advice to Gojek drivers.
-                The driver has a monthly income of IDR {pendapatan}, spends IDR {pengeluaran} per month,
-                and has a '{toleransi_risiko}' risk tolerance.
-
-                Provide clear, structured advice on:
-                - 💰 Saving strategies (e.g., % of income to save, emergency fund)
-                - 📈 Investment options (based on risk profile)
-                - 🛡️ Recommended insurance types (health, accident, vehicle)
-
-                Answer in a clean format containing only this structure:
-                {{
-                    "saving_strategies": <your_answer>,
-                    "investment_strategies": <your_answer>,
-                    "insurance_strategies": <your_answer>
-                }}              
-                """
-            }]
-
-            user_prompt = (
-                f"Saya ingin mendapatkan saran keuangan berdasarkan pendapatan dan pengeluaran saya. "
-                f"Pendapatan bulanan saya adalah Rp{pendapatan}, sedangkan pengeluaran bulanan saya Rp{pengeluaran}. "
-                f"Toleransi risiko saya adalah {toleransi_risiko}. Berikan saya strategi tabungan, rekomendasi investasi, "
-                f"dan jenis asuransi yang cocok untuk saya."
+            answer = answer_with_fallback(
+                FIN_TIPS_SPEC, ask_fin_tips, fin_tips_fallback, pendapatan, pengeluaran, toleransi_risiko
             )
-            messages.append({"role": "user", "content": user_prompt})
-
-            # Call Qwen LLM
-            assistant_output = call_qwen(messages).output.choices[0].message.content
-            print(f"fin_tips: {assistant_output}")
-
-            # Validate output format
-            while "}" not in assistant_output:
-                assistant_output = call_qwen(messages).output.choices[0].message.content
-                print(f"fin_tips: {assistant_output}")
+            print(f"fin_tips: {answer['response']}")
                 
             return jsonify({
                 "status": "success",
-                "response": json.loads(assistant_output.strip())
+                **answer
             })
 
+        except StructuredOutputError as e:
+            app.logger.error(f"Error in /llm/fin_tips: {str(e)}")
+            return jsonify({"error": str(e)}), 502
+
+        except GatewayOverloaded as e:
+            return overloaded_response(e)
+
         except Exception as e:
             tb_str = traceback.format_exc()
             print(f"init.py traceback: {tb_str}")
@@ -123,72 +432,146 @@ def create_app():
             return jsonify({"error": str(e)}), 500
 
 
+    def ask_wellness(energy_level, stress_level, sleep_quality, physical_condition):
+        """Rest, hydration and relaxation advice for the driver's wellness metrics."""
+        inputs = llm_cache.normalize({
+            "energy_level": energy_level,
+            "stress_level": stress_level,
+            "sleep_quality": sleep_quality,
+            "physical_condition": physical_condition,
+        })
+        energy_level, stress_level = inputs["energy_level"], inputs["stress_level"]
+        sleep_quality, physical_condition = inputs["sleep_quality"], inputs["physical_condition"]
+
+        # Build system prompt
+        messages = [{
+            "role": "system",
+            "content": f"""You are a helpful assistant giving wellness advice to Gojek drivers.
+            Consider the following wellness metrics:
+            - Energy Level: {energy_level}
+            - Stress Level: {stress_level}
+            - Sleep Quality: {sleep_quality}
+            - Physical Condition: {physical_condition}
+
+            Provide actionable recommendations in JSON format like this:
+            {{
+                "rest_advice": "Take a 10-minute break every 2 hours.",
+                "hydration_tip": "Drink water every 30 minutes while driving.",
+                "relaxation_techniques": ["deep breathing", "listen to music"],
+                "wellness_score": 70,
+                "general_wellness_status": "moderate"
+            }}
+
+            Only return the JSON, no extra text.
+            """
+        }]
+
+        user_prompt = (
+            f"Berdasarkan kondisi kesehatan saya: tingkat energi {energy_level}, stres {stress_level}, "
+            f"kualitas tidur {sleep_quality}, dan kondisi fisik {physical_condition}, berikan saran "
+            f"untuk istirahat, hidrasi, dan teknik relaksasi yang sesuai."
+        )
+        messages.append({"role": "user", "content": user_prompt})
+
+        # Call Qwen LLM, retrying malformed output within the endpoint's budget
+        with timed("structured"):
+            return call_structured(WELLNESS_SPEC, messages, cache=llm_cache)
+
     @app.route("/llm/wellness", methods=["POST"])
     def wellness_bot():
         """
         Endpoint to get wellness recommendations based on energy, stress, sleep, and physical condition.
-        Returns JSON-formatted tips from Qwen LLM.
+        Each is an integer on WELLNESS_SCALE (1-10); other values get a 400.
+        Returns JSON-formatted tips from Qwen LLM, or a locally computed score and
+        advice with "fallback": true when the LLM misses WELLNESS_DEADLINE_SECONDS.
         """
         try:
             data = request.get_json(force=True)
-            energy_level = int(data.get("energy_level"))  
-            stress_level = int(data.get("stress_level"))  
-            sleep_quality = int(data.get("sleep_quality"))  
-            physical_condition = int(data.get("physical_condition"))  
-
-            if None in [energy_level, stress_level, sleep_quality, physical_condition]:
+            try:
+                energy_level = int(data.get("energy_level"))
+                stress_level = int(data.get("stress_level"))
+                sleep_quality = int(data.get("sleep_quality"))
+                physical_condition = int(data.get("physical_condition"))
+            except (TypeError, ValueError):
                 return jsonify({"error": "Missing required wellness parameters"}), 400
 
-            # Build system prompt
-            messages = [{
-                "role": "system",
-                "content": f"""You are a helpful assistant giving wellness advice to Gojek drivers.
-                Consider the following wellness metrics:
-                - Energy Level: {energy_level}
-                - Stress Level: {stress_level}
-                - Sleep Quality: {sleep_quality}
-                - Physical Condition: {physical_condition}
-
-                Provide actionable recommendations in JSON format like this:
-                {{
-                    "rest_advice": "Take a 10-minute break every 2 hours.",
-                    "hydration_tip": "Drink water every 30 minutes while driving.",
-                    "relaxation_techniques": ["deep breathing", "listen to music"],
-                    "wellness_score": 70,
-                    "general_wellness_status": "moderate"
-                }}
-
-                Only return the JSON, no extra text.
-                """
-            }]
+            out_of_range = invalid_wellness_levels({
+                "energy_level": energy_level,
+                "stress_level": stress_level,
+                "sleep_quality": sleep_quality,
+                "physical_condition": physical_condition,
+            })
+            if out_of_range:
+                return jsonify({
+                    "error": f"Expected {WELLNESS_SCALE[0]}-{WELLNESS_SCALE[1]} for: {', '.join(out_of_range)}"
+                }), 400
 
-            user_prompt = (
-                f"Berdasarkan kondisi kesehatan saya: tingkat energi {energy_level}, stres {stress_level}, "
-                f"kualitas tidur {sleep_quality}, dan kondisi fisik {physical_condition}, berikan saran "
-                f"untuk istirahat, hidrasi, dan teknik relaksasi yang sesuai."
+            answer = answer_with_fallback(
+                WELLNESS_SPEC, ask_wellness, wellness_fallback,
+                energy_level, stress_level, sleep_quality, physical_condition,
             )
-            messages.append({"role": "user", "content": user_prompt})
-
-            # Call Qwen LLM
-            assistant_output = call_qwen(messages).output.choices[0].message.content
-            print(f"Wellness bot: {assistant_output}")
-
-            # Ensure valid JSON
-            while "}" not in assistant_output:
-                print(f"Wellness bot: {assistant_output}")
-                assistant_output = call_qwen(messages).output.choices[0].message.content
+            print(f"Wellness bot: {answer['response']}")
 
             return jsonify({
                 "status": "success",
-                "response": json.loads(assistant_output.strip())
+                **answer
             })
 
+        except StructuredOutputError as e:
+            app.logger.error(f"Error in /llm/wellness: {str(e)}")
+            return jsonify({"error": str(e)}), 502
+
+        except GatewayOverloaded as e:
+            return overloaded_response(e)
+
         except Exception as e:
             tb_str = traceback.format_exc()
             print(f"init.py traceback: {tb_str}")
             app.logger.error(f"Error in /llm/wellness: {str(e)}")
             return jsonify({"error": str(e)}), 500
         
+    def ask_invest(pendapatan, pengeluaran, toleransi_risiko):
+        """Minimum allocation per investment instrument for the driver's budget and risk tolerance."""
+        inputs = llm_cache.normalize({
+            "pendapatan": pendapatan,
+            "pengeluaran": pengeluaran,
+            "toleransi_risiko": toleransi_risiko,
+        })
+        pendapatan, pengeluaran, toleransi_risiko = inputs["pendapatan"], inputs["pengeluaran"], inputs["toleransi_risiko"]
+
+
+        messages = [{
+            "role": "system",
+            "content": f"""You are a helpful assistant supporting Gojek drivers with financial advice,
+            specifically on how to invest their money in these instruments: deposito (bank deposit investment), gold, and stock mutual funds.
+            the driver has a {toleransi_risiko} risk tolerance.
+            
+            return your answer in JSON format like this:
+            {{
+                "instrument_name_1" : {{
+                    "minimum_invest": "1000",
+                    "expected_return: "10%",
+                    "risk_category": "low"
+                }}
+                "instrument_name_2" : {{
+                    "minimum_invest": "2000",
+                    "expected_returns: "15%",
+                    "risk_category": "medium"
+                }},
+                ...
+            }}
+            
+            only answer with the JSON, do not say anything else
+            """
+        }]
+
+        # Add user input to message history
+        messages.append({"role": "user", "content": f"what is the minimum allocation of my money do you think I should invest in each instrument? If I spend {pengeluaran} IDR each month and my monthly income is {pendapatan} IDR"})
+
+        # Call Qwen, retrying malformed output within the endpoint's budget
+        with timed("structured"):
+            return call_structured(INVEST_SPEC, messages, cache=llm_cache)
+
     @app.route("/llm/invest", methods=["POST"])
     def investbot():
         try:
@@ -199,42 +582,8 @@ def create_app():
             pengeluaran = data.get("pengeluaran")
             # session_messages = data.get("messages", [])  # Allow multi-turn conversation
 
-
-            messages = [{
-                "role": "system",
-                "content": f"""You are a helpful assistant supporting Gojek drivers with financial advice,
-                specifically on how to invest their money in these instruments: deposito (bank deposit investment), gold, and stock mutual funds.
-                the driver has a {toleransi_risiko} risk tolerance.
-                
-                return your answer in JSON format like this:
-                {{
-                    "instrument_name_1" : {{
-                        "minimum_invest": "1000",
-                        "expected_return: "10%",
-                        "risk_category": "low"
-                    }}
-                    "instrument_name_2" : {{
-                        "minimum_invest": "2000",
-                        "expected_returns: "15%",
-                        "risk_category": "medium"
-                    }},
-                    ...
-                }}
-                
-                only answer with the JSON, do not say anything else
-                """
-            }]
-
-            # Add user input to message history
-            messages.append({"role": "user", "content": f"what is the minimum allocation of my money do you think I should invest in each instrument? If I spend {pengeluaran} IDR each month and my monthly income is {pendapatan} IDR"})
-
-            # Call Qwen with full message history
-            assistant_output = call_qwen(messages).output.choices[0].message.content
-            print(f"Investbot: {assistant_output}")
-            
-            while "}" not in assistant_output:
-                print(f"Investbot: {assistant_output}")
-                assistant_output = call_qwen(messages).output.choices[0].message.content
+            response = ask_invest(pendapatan, pengeluaran, toleransi_risiko)
+            print(f"Investbot: {response}")
 
             # Add assistant response to history
             # messages.append({"role": "assistant", "content": assistant_output})
@@ -242,64 +591,316 @@ def create_app():
 
             return jsonify({
                 "status": "success",
-                "response": json.loads(assistant_output.strip()),
+                "response": response,
             })
 
+        except StructuredOutputError as e:
+            app.logger.error(f"Error in /llm/invest: {str(e)}")
+            return jsonify({"error": str(e)}), 502
+
+        except GatewayOverloaded as e:
+            return overloaded_response(e)
+
         except Exception as e:
             tb_str = traceback.format_exc()
             print(f"init.py traceback: {tb_str}")
             app.logger.error(f"Error in /chatbot: {str(e)}")
             return jsonify({"error": str(e)}), 500
         
+    @app.route("/llm/cache/stats", methods=["GET"])
+    def llm_cache_stats():
+        """
+        Hit/miss counters of the LLM response cache and the chatbot semantic cache (per worker process).
+        """
+        return jsonify({
+            "status": "success",
+            "cache": llm_cache.stats(),
+            "semantic": semantic_cache.stats()
+        })
+
+    @app.route("/llm/structured/stats", methods=["GET"])
+    def llm_structured_stats():
+        """
+        Per-endpoint counters of structured LLM calls: retries, wasted calls,
+        repaired outputs, coalesced requests and budget exhaustion (per worker process).
+        """
+        return jsonify({
+            "status": "success",
+            "endpoints": structured_stats.snapshot(),
+            "coalescing": structured_flights.stats(),
+            "breakers": {spec.name: spec.breaker.stats() for spec in (FIN_TIPS_SPEC, WELLNESS_SPEC)}
+        })
+
+    def overloaded_response(e):
+        """Shed load with 429 and a Retry-After hint when an LLM queue is full."""
+        app.logger.warning(str(e))
+        return jsonify({"error": str(e)}), 429, {"Retry-After": str(e.retry_after)}
+
+    @app.route("/llm/gateway/stats", methods=["GET"])
+    def llm_gateway_stats():
+        """
+        Concurrency, queue depth and shed counts of the LLM gateway (per worker process).
+        """
+        gateway = get_gateway()
+        return jsonify({
+            "status": "success",
+            "gateway": gateway.stats() if gateway is not None else None
+        })
+
+    def sse_event(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    def chat_reply_body(user_input, assistant_output, session_messages, session=None):
+        """
+        Record the assistant reply and build the /llm/chatbot response body.
+        Client-side history gets the full `messages` back, a server-side session only its id.
+        """
+        body = {
+            "status": "success",
+            "query": user_input,
+            "response": assistant_output
+        }
+        if session is not None:
+            session_id, state = session
+            chat_sessions.add_reply(session_id, state, assistant_output)
+            body["session_id"] = session_id
+        else:
+            session_messages.append({"role": "assistant", "content": assistant_output})
+            body["messages"] = session_messages
+        return body
+
+    def stream_chat_response(user_input, session_messages, session=None, cached=None, remember=False):
+        """
+        Server-Sent Events for /llm/chatbot:
+        `token` events carry text deltas as they arrive, a final `done` event carries
+        the same body as the non-streaming response plus timings, `error` ends a failed stream.
+        A `cached` (answer, similarity) from the semantic cache is sent as a single token;
+        with `remember` the streamed answer is added to the semantic cache.
+        """
+        trace = g.get("metrics_trace")
+        g.metrics_streaming = True
+        # Started before the response so a full LLM queue is answered with 429, not an error event
+        deltas = [cached[0]] if cached is not None else stream_qwen(session_messages)
+
+        def generate():
+            # The body may be produced outside the handler's context; keep its stages on this request
+            use_trace(trace)
+            started = time.perf_counter()
+            ttft_ms = None
+            parts = []
+            try:
+                for delta in deltas:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000
+                    parts.append(delta)
+                    yield sse_event("token", {"delta": delta})
+
+                body = chat_reply_body(user_input, "".join(parts), session_messages, session)
+                if cached is not None:
+                    body.update({"cached": True, "similarity": cached[1]})
+                elif remember and parts:
+                    semantic_cache.set(user_input, "".join(parts))
+                total_ms = (time.perf_counter() - started) * 1000
+                app.logger.info(f"/llm/chatbot stream: ttft={ttft_ms}ms total={total_ms:.1f}ms")
+                body.update({"ttft_ms": ttft_ms, "total_ms": total_ms})
+                yield sse_event("done", body)
+
+            except Exception as e:
+                tb_str = traceback.format_exc()
+                print(f"init.py traceback: {tb_str}")
+                app.logger.error(f"Error in /chatbot stream: {str(e)}")
+                yield sse_event("error", {"error": str(e)})
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
     @app.route("/llm/chatbot", methods=["POST"])
     def chatbot():
+        """
+        Multi-turn chat. Two ways to keep the history:
+        - client-side: send {"query": ..., "messages": [...]} and get the updated `messages` back
+        - server-side: send {"query": ..., "session_id": <id or null>} and get the `session_id`
+          back; the server keeps the history under a token budget
+        With "stream": true the reply is sent as Server-Sent Events (see stream_chat_response).
+        """
         try:
             print(request)
             data = request.get_json(force=True)
             user_input = data.get("query")
-            session_messages = data.get("messages", [])  # Allow multi-turn conversation
 
             if not user_input or not isinstance(user_input, str):
                 return jsonify({"error": "Invalid or missing 'query' field"}), 400
 
-            # Initialize system message if none exists
-            if not session_messages:
-                session_messages = [{
-                    "role": "system",
-                    "content": """You are a helpful assistant supporting Gojek drivers with welfare and well-being.
-                    I can help with:
-                    - Insurance inquiries
-                    - Fatigue prevention tips
-                    - Financial literacy resources
-                    - Traffic updates
-                    - Weather driving safety
-                    
-                    Ask me anything related to these topics."""
-                }]
+            system_message = {
+                "role": "system",
+                "content": """You are a helpful assistant supporting Gojek drivers with welfare and well-being.
+                I can help with:
+                - Insurance inquiries
+                - Fatigue prevention tips
+                - Financial literacy resources
+                - Traffic updates
+                - Weather driving safety
+                
+                Ask me anything related to these topics."""
+            }
+
+            session = None
+            if "session_id" in data:
+                # Server-side history, compacted to the token budget
+                session_id, state = chat_sessions.load(data.get("session_id"))
+                session_messages = chat_sessions.add_user_turn(state, system_message, user_input)
+                session = (session_id, state)
+            else:
+                session_messages = data.get("messages", [])  # Allow multi-turn conversation
+
+                # Initialize system message if none exists
+                if not session_messages:
+                    session_messages = [system_message]
+
+                # Add user input to message history
+                session_messages.append({"role": "user", "content": user_input})
 
-            # Add user input to message history
-            session_messages.append({"role": "user", "content": user_input})
+            # A first question under the stock system prompt may be a paraphrase of an
+            # earlier one; answer it from the semantic cache instead of the LLM
+            first_turn = session_messages[:-1] == [system_message]
+            cached = semantic_cache.get(user_input) if first_turn else None
+
+            if data.get("stream"):
+                return stream_chat_response(user_input, session_messages, session, cached, remember=first_turn)
+
+            if cached is not None:
+                body = chat_reply_body(user_input, cached[0], session_messages, session)
+                body.update({"cached": True, "similarity": cached[1]})
+                return jsonify(body)
 
             # Call Qwen with full message history
-            assistant_output = call_qwen(session_messages).output.choices[0].message.content
+            assistant_output = response_text(call_qwen(session_messages, endpoint="chatbot"))
+            if first_turn and assistant_output:
+                semantic_cache.set(user_input, assistant_output)
 
-            # Add assistant response to history
-            session_messages.append({"role": "assistant", "content": assistant_output})
+            return jsonify(chat_reply_body(user_input, assistant_output, session_messages, session))
 
-            return jsonify({
-                "status": "success",
-                "query": user_input,
-                "response": assistant_output,
-                "messages": session_messages
-            })
+        except GatewayOverloaded as e:
+            return overloaded_response(e)
 
         except Exception as e:
             tb_str = traceback.format_exc()
             print(f"init.py traceback: {tb_str}")
             app.logger.error(f"Error in /chatbot: {str(e)}")
             return jsonify({"error": str(e)}), 500
+
+    @app.route("/predict/cache/stats", methods=["GET"])
+    def forecast_cache_stats():
+        """
+        Hit/miss and row reuse counters of the forecast cache (per worker process).
+        """
+        return jsonify({
+            "status": "success",
+            "cache": forecast_cache.stats()
+        })
+
+    @app.route("/llm/chatbot/session/<session_id>", methods=["DELETE"])
+    def end_chat_session(session_id):
+        """
+        Forget a server-side chat session.
+        """
+        chat_sessions.delete(session_id)
+        return jsonify({"status": "success", "session_id": session_id})
         
 
+    def forecast_earnings(start, end, wellness_score, hist_json, mode, driver_id=None):
+        """The `predictions` of /predict/earnings for validated inputs. Raises UnknownDriver."""
+        models, versions = model_registry.versioned_snapshot()
+
+        # Static mode generates features for the period and scores them; recursive mode
+        # feeds each predicted day back into the lag/rolling window. Repeated and
+        # appended-history requests reuse earlier work through the forecast cache.
+        if hist_json is None and driver_id is not None:
+            # Read only the stored days the features need
+            with timed("history"):
+                hist_days, hist_earnings, rolling = session_aggregator.history(driver_id, start, end)
+            return forecast_cache.forecast_history(
+                hist_days, hist_earnings, start, end, wellness_score, mode, models, versions, rolling
+            )
+        return forecast_cache.forecast(hist_json, start, end, wellness_score, mode, models, versions)
+
+    def stream_format(data):
+        """The streaming encoding a forecast request asks for, None for a plain JSON reply."""
+        fmt = data.get("stream")
+        if not fmt:
+            return None
+        if fmt is True:
+            return "ndjson"
+        if fmt not in FORECAST_STREAM_FORMATS:
+            raise ValueError(f"Invalid stream format, expected one of: {', '.join(FORECAST_STREAM_FORMATS)}")
+        return fmt
+
+    def forecast_earnings_chunks(start, end, wellness_score, hist_json, mode, driver_id=None):
+        """
+        forecast_earnings as a generator of single-piece chunks of FORECAST_STREAM_CHUNK_DAYS
+        days, for stream_forecast. Streamed forecasts bypass the forecast cache.
+        Raises UnknownDriver before the first chunk.
+        """
+        models = model_registry.snapshot()
+        rolling = None
+        if hist_json is None and driver_id is not None:
+            with timed("history"):
+                hist_days, hist_earnings, rolling = session_aggregator.history(driver_id, start, end)
+        else:
+            hist_days, hist_earnings = parse_history(hist_json or [])
+        chunks = forecast_chunks(
+            hist_days, hist_earnings, start, end, wellness_score, mode,
+            models["earnings"], models["hours"], FORECAST_STREAM_CHUNK_DAYS, rolling,
+        )
+        return ([(None, X_pred)] for X_pred in chunks)
+
+    def stream_forecast(chunks, fmt, route):
+        """
+        application/x-ndjson response written while the forecast is computed.
+        `chunks` yields lists of (driver_id, scored frame) pieces; each chunk is scored
+        only when the previous one has been sent, so memory stays flat with the window
+        length and driver count. Pieces are written as one line per day ("ndjson") or
+        one line of per-field lists ("columnar"). A last line carries the status, the
+        row count and the time to first row, or the error that cut the stream short.
+        """
+        trace = g.get("metrics_trace")
+        g.metrics_streaming = True
+        encode = FORECAST_STREAM_FORMATS[fmt]
+
+        def generate():
+            # The body is produced after the handler returns; keep its stages on this request
+            use_trace(trace)
+            started = time.perf_counter()
+            ttfr_ms = None
+            rows = 0
+            try:
+                for pieces in chunks:
+                    lines = "".join(encode(X_pred, driver_id) for driver_id, X_pred in pieces)
+                    if ttfr_ms is None:
+                        ttfr_ms = (time.perf_counter() - started) * 1000
+                    rows += sum(len(X_pred) for _, X_pred in pieces)
+                    yield lines
+                total_ms = (time.perf_counter() - started) * 1000
+                app.logger.info(f"{route} stream: rows={rows} ttfr={ttfr_ms}ms total={total_ms:.1f}ms")
+                yield json.dumps({
+                    "status": "success", "currency": "IDR", "rows": rows, "ttfr_ms": ttfr_ms, "total_ms": total_ms
+                }) + "\n"
+
+            except Exception as e:
+                tb_str = traceback.format_exc()
+                print(f"init.py traceback: {tb_str}")
+                app.logger.error(f"Error in {route} stream: {str(e)}")
+                yield json.dumps({"status": "error", "error": str(e)}) + "\n"
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
     @app.route("/predict/earnings", methods=["POST"])
     def predict_earnings():
         """
@@ -308,7 +909,8 @@ def create_app():
         {
         "start": "2025-05-13",
         "end": "2025-05-20",
-        "wellness_score": "20"
+        "wellness_score": "20",
+        "mode": "static" | "recursive",  (optional, default "static")
         "daily_logs": [{
                     day: '2025-05-24',
                     total_distance,
@@ -318,43 +920,551 @@ def create_app():
                     total_trips
                 }]
         }
+        Instead of daily_logs the backend may send "driver_id" to forecast from the
+        logs ingested through /history/logs, which requires the X-Admin-Token header.
+        With "stream": "ndjson" (or true) | "columnar" the predictions are streamed as
+        they are scored, FORECAST_STREAM_CHUNK_DAYS days at a time (see stream_forecast).
         """
         try:
-            data = request.get_json(force=True)
-            start = pd.to_datetime(data.get("start"))
-            end = pd.to_datetime(data.get("end"))
-            wellness_score = int(data.get("wellness_score"))
-            hist_json = data.get("daily_logs")
-            
-            # driver_id = data.get("driver_id")
+            with timed("parse"):
+                data = request.get_json(force=True)
+                start = pd.to_datetime(data.get("start"))
+                end = pd.to_datetime(data.get("end"))
+                wellness_score = int(data.get("wellness_score"))
+                hist_json = data.get("daily_logs")
+                mode = data.get("mode", "static")
+            driver_id = data.get("driver_id")
+            try:
+                fmt = stream_format(data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
 
             if not start or not end or start > end:
                 return jsonify({"error": "Invalid date range"}), 400
+            if mode not in ("static", "recursive"):
+                return jsonify({"error": "Invalid mode, expected 'static' or 'recursive'"}), 400
+            if hist_json is None and driver_id is not None and not admin_authorized():
+                return jsonify({"error": "Unauthorized"}), 403
+            if hist_json is None and driver_id is not None and history_store is None:
+                return jsonify({"error": "History store is disabled, send daily_logs"}), 400
 
-            # Generate features for the requested period
-            X_pred = generate_features_for_forecast(hist_json, start, end, wellness_score)
+            if fmt is not None:
+                chunks = forecast_earnings_chunks(start, end, wellness_score, hist_json, mode, driver_id)
+                return stream_forecast(chunks, fmt, "/predict/earnings")
 
-            # Make predictions
-            X_pred['earnings'] = np.abs(earnings_model.predict(X_pred[X_pred.columns.drop(['earnings'])]))
-            X_pred['predicted_hours_worked'] = np.abs(hours_model.predict(X_pred[X_pred.columns]))
-
-            # Format output
-            result = X_pred[['earnings', 'predicted_hours_worked']].reset_index()
-            result.rename(columns={'timestamp': 'date'}, inplace=True)
-            result['date'] = result['date'].dt.strftime('%Y-%m-%d')
+            predictions = forecast_earnings(start, end, wellness_score, hist_json, mode, driver_id)
 
             return jsonify({
                 "status": "success",
                 "currency": "IDR",
-                "predictions": result.to_dict(orient="records")
+                "predictions": predictions
             })
 
+        except UnknownDriver as e:
+            return jsonify({"error": str(e)}), 404
+
         except Exception as e:
             tb_str = traceback.format_exc()
             print(f"init.py traceback: {tb_str}")
             app.logger.error(f"Error in /chatbot: {str(e)}")
             return jsonify({"error": str(e)}), 500
 
+    @app.route("/predict/earnings/batch", methods=["POST"])
+    def predict_earnings_batch():
+        """
+        Predict future earnings for many drivers in one call.
+        Frontend sends:
+        {
+        "drivers": [{
+                driver_id: 'driver_1',
+                start: '2025-05-13',
+                end: '2025-05-20',
+                wellness_score: '20',
+                daily_logs: [...]
+            }]
+        }
+        Drivers sent without daily_logs are forecast from the history store, which
+        requires the X-Admin-Token header.
+        Predictions are returned keyed by driver_id.
+        With "stream": "ndjson" (or true) | "columnar" they are streamed instead, in chunks
+        of FORECAST_STREAM_CHUNK_ROWS days, each line carrying its driver_id.
+        """
+        try:
+            with timed("parse"):
+                data = request.get_json(force=True)
+            drivers_json = data.get("drivers")
+            try:
+                fmt = stream_format(data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+            if not isinstance(drivers_json, list) or not drivers_json:
+                return jsonify({"error": "Missing or empty 'drivers' list"}), 400
+
+            drivers = []
+            seen = set()
+            for item in drivers_json:
+                driver_id = item.get("driver_id")
+                if driver_id is None:
+                    return jsonify({"error": "Missing required field: driver_id"}), 400
+                driver_id = str(driver_id)
+                if driver_id in seen:
+                    return jsonify({"error": f"Duplicate driver_id: {driver_id}"}), 400
+                seen.add(driver_id)
+
+                start = pd.to_datetime(item.get("start"))
+                end = pd.to_datetime(item.get("end"))
+                if not start or not end or start > end:
+                    return jsonify({"error": f"Invalid date range for driver {driver_id}"}), 400
+
+                driver = {
+                    "driver_id": driver_id,
+                    "start": start,
+                    "end": end,
+                    "wellness_score": int(item.get("wellness_score")),
+                    "daily_logs": item.get("daily_logs"),
+                }
+                if driver["daily_logs"] is None and session_aggregator is not None:
+                    if not admin_authorized():
+                        return jsonify({"error": "Unauthorized"}), 403
+                    with timed("history"):
+                        driver["history"] = session_aggregator.history(driver_id, start, end)[:2]
+                drivers.append(driver)
+
+            models = model_registry.snapshot()
+            if fmt is not None:
+                chunks = forecast_batch_chunks(drivers, models["earnings"], models["hours"], FORECAST_STREAM_CHUNK_ROWS)
+                return stream_forecast(chunks, fmt, "/predict/earnings/batch")
+
+            # Stack every driver's features and run each model once
+            with timed("forecast_batch"):
+                results = forecast_batch(drivers, models["earnings"], models["hours"])
+
+            with timed("serialize"):
+                return jsonify({
+                    "status": "success",
+                    "currency": "IDR",
+                    "predictions": {
+                        driver_id: format_predictions(X_pred)
+                        for driver_id, X_pred in results.items()
+                    }
+                })
+
+        except UnknownDriver as e:
+            return jsonify({"error": str(e)}), 404
+
+        except Exception as e:
+            tb_str = traceback.format_exc()
+            print(f"init.py traceback: {tb_str}")
+            app.logger.error(f"Error in /predict/earnings/batch: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/predict/earnings/scenarios", methods=["POST"])
+    def predict_earnings_scenarios():
+        """
+        What-if forecasts of one driver across a grid of wellness scores, optionally
+        crossed with day_of_week (0-6) and is_weekend (0/1) overrides.
+        Frontend sends:
+        {
+        "start": "2025-05-13",
+        "end": "2025-05-20",
+        "wellness_scores": [0, 10, ..., 100],   (optional, default 0..100)
+        "day_of_week": [5, 6],                  (optional)
+        "is_weekend": [0, 1],                   (optional)
+        "daily_logs": [...] | "driver_id": "driver_1"   (driver_id requires the X-Admin-Token header)
+        }
+        Static mode only. The reply is columnar: `dates`, one array per grid axis in
+        `scenarios` (null where the calendar value is used) and `earnings` /
+        `predicted_hours_worked` as one row of per-date values per scenario.
+        """
+        try:
+            with timed("parse"):
+                data = request.get_json(force=True)
+                start = pd.to_datetime(data.get("start"))
+                end = pd.to_datetime(data.get("end"))
+                hist_json = data.get("daily_logs")
+            driver_id = data.get("driver_id")
+
+            if not start or not end or start > end:
+                return jsonify({"error": "Invalid date range"}), 400
+            if hist_json is None and driver_id is None:
+                return jsonify({"error": "Missing required field: daily_logs or driver_id"}), 400
+            if hist_json is None and not admin_authorized():
+                return jsonify({"error": "Unauthorized"}), 403
+            if hist_json is None and history_store is None:
+                return jsonify({"error": "History store is disabled, send daily_logs"}), 400
+
+            try:
+                wellness_scores = [int(v) for v in data.get("wellness_scores") or range(0, 101)]
+                days_of_week = [int(v) for v in data.get("day_of_week") or []]
+                weekend_flags = [int(v) for v in data.get("is_weekend") or []]
+            except (TypeError, ValueError) as e:
+                return jsonify({"error": f"Invalid scenario values: {str(e)}"}), 400
+            if any(not 0 <= v <= 6 for v in days_of_week) or any(v not in (0, 1) for v in weekend_flags):
+                return jsonify({"error": "day_of_week must be 0-6 and is_weekend 0 or 1"}), 400
+
+            n_rows = len(wellness_scores) * max(len(days_of_week), 1) * max(len(weekend_flags), 1) \
+                * ((end - start).days + 1)
+            if n_rows > SCENARIO_MAX_ROWS:
+                return jsonify({"error": f"Scenario grid too large: {n_rows} rows, limit {SCENARIO_MAX_ROWS}"}), 400
+
+            if hist_json is None:
+                with timed("history"):
+                    hist_days, hist_earnings, rolling = session_aggregator.history(driver_id, start, end)
+            else:
+                with timed("features"):
+                    hist_days, hist_earnings = parse_history(hist_json)
+                rolling = None
+
+            models = model_registry.snapshot()
+            with timed("forecast_scenarios"):
+                dates, scenarios, earnings, hours = forecast_scenarios(
+                    hist_days, hist_earnings, start, end, wellness_scores, models["earnings"], models["hours"],
+                    days_of_week, weekend_flags, rolling,
+                )
+
+            with timed("serialize"):
+                return jsonify({
+                    "status": "success",
+                    "currency": "IDR",
+                    "dates": dates.strftime("%Y-%m-%d").tolist(),
+                    "scenarios": {
+                        axis: [None if v < 0 else int(v) for v in values] for axis, values in scenarios.items()
+                    },
+                    "earnings": earnings.tolist(),
+                    "predicted_hours_worked": hours.tolist()
+                })
+
+        except UnknownDriver as e:
+            return jsonify({"error": str(e)}), 404
+
+        except Exception as e:
+            tb_str = traceback.format_exc()
+            print(f"init.py traceback: {tb_str}")
+            app.logger.error(f"Error in /predict/earnings/scenarios: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    def run_section(name, fn, *args):
+        with timed(f"dashboard_{name}"):
+            return fn(*args)
+
+    def submit_section(name, fn, *args):
+        """
+        Start one /dashboard section on the shared pool, or return None when the
+        section already has DASHBOARD_SECTION_LIMIT runs queued or running.
+        """
+        slot = dashboard_slots[name]
+        if not slot.acquire(blocking=False):
+            return None
+        try:
+            # A copy of this request's context, so the section's stages land in the same trace
+            future = dashboard_executor.submit(contextvars.copy_context().run, run_section, name, fn, *args)
+        except Exception:
+            slot.release()
+            raise
+        # Runs on completion or cancellation, including after the dashboard gave up waiting
+        future.add_done_callback(lambda _: slot.release())
+        return future
+
+    def dashboard_section(name, future, timeout):
+        """Wait up to `timeout` seconds for one /dashboard section and describe its outcome."""
+        if future is None:
+            return {
+                "status": "overloaded",
+                "error": f"{name} is busy with earlier dashboards that missed their deadline",
+                "retry_after": max(1, int(DASHBOARD_DEADLINES[name])),
+            }
+        try:
+            value = future.result(timeout=max(timeout, 0))
+        except FutureTimeout:
+            # A section still queued is dropped; one already running finishes in the
+            # background and still fills the LLM/forecast caches for the next request
+            future.cancel()
+            return {"status": "timeout", "error": f"{name} missed its {DASHBOARD_DEADLINES[name]:g}s deadline"}
+        except GatewayOverloaded as e:
+            app.logger.warning(str(e))
+            return {"status": "overloaded", "error": str(e), "retry_after": e.retry_after}
+        except (UnknownDriver, StructuredOutputError) as e:
+            app.logger.error(f"Error in /dashboard {name}: {str(e)}")
+            return {"status": "error", "error": str(e)}
+        except Exception as e:
+            tb_str = traceback.format_exc()
+            print(f"init.py traceback: {tb_str}")
+            app.logger.error(f"Error in /dashboard {name}: {str(e)}")
+            return {"status": "error", "error": str(e)}
+
+        if name == "forecast":
+            return {"status": "success", "currency": "IDR", "predictions": value}
+        if name == "invest":
+            return {"status": "success", "response": value}
+        return {"status": "success", **value}
+
+    @app.route("/dashboard", methods=["POST"])
+    def driver_dashboard():
+        """
+        Everything the home screen shows in one call: the earnings forecast and the
+        wellness, fin_tips and invest advice, run concurrently.
+        Frontend sends the inputs of the four endpoints in one body:
+        {
+        "start", "end", "wellness_score", "mode", "daily_logs" | "driver_id",   (as /predict/earnings,
+                                                                                  driver_id needs X-Admin-Token)
+        "pendapatan", "pengeluaran", "toleransi_risiko",                        (as /llm/fin_tips, /llm/invest)
+        "energy_level", "stress_level", "sleep_quality", "physical_condition"   (as /llm/wellness, 1-10)
+        }
+        Each entry of `sections` has its own status: "success", "timeout" when it missed
+        its deadline (DASHBOARD_*_DEADLINE_SECONDS), "overloaded" (LLM queue full, or
+        too many earlier runs of the section still going) or "error"; wellness and
+        fin_tips may succeed with a "fallback" answer, like their own endpoints. The reply
+        takes about as long as the slowest section, and "status" is "partial" unless
+        every section succeeded.
+        """
+        try:
+            with timed("parse"):
+                data = request.get_json(force=True)
+            required = [
+                "start", "end", "wellness_score", "pendapatan", "pengeluaran", "toleransi_risiko",
+                "energy_level", "stress_level", "sleep_quality", "physical_condition",
+            ]
+            missing = [field for field in required if data.get(field) is None]
+            if data.get("daily_logs") is None and data.get("driver_id") is None:
+                missing.append("daily_logs or driver_id")
+            if missing:
+                return jsonify({"error": f"Missing required fields: {', '.join(missing)}"}), 400
+
+            try:
+                start = pd.to_datetime(data["start"])
+                end = pd.to_datetime(data["end"])
+                wellness_score = int(data["wellness_score"])
+                wellness = {
+                    field: int(data[field]) for field in ("energy_level", "stress_level", "sleep_quality", "physical_condition")
+                }
+            except (TypeError, ValueError) as e:
+                return jsonify({"error": f"Invalid input: {str(e)}"}), 400
+            out_of_range = invalid_wellness_levels(wellness)
+            if out_of_range:
+                return jsonify({
+                    "error": f"Expected {WELLNESS_SCALE[0]}-{WELLNESS_SCALE[1]} for: {', '.join(out_of_range)}"
+                }), 400
+            hist_json = data.get("daily_logs")
+            driver_id = data.get("driver_id")
+            mode = data.get("mode", "static")
+            money = (data["pendapatan"], data["pengeluaran"], data["toleransi_risiko"])
+
+            if start > end:
+                return jsonify({"error": "Invalid date range"}), 400
+            if mode not in ("static", "recursive"):
+                return jsonify({"error": "Invalid mode, expected 'static' or 'recursive'"}), 400
+            if hist_json is None and not admin_authorized():
+                return jsonify({"error": "Unauthorized"}), 403
+            if hist_json is None and history_store is None:
+                return jsonify({"error": "History store is disabled, send daily_logs"}), 400
+
+            sections = {
+                "forecast": (forecast_earnings, start, end, wellness_score, hist_json, mode, driver_id),
+                "wellness": (answer_with_fallback, WELLNESS_SPEC, ask_wellness, wellness_fallback, *wellness.values()),
+                "fin_tips": (answer_with_fallback, FIN_TIPS_SPEC, ask_fin_tips, fin_tips_fallback, *money),
+                "invest": (ask_invest, *money),
+            }
+            started = time.monotonic()
+            futures = {name: submit_section(name, *section) for name, section in sections.items()}
+            results = {
+                name: dashboard_section(name, future, DASHBOARD_DEADLINES[name] - (time.monotonic() - started))
+                for name, future in futures.items()
+            }
+
+            return jsonify({
+                "status": "success" if all(r["status"] == "success" for r in results.values()) else "partial",
+                "sections": results
+            })
+
+        except Exception as e:
+            tb_str = traceback.format_exc()
+            print(f"init.py traceback: {tb_str}")
+            app.logger.error(f"Error in /dashboard: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    def admin_authorized():
+        token = request.headers.get("X-Admin-Token", "")
+        return ADMIN_TOKEN is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+    @app.route("/history/logs", methods=["POST"])
+    def ingest_history():
+        """
+        Store daily logs of a driver for forecasts by driver_id.
+        Backend sends:
+        {
+        "driver_id": "driver_1",
+        "daily_logs": [{day: '2025-05-24', total_earnings, total_trips, total_distance, total_fare, total_tip}]
+        }
+        A day that is already stored is replaced. Requires the X-Admin-Token header.
+        """
+        if not admin_authorized():
+            return jsonify({"error": "Unauthorized"}), 403
+        if history_store is None:
+            return jsonify({"error": "History store is disabled"}), 404
+        try:
+            data = request.get_json(force=True)
+            driver_id = data.get("driver_id")
+            logs = data.get("daily_logs")
+            if driver_id is None or not isinstance(logs, list):
+                return jsonify({"error": "Missing required fields: driver_id, daily_logs"}), 400
+
+            try:
+                ingested = history_store.ingest(driver_id, logs)
+            except (TypeError, ValueError) as e:
+                return jsonify({"error": f"Invalid daily_logs: {str(e)}"}), 400
+
+            return jsonify({
+                "status": "success",
+                "driver_id": str(driver_id),
+                "ingested": ingested
+            })
+
+        except Exception as e:
+            tb_str = traceback.format_exc()
+            print(f"init.py traceback: {tb_str}")
+            app.logger.error(f"Error in /history/logs: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/history/sessions", methods=["POST"])
+    def ingest_sessions():
+        """
+        Fold raw work sessions of a driver into its daily totals, one or many at a time,
+        in any order; late sessions update the day they belong to.
+        Backend sends:
+        {
+        "driver_id": "driver_1",
+        "sessions": [{timestamp: '2025-04-24 16:20:07', earnings, rides_completed, hours_worked}]
+        }
+        or a single "session" object. Sessions already received (same timestamp) are ignored.
+        Requires the X-Admin-Token header.
+        """
+        if not admin_authorized():
+            return jsonify({"error": "Unauthorized"}), 403
+        if session_aggregator is None:
+            return jsonify({"error": "History store is disabled"}), 404
+        try:
+            data = request.get_json(force=True)
+            driver_id = data.get("driver_id")
+            sessions = data.get("sessions")
+            if sessions is None and isinstance(data.get("session"), dict):
+                sessions = [data["session"]]
+            if driver_id is None or not isinstance(sessions, list):
+                return jsonify({"error": "Missing required fields: driver_id, sessions"}), 400
+
+            try:
+                counted, days = session_aggregator.add_sessions(str(driver_id), sessions)
+            except (TypeError, ValueError) as e:
+                return jsonify({"error": f"Invalid sessions: {str(e)}"}), 400
+
+            return jsonify({
+                "status": "success",
+                "driver_id": str(driver_id),
+                "ingested": counted,
+                "duplicates": len(sessions) - counted,
+                "days": days
+            })
+
+        except Exception as e:
+            tb_str = traceback.format_exc()
+            print(f"init.py traceback: {tb_str}")
+            app.logger.error(f"Error in /history/sessions: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/history/features/<driver_id>", methods=["GET"])
+    def driver_features(driver_id):
+        """
+        Current lag and rolling features of a driver for the day after its last logged day.
+        Requires the X-Admin-Token header.
+        """
+        if not admin_authorized():
+            return jsonify({"error": "Unauthorized"}), 403
+        if session_aggregator is None:
+            return jsonify({"error": "History store is disabled"}), 404
+        try:
+            return jsonify({
+                "status": "success",
+                "driver_id": driver_id,
+                "features": session_aggregator.features(driver_id)
+            })
+        except UnknownDriver as e:
+            return jsonify({"error": str(e)}), 404
+
+    @app.route("/history/logs/<driver_id>", methods=["GET", "DELETE"])
+    def driver_history(driver_id):
+        """
+        GET a driver's stored logs (optionally ?since=YYYY-MM-DD) or DELETE them.
+        Requires the X-Admin-Token header.
+        """
+        if not admin_authorized():
+            return jsonify({"error": "Unauthorized"}), 403
+        if history_store is None:
+            return jsonify({"error": "History store is disabled"}), 404
+        if request.method == "DELETE":
+            return jsonify({"status": "success", "driver_id": driver_id, "deleted": history_store.delete(driver_id)})
+        return jsonify({
+            "status": "success",
+            "driver_id": driver_id,
+            "daily_logs": history_store.logs(driver_id, request.args.get("since"))
+        })
+
+    @app.route("/history/stats", methods=["GET"])
+    def history_stats():
+        """
+        Number of drivers and daily logs in the history store.
+        Requires the X-Admin-Token header.
+        """
+        if not admin_authorized():
+            return jsonify({"error": "Unauthorized"}), 403
+        return jsonify({
+            "status": "success",
+            "store": history_store.stats() if history_store is not None else None
+        })
+
+    @app.route("/admin/models", methods=["GET"])
+    def list_models():
+        """
+        List the loaded model versions. Requires the X-Admin-Token header.
+        """
+        if not admin_authorized():
+            return jsonify({"error": "Unauthorized"}), 403
+        return jsonify({
+            "status": "success",
+            "backend": model_registry.backend,
+            "models": model_registry.describe(),
+            "last_reload_error": model_registry.last_error
+        })
+
+    @app.route("/admin/models/reload", methods=["POST"])
+    def reload_models():
+        """
+        Hot-swap models from their artifact paths without restarting gunicorn.
+        Send {"force": true} to reload even if the artifacts did not change.
+        This worker reloads before answering; the other workers pick the reload
+        up from MODEL_RELOAD_SIGNAL on their next request and load in the background.
+        Requires the X-Admin-Token header.
+        """
+        if not admin_authorized():
+            return jsonify({"error": "Unauthorized"}), 403
+        try:
+            data = request.get_json(force=True, silent=True) or {}
+            force = bool(data.get("force", False))
+            reloaded = model_registry.reload(force=force)
+            published = model_registry.publish_reload(force=force)
+            return jsonify({
+                "status": "success",
+                "reloaded": reloaded,
+                "published": published,
+                "models": model_registry.describe()
+            })
+
+        except Exception as e:
+            tb_str = traceback.format_exc()
+            print(f"init.py traceback: {tb_str}")
+            app.logger.error(f"Error in /admin/models/reload: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+
+    warm_up()
     return app
 
 # if __name__ == "__main__":
@@ -0,0 +1,186 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .history_store_utils import UnknownDriver
+from .regressor_utils import N_LAGS, ONE_DAY, lag_matrix
+
+
+class DailyTail:
+    """
+    The last N_LAGS logged days of one driver with running sums for
+    rolling_mean_7, rolling_std_7 and rolling_mean_14.
+    Adding earnings to a day in the tail or appending a newer day updates the
+    sums in O(1); a late day that lands between logged days re-sums the 14 values.
+    Days older than a full tail do not change the features and are ignored.
+    """
+
+    def __init__(self, days=(), earnings=()):
+        self.days = list(days)  # "YYYY-MM-DD", oldest first
+        self.earnings = [np.nan if v is None else float(v) for v in earnings]
+        self._resum()
+
+    def _resum(self):
+        last_7 = np.array(self.earnings[-7:], dtype=np.float64)
+        last_14 = np.array(self.earnings, dtype=np.float64)
+        self._sum_7 = np.nansum(last_7)
+        self._sumsq_7 = np.nansum(last_7 ** 2)
+        self._valid_7 = np.count_nonzero(~np.isnan(last_7))
+        self._sum_14 = np.nansum(last_14)
+        self._valid_14 = np.count_nonzero(~np.isnan(last_14))
+
+    def _enter(self, value, in_7):
+        if np.isnan(value):
+            return
+        self._sum_14 += value
+        self._valid_14 += 1
+        if in_7:
+            self._sum_7 += value
+            self._sumsq_7 += value * value
+            self._valid_7 += 1
+
+    def _leave(self, value, in_7):
+        if np.isnan(value):
+            return
+        self._sum_14 -= value
+        self._valid_14 -= 1
+        if in_7:
+            self._sum_7 -= value
+            self._sumsq_7 -= value * value
+            self._valid_7 -= 1
+
+    def add(self, day, amount):
+        """Add `amount` of earnings to `day` ("YYYY-MM-DD")."""
+        if day in self.days:
+            i = self.days.index(day)
+            old = self.earnings[i]
+            # The store adds to a missing total as if it were 0
+            new = amount if np.isnan(old) else old + amount
+            in_7 = i >= len(self.days) - 7
+            self._leave(old, in_7)
+            self._enter(new, in_7)
+            self.earnings[i] = new
+        elif not self.days or day > self.days[-1]:
+            self.days.append(day)
+            self.earnings.append(float(amount))
+            if len(self.days) >= 8:
+                # The day that was 7th from the end leaves the 7-day window
+                leaving = self.earnings[-8]
+                if not np.isnan(leaving):
+                    self._sum_7 -= leaving
+                    self._sumsq_7 -= leaving * leaving
+                    self._valid_7 -= 1
+            self._enter(float(amount), in_7=True)
+            if len(self.days) > N_LAGS:
+                self._leave(self.earnings[0], in_7=False)
+                del self.days[0], self.earnings[0]
+        elif len(self.days) < N_LAGS or day > self.days[0]:
+            # A late session for a day that was not logged yet
+            i = int(np.searchsorted(self.days, day))
+            self.days.insert(i, day)
+            self.earnings.insert(i, float(amount))
+            del self.days[:-N_LAGS], self.earnings[:-N_LAGS]
+            self._resum()
+
+    def rolling(self):
+        """Current (rolling_mean_7, rolling_std_7, rolling_mean_14)."""
+        rolling_mean_7 = rolling_std_7 = rolling_mean_14 = np.nan
+        if self._valid_7 == 7:
+            rolling_mean_7 = self._sum_7 / 7
+            rolling_std_7 = np.sqrt(max(self._sumsq_7 / 7 - rolling_mean_7 * rolling_mean_7, 0.0))
+        if self._valid_14 == N_LAGS:
+            rolling_mean_14 = self._sum_14 / N_LAGS
+        return rolling_mean_7, rolling_std_7, rolling_mean_14
+
+    def arrays(self):
+        """(days datetime64[ns], earnings float64) like parse_history returns."""
+        return np.array(self.days, dtype='datetime64[ns]'), np.array(self.earnings, dtype=np.float64)
+
+
+class SessionAggregator:
+    """
+    Folds work sessions into per-driver daily totals in the history store and keeps
+    a DailyTail per driver, so forecasts starting after the last logged day get
+    their lags and rolling stats without reading the history.
+    Tails are cached per worker (LRU, `max_drivers`) and checked against the store's
+    per-driver revision, so writes made by another worker are picked up.
+    """
+
+    def __init__(self, store, max_drivers=10_000):
+        self.store = store
+        self.max_drivers = max_drivers
+        self._tails = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_sessions(self, driver_id, sessions):
+        """Returns (sessions counted, days touched); already seen sessions are not counted."""
+        revision, deltas, counted = self.store.add_sessions(driver_id, sessions)
+        with self._lock:
+            cached = self._tails.get(driver_id)
+            if cached is not None:
+                if deltas and cached[0] == revision - 1:
+                    tail = cached[1]
+                    for day in sorted(deltas):
+                        tail.add(day, deltas[day][0])
+                    self._tails[driver_id] = (revision, tail)
+                elif cached[0] != revision:
+                    # Another writer got in between; rebuild from the store on next read
+                    del self._tails[driver_id]
+        return counted, sorted(deltas)
+
+    def tail(self, driver_id):
+        """The driver's DailyTail, reloaded from the store when it changed. Raises UnknownDriver."""
+        revision = self.store.revision(driver_id)
+        with self._lock:
+            cached = self._tails.get(driver_id)
+            if cached is not None and cached[0] == revision:
+                self._tails.move_to_end(driver_id)
+                return cached[1]
+
+        revision, rows = self.store.tail(driver_id)
+        if not rows:
+            raise UnknownDriver(f"No history for driver {driver_id}")
+        tail = DailyTail([row[0] for row in rows], [row[1] for row in rows])
+        with self._lock:
+            self._tails[driver_id] = (revision, tail)
+            self._tails.move_to_end(driver_id)
+            while len(self._tails) > self.max_drivers:
+                self._tails.popitem(last=False)
+        return tail
+
+    def history(self, driver_id, forecast_start, forecast_end):
+        """
+        (days, earnings, rolling) to forecast [forecast_start, forecast_end] from.
+        A forecast that starts after the last logged day only needs the tail, with
+        rolling stats from its running sums; otherwise the store window is read
+        and rolling is None.
+        """
+        tail = self.tail(driver_id)
+        with self._lock:
+            if np.datetime64(tail.days[-1]) < np.datetime64(forecast_start, 'D'):
+                days, earnings = tail.arrays()
+                return days, earnings, tail.rolling()
+        days, earnings = self.store.window(driver_id, forecast_start, forecast_end)
+        return days, earnings, None
+
+    def features(self, driver_id):
+        """Lags and rolling stats for the day after the driver's last logged day."""
+        tail = self.tail(driver_id)
+        with self._lock:
+            days, earnings = tail.arrays()
+            rolling_mean_7, rolling_std_7, rolling_mean_14 = tail.rolling()
+        next_day = days[-1] + ONE_DAY
+        lags = lag_matrix(days, earnings, [next_day])[0]
+        values = {
+            "rolling_mean_7": rolling_mean_7,
+            "rolling_std_7": rolling_std_7,
+            "rolling_mean_14": rolling_mean_14,
+            **{f"lag_{lag}": value for lag, value in enumerate(lags, start=1)},
+        }
+        return {
+            "last_day": str(days[-1])[:10],
+            "next_day": str(next_day)[:10],
+            # Windows that are not full yet are null
+            **{name: None if np.isnan(value) else float(value) for name, value in values.items()},
+        }
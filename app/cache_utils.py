@@ -0,0 +1,308 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Default bucketing for prompt inputs: numeric fields are rounded to the nearest step
+# (IDR for money), or for values smaller than the step to their leading digit, so
+# small incomes keep their order of magnitude instead of rounding to 0.
+# Other values are compared case/whitespace-insensitively.
+DEFAULT_ROUNDING = {
+    "pendapatan": 500_000,
+    "pengeluaran": 500_000,
+}
+
+
+def bucket_step(value, step):
+    """`step`, or the power of ten at or below |value| when that is smaller."""
+    magnitude = 10 ** math.floor(math.log10(abs(value)))
+    return min(step, magnitude)
+
+
+def normalize_inputs(values, rounding=None):
+    """
+    Bucket prompt inputs so near-identical requests share one cache entry.
+    Returns a new dict; the prompt must be built from these values.
+    """
+    rounding = DEFAULT_ROUNDING if rounding is None else rounding
+    normalized = {}
+    for name, value in values.items():
+        step = rounding.get(name)
+        if isinstance(value, str):
+            stripped = value.strip()
+            try:
+                value = float(stripped) if step else stripped.lower()
+            except ValueError:
+                value = stripped.lower()
+        if step and isinstance(value, (int, float)) and value:
+            step = bucket_step(value, step)
+            value = int(round(value / step) * step)
+        normalized[name] = value
+    return normalized
+
+
+def cache_key(model, messages):
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """
+    In-process LRU cache with a per-entry TTL.
+    With `max_bytes`, entries are also evicted to keep the sum of `sizeof(value)`
+    under it, and a value larger than the whole budget is not stored.
+    """
+
+    def __init__(self, max_entries=10_000, ttl=86_400, max_bytes=None, sizeof=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pop(self, key):
+        _, _, size = self._data.pop(key)
+        self.bytes -= size
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at, _ = item
+            if expires_at <= time.time():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None and self.sizeof is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (value, time.time() + self.ttl, size)
+            self.bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Persistent LRU+TTL cache in a local SQLite file.
+    Survives restarts and is shared by every gunicorn worker on the host.
+    """
+
+    def __init__(self, path, max_entries=10_000, ttl=86_400, table="llm_cache"):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_lru ON {self.table} (last_access)")
+
+    def _connect(self):
+        # One connection per thread (and per process, since workers fork after init)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the call,
+    callers that arrive while it is in flight wait for it and get the same
+    result, or the same exception.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Run `fn()` once per key at a time. Returns (result, shared) where `shared`
+        is True for callers that waited on another caller's flight.
+        Followers raise TimeoutError if the flight takes longer than `timeout`.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                flight.waiters += 1
+                self.followers += 1
+
+        if leader:
+            try:
+                flight.result = fn()
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        elif not flight.done.wait(timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError("Timed out waiting for an identical in-flight request")
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, not leader
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "followers": self.followers,
+                "timeouts": self.timeouts,
+                "in_flight": len(self._flights),
+            }
+
+
+class LLMCache:
+    """
+    Deterministic response cache in front of the LLM.
+    Keys are a hash of the model name and the full message list.
+    Only the calling endpoint knows whether an answer is usable, so it decides what gets stored.
+    """
+
+    def __init__(self, backend=None, rounding=None):
+        self.backend = backend
+        self.rounding = DEFAULT_ROUNDING if rounding is None else rounding
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def normalize(self, values):
+        if not self.enabled:
+            return dict(values)
+        return normalize_inputs(values, self.rounding)
+
+    def get(self, model, messages):
+        if not self.enabled:
+            return None
+        value = self.backend.get(cache_key(model, messages))
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, model, messages, value):
+        if self.enabled:
+            self.backend.set(cache_key(model, messages), value)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__ if self.enabled else None,
+            "entries": len(self.backend) if self.enabled else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def cache_from_env():
+    """
+    LLM_CACHE_BACKEND: "memory" (default), "sqlite" or "off"
+    LLM_CACHE_PATH: SQLite file for the sqlite backend
+    LLM_CACHE_TTL: entry lifetime in seconds
+    LLM_CACHE_MAX_ENTRIES: LRU bound
+    LLM_CACHE_ROUNDING: JSON object of field -> bucket step, e.g. {"pendapatan": 500000}
+    """
+    kind = os.getenv("LLM_CACHE_BACKEND", "memory")
+    ttl = float(os.getenv("LLM_CACHE_TTL", "86400"))
+    max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+    rounding = os.getenv("LLM_CACHE_ROUNDING")
+    rounding = json.loads(rounding) if rounding else None
+
+    if kind == "off":
+        backend = None
+    elif kind == "memory":
+        backend = MemoryCache(max_entries=max_entries, ttl=ttl)
+    elif kind == "sqlite":
+        backend = SQLiteCache(os.getenv("LLM_CACHE_PATH", "./llm_cache.sqlite3"), max_entries=max_entries, ttl=ttl)
+    else:
+        raise ValueError(f"Unknown LLM_CACHE_BACKEND: {kind}")
+    return LLMCache(backend, rounding)
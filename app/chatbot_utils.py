@@ -1,19 +1,179 @@
 import os
-from dashscope import Generation
-import dashscope
-dashscope.base_http_api_url = 'https://dashscope-intl.aliyuncs.com/api/v1'
+import math
+import threading
+import time
+from .gateway_utils import gateway_from_env, load_client
+from .fake_llm_utils import fake_llm_from_env
+from .metrics_utils import LLM_CALLS, LLM_TOKENS, record_stage, timed
+DASHSCOPE_BASE_URL = os.getenv("DASHSCOPE_BASE_URL", 'https://dashscope-intl.aliyuncs.com/api/v1')
 # from dotenv import load_dotenv
 
 # load_dotenv()
 
-def call_qwen(messages, model="qwen-plus"):
+_gateway = None
+_fake_llm = None
+_generation = None
+_gateway_lock = threading.Lock()
+
+
+def get_generation():
+    """
+    dashscope's Generation API, imported on first use: the SDK takes about half a
+    second to import and is only needed for LLM_GATEWAY=off calls.
+    """
+    global _generation
+    if _generation is None:
+        import dashscope
+        from dashscope import Generation
+
+        dashscope.base_http_api_url = DASHSCOPE_BASE_URL
+        _generation = Generation
+    return _generation
+
+
+def get_fake_llm():
+    """
+    Local Qwen stand-in when LLM_BACKEND=fake (offline development and load tests),
+    otherwise None.
+    """
+    global _fake_llm
+    if os.getenv("LLM_BACKEND", "dashscope") != "fake":
+        return None
+    with _gateway_lock:
+        if _fake_llm is None:
+            _fake_llm = fake_llm_from_env()
+        return _fake_llm
+
+
+def get_gateway():
+    """
+    Shared async LLM gateway, or None when LLM_GATEWAY=off (plain dashscope SDK calls).
+    Built on first use so it picks up the environment after .env is loaded.
+    """
+    global _gateway
+    if os.getenv("LLM_GATEWAY", "on") == "off":
+        return None
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = gateway_from_env(DASHSCOPE_BASE_URL)
+        return _gateway
+
+
+def preload_clients():
+    """
+    Import the LLM client libraries this configuration calls (none for the fake
+    backend), e.g. before gunicorn forks its workers. Starts no threads.
+    """
+    if get_fake_llm() is not None:
+        return
+    if get_gateway() is not None:
+        load_client()
+    else:
+        get_generation()
+
+
+def record_llm_call(endpoint, response):
+    """Count an upstream call by status and the tokens it reports as used."""
+    status = getattr(response, "status_code", None)
+    LLM_CALLS.inc(endpoint=endpoint, status=status if status is not None else "error")
+    usage = getattr(response, "usage", None)
+    for kind in ("input_tokens", "output_tokens"):
+        tokens = getattr(usage, kind, None)
+        if tokens:
+            LLM_TOKENS.inc(tokens, endpoint=endpoint, kind=kind.split("_")[0])
+
+
+def call_qwen(messages, model="qwen-plus", timeout=None, endpoint="default"):
+    with timed("llm_call"):
+        try:
+            response = _call_qwen(messages, model, timeout, endpoint)
+        except Exception:
+            record_llm_call(endpoint, None)
+            raise
+    record_llm_call(endpoint, response)
+    return response
+
+
+def _call_qwen(messages, model, timeout, endpoint):
     # print(f"MODEL_STUDIO_KEY : {os.getenv("MODEL_STUDIO_KEY")}")
-    response = Generation.call(
+    backend = get_fake_llm() or get_gateway()
+    if backend is not None:
+        return backend.call(messages, model=model, endpoint=endpoint, timeout=timeout)
+
+    kwargs = {}
+    if timeout is not None:
+        # dashscope takes whole seconds
+        kwargs["request_timeout"] = max(1, math.ceil(timeout))
+    response = get_generation().call(
         # If the environment variable is not configured, replace the following line with: api_key="sk-xxx",
         api_key=os.getenv("MODEL_STUDIO_KEY"),
         # Model list: https://www.alibabacloud.com/help/en/model-studio/getting-started/models
         model=model,
         messages=messages,
         result_format="message",
+        **kwargs,
     )
-    return response
\ No newline at end of file
+    return response
+
+
+def response_text(response):
+    """Assistant content of a dashscope response, raising on API errors."""
+    if getattr(response, "status_code", 200) != 200 or response.output is None:
+        raise RuntimeError(
+            f"LLM call failed: {getattr(response, 'code', '')} {getattr(response, 'message', '')}".strip()
+        )
+    return response.output.choices[0].message.content
+
+
+def stream_qwen(messages, model="qwen-plus", timeout=None, endpoint="chatbot"):
+    """
+    Start streaming a completion and return an iterator of text deltas.
+    Uses dashscope's incremental output so each chunk only carries new tokens.
+    Behind the gateway the stream takes an endpoint queue slot before this returns,
+    so a full queue raises GatewayOverloaded here rather than mid-stream.
+    Time to first token and the whole stream are recorded as `llm_ttft` and `llm_stream` stages.
+    """
+    started = time.perf_counter()
+    fake_llm = get_fake_llm()
+    gateway = get_gateway() if fake_llm is None else None
+    if fake_llm is not None:
+        responses = fake_llm.stream(messages)
+    elif gateway is not None:
+        responses = gateway.stream(messages, model=model, endpoint=endpoint, timeout=timeout)
+    else:
+        # LLM_GATEWAY=off: the SDK's own stream, outside the gateway's limits
+        kwargs = {}
+        if timeout is not None:
+            kwargs["request_timeout"] = max(1, math.ceil(timeout))
+        responses = get_generation().call(
+            api_key=os.getenv("MODEL_STUDIO_KEY"),
+            model=model,
+            messages=messages,
+            result_format="message",
+            stream=True,
+            incremental_output=True,
+            **kwargs,
+        )
+    return _stream_deltas(responses, endpoint, started)
+
+
+def _stream_deltas(responses, endpoint, started):
+    response = None
+    try:
+        for i, response in enumerate(responses):
+            if i == 0:
+                record_stage("llm_ttft", time.perf_counter() - started)
+            delta = response_text(response)
+            if delta:
+                yield delta
+    except Exception:
+        record_llm_call(endpoint, None)
+        raise
+    finally:
+        record_stage("llm_stream", time.perf_counter() - started)
+        # A client that disconnects mid-stream frees the gateway slot right away
+        close = getattr(responses, "close", None)
+        if close is not None:
+            close()
+    # Every incremental chunk carries the usage so far, the last one the total
+    record_llm_call(endpoint, response)
@@ -0,0 +1,241 @@
+import json
+import os
+import random
+import threading
+import time
+
+from .gateway_utils import to_response
+
+# Canned answers that satisfy each structured endpoint's schema, picked by a
+# marker in the system prompt
+FAKE_ANSWERS = [
+    ("saving_strategies", {
+        "saving_strategies": "Sisihkan 20% pendapatan untuk dana darurat.",
+        "investment_strategies": "Mulai dengan reksa dana pasar uang.",
+        "insurance_strategies": "Prioritaskan BPJS Kesehatan dan asuransi kecelakaan.",
+    }),
+    ("wellness_score", {
+        "rest_advice": "Take a 10-minute break every 2 hours.",
+        "hydration_tip": "Drink water every 30 minutes while driving.",
+        "relaxation_techniques": ["deep breathing", "listen to music"],
+        "wellness_score": 70,
+        "general_wellness_status": "moderate",
+    }),
+    ("instrument_name", {
+        "deposito": {"minimum_invest": "1000000", "expected_return": "4%", "risk_category": "low"},
+        "gold": {"minimum_invest": "500000", "expected_return": "8%", "risk_category": "medium"},
+        "stock_mutual_funds": {"minimum_invest": "100000", "expected_return": "12%", "risk_category": "high"},
+    }),
+]
+FAKE_CHAT_ANSWER = (
+    "Untuk mencegah kelelahan, istirahatlah 10 menit setiap 2 jam, minum air yang cukup "
+    "dan hindari berkendara lebih dari 10 jam sehari."
+)
+
+
+class FakeLLM:
+    """
+    Local stand-in for Qwen with no network access.
+    Latency is `latency` seconds plus the answer's tokens at `tokens_per_sec`;
+    `failure_rate` returns API errors and `malformed_rate` returns prose instead of JSON,
+    so retry, fallback and load-shedding paths can be exercised offline.
+    """
+
+    def __init__(self, latency=0.5, tokens_per_sec=50.0, failure_rate=0.0, malformed_rate=0.0, seed=None):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _roll(self):
+        with self._lock:
+            self.calls += 1
+            return self._rng.random(), self._rng.random()
+
+    def answer(self, messages):
+        system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        for marker, answer in FAKE_ANSWERS:
+            if marker in system:
+                return json.dumps(answer, ensure_ascii=False)
+        return FAKE_CHAT_ANSWER
+
+    def _tokens(self, text):
+        # Whitespace-delimited chunks keep the spaces, so joining them rebuilds the text
+        words = text.split(" ")
+        return [w + " " for w in words[:-1]] + [words[-1]]
+
+    def _body(self, messages, content, output_tokens=None):
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        if output_tokens is None:
+            output_tokens = len(self._tokens(content))
+        return {
+            "request_id": "fake",
+            "output": {"choices": [{"finish_reason": "stop", "message": {"role": "assistant", "content": content}}]},
+            "usage": {"input_tokens": prompt_tokens, "output_tokens": output_tokens},
+        }
+
+    def _error(self):
+        return 500, {"request_id": "fake", "code": "InternalError", "message": "Injected failure"}
+
+    def prepare(self, messages):
+        """Return (status, body, delay_seconds) for a non-streaming call."""
+        fail, malformed = self._roll()
+        content = self.answer(messages)
+        if malformed < self.malformed_rate:
+            content = "Maaf, saya tidak bisa menjawab dalam format itu."
+        delay = self.latency + len(self._tokens(content)) / self.tokens_per_sec
+        if fail < self.failure_rate:
+            return (*self._error(), delay)
+        return 200, self._body(messages, content), delay
+
+    def reply(self, messages):
+        """Return (status, body), sleeping like a real call."""
+        status, body, delay = self.prepare(messages)
+        time.sleep(delay)
+        return status, body
+
+    def call(self, messages, model="qwen-plus", endpoint="default", timeout=None):
+        """Same contract as LLMGateway.call, including TimeoutError once `timeout` passes."""
+        status, body, delay = self.prepare(messages)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"LLM call exceeded its {timeout:.1f}s timeout")
+        time.sleep(delay)
+        return to_response(status, body)
+
+    def prepare_stream(self, messages):
+        """Return the (status, body) chunks of a streaming call; an injected failure ends it halfway."""
+        fail, _ = self._roll()
+        tokens = self._tokens(self.answer(messages))
+        chunks = []
+        for i, token in enumerate(tokens):
+            if fail < self.failure_rate and i == len(tokens) // 2:
+                chunks.append(self._error())
+                break
+            # Like dashscope, usage on each chunk is the running total
+            chunks.append((200, self._body(messages, token, output_tokens=i + 1)))
+        return chunks
+
+    def stream(self, messages):
+        """Yield incremental dashscope-shaped responses at `tokens_per_sec`."""
+        chunks = self.prepare_stream(messages)
+        time.sleep(self.latency)
+        for status, body in chunks:
+            if status == 200:
+                time.sleep(1 / self.tokens_per_sec)
+            yield to_response(status, body)
+
+
+def fake_llm_from_env():
+    """
+    FAKE_LLM_LATENCY: base latency in seconds
+    FAKE_LLM_TOKENS_PER_SEC: generation speed
+    FAKE_LLM_FAILURE_RATE / FAKE_LLM_MALFORMED_RATE: injected error probabilities
+    FAKE_LLM_SEED: make injected failures reproducible
+    """
+    seed = os.getenv("FAKE_LLM_SEED")
+    return FakeLLM(
+        latency=float(os.getenv("FAKE_LLM_LATENCY", "0.5")),
+        tokens_per_sec=float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "50")),
+        failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", "0")),
+        malformed_rate=float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0")),
+        seed=int(seed) if seed else None,
+    )
+
+
+def fake_server_app(fake, stats=None):
+    """
+    aiohttp app serving `fake` over dashscope's text-generation HTTP API, with
+    server-sent events for requests that send X-DashScope-SSE: enable.
+    `stats` is filled with the requests seen, requests in flight and the most at once.
+    """
+    import asyncio
+    from aiohttp import web
+
+    stats = {} if stats is None else stats
+    stats.update(requests=0, in_flight=0, max_in_flight=0)
+
+    async def generation(request):
+        body = await request.json()
+        messages = body["input"]["messages"]
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            if request.headers.get("X-DashScope-SSE") != "enable":
+                status, reply, delay = fake.prepare(messages)
+                await asyncio.sleep(delay)
+                return web.json_response(reply, status=status)
+
+            chunks = fake.prepare_stream(messages)
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            await asyncio.sleep(fake.latency)
+            for i, (status, chunk) in enumerate(chunks, 1):
+                if status == 200:
+                    await asyncio.sleep(1 / fake.tokens_per_sec)
+                event = f"id:{i}\nevent:result\n:HTTP_STATUS/{status}\ndata:{json.dumps(chunk)}\n\n"
+                await response.write(event.encode("utf-8"))
+            await response.write_eof()
+            return response
+        finally:
+            stats["in_flight"] -= 1
+
+    app = web.Application()
+    app.router.add_post("/api/v1/services/aigc/text-generation/generation", generation)
+    return app
+
+
+class FakeServer:
+    """fake_server_app on a free local port, run on a background thread (for tests)."""
+
+    def __init__(self, fake):
+        self.fake = fake
+        self.stats = {}
+        self.app = fake_server_app(fake, self.stats)
+        self.base_url = None
+        self._loop = None
+        self._runner = None
+
+    def start(self):
+        import asyncio
+        from aiohttp import web
+
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="fake-dashscope", daemon=True).start()
+
+        async def start_site():
+            self._runner = web.AppRunner(self.app)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            return self._runner.addresses[0][1]
+
+        port = asyncio.run_coroutine_threadsafe(start_site(), self._loop).result(10)
+        self.base_url = f"http://127.0.0.1:{port}/api/v1"
+        return self
+
+    def stop(self):
+        import asyncio
+
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def serve(port=8765, fake=None):
+    """
+    Serve the fake over dashscope's text-generation HTTP API, so the real
+    gateway path can be load-tested: DASHSCOPE_BASE_URL=http://127.0.0.1:<port>/api/v1
+    """
+    from aiohttp import web
+
+    web.run_app(fake_server_app(fake or fake_llm_from_env()), port=port)
+
+
+if __name__ == "__main__":
+    import sys
+
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8765)
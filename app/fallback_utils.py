@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing.
+    After `failure_threshold` consecutive failures the circuit opens and allow()
+    refuses calls for `reset_timeout` seconds; then a single trial call is let
+    through (half-open), which closes the circuit on success or opens it again.
+    A trial that ends without an outcome must be handed back with release_trial().
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.short_circuits = 0
+        self._trial_running = False
+        self._trial_thread = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "closed" or (self.state == "half_open" and not self._trial_running):
+                self._trial_running = self.state == "half_open"
+                self._trial_thread = threading.get_ident() if self._trial_running else None
+                return True
+            self.short_circuits += 1
+            return False
+
+    def release_trial(self):
+        """
+        Give back the half-open trial this thread was allowed, when its call said
+        nothing about the upstream (shed locally, or joined another caller's call).
+        A no-op for any other thread and once an outcome was recorded.
+        """
+        with self._lock:
+            if self._trial_running and self._trial_thread == threading.get_ident():
+                self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "opens": self.opens,
+                "short_circuits": self.short_circuits,
+            }
+
+
+def breaker_from_env(name):
+    """
+    LLM_BREAKER_FAILURES: consecutive failed answers that open an endpoint's circuit
+    LLM_BREAKER_RESET_SECONDS: how long an open circuit skips the LLM before a trial call
+    """
+    return CircuitBreaker(
+        name,
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+    )
+
+
+# The four /llm/wellness (and /dashboard) inputs are self-ratings on this scale:
+# 1 is the lowest energy, stress, sleep quality or physical condition, 10 the highest.
+# The routes reject values outside it with a 400 (see invalid_wellness_levels).
+WELLNESS_SCALE = (1, 10)
+
+
+def invalid_wellness_levels(levels):
+    """Names of the {name: int} wellness inputs that fall outside WELLNESS_SCALE."""
+    low, high = WELLNESS_SCALE
+    return [name for name, value in levels.items() if not low <= value <= high]
+
+
+def _clamp(value, low=WELLNESS_SCALE[0], high=WELLNESS_SCALE[1]):
+    return max(low, min(high, value))
+
+
+def wellness_fallback(energy_level, stress_level, sleep_quality, physical_condition):
+    """
+    Local /llm/wellness answer from the four inputs on WELLNESS_SCALE (stress counts
+    inverted): the score is their mean scaled to 0-100, the advice targets the weakest
+    one. Inputs are clamped to the scale as a last guard; the routes validate them.
+    """
+    levels = {
+        "energy": _clamp(energy_level),
+        "stress": 11 - _clamp(stress_level),
+        "sleep": _clamp(sleep_quality),
+        "physical": _clamp(physical_condition),
+    }
+    wellness_score = round((sum(levels.values()) / len(levels) - 1) / 9 * 100)
+    if wellness_score >= 70:
+        status = "good"
+    elif wellness_score >= 40:
+        status = "moderate"
+    else:
+        status = "poor"
+
+    weakest = min(levels, key=levels.get)
+    rest_advice = {
+        "energy": "Energi Anda rendah: istirahat 15 menit setiap 2 jam dan hindari jam sibuk berturut-turut.",
+        "stress": "Tingkat stres Anda tinggi: ambil jeda 10 menit di tempat tenang setelah setiap 2-3 order.",
+        "sleep": "Kualitas tidur Anda kurang: tidur 7-8 jam malam ini dan jangan berkendara saat mengantuk.",
+        "physical": "Kondisi fisik Anda menurun: kurangi jam kerja hari ini dan regangkan badan setiap berhenti.",
+    }[weakest]
+    relaxation_techniques = ["pernapasan dalam 4-7-8", "peregangan leher dan bahu"]
+    if levels["stress"] <= 5:
+        relaxation_techniques.append("dengarkan musik yang menenangkan saat istirahat")
+
+    return {
+        "rest_advice": rest_advice,
+        "hydration_tip": "Minum segelas air setiap 1-2 jam dan bawa botol minum di kendaraan.",
+        "relaxation_techniques": relaxation_techniques,
+        "wellness_score": wellness_score,
+        "general_wellness_status": status,
+    }
+
+
+def _risk_level(toleransi_risiko):
+    risk = str(toleransi_risiko).strip().lower()
+    if risk in ("low", "rendah", "konservatif"):
+        return "low"
+    if risk in ("high", "tinggi", "agresif"):
+        return "high"
+    return "medium"
+
+
+def fin_tips_fallback(pendapatan, pengeluaran, toleransi_risiko):
+    """
+    Local /llm/fin_tips answer: saving advice by the expense/income ratio,
+    investment advice by risk tolerance, and standard insurance guidance.
+    """
+    try:
+        income, expenses = float(pendapatan), float(pengeluaran)
+    except (TypeError, ValueError):
+        income, expenses = 0.0, 0.0
+    ratio = expenses / income if income > 0 else 1.0
+
+    if ratio >= 1:
+        saving = ("Pengeluaran Anda menyamai atau melebihi pendapatan: catat semua pengeluaran, "
+                  "potong yang tidak wajib, lalu mulai sisihkan 5% pendapatan untuk dana darurat.")
+    elif ratio >= 0.8:
+        saving = ("Sisihkan 10% pendapatan di awal bulan untuk dana darurat sampai "
+                  "mencapai 3 bulan pengeluaran, sebelum mulai berinvestasi.")
+    else:
+        saving = ("Sisihkan 20% pendapatan: penuhi dulu dana darurat 3-6 bulan pengeluaran, "
+                  "lalu alokasikan sisanya untuk investasi rutin.")
+
+    investment = {
+        "low": "Pilih deposito dan reksa dana pasar uang yang aman dan mudah dicairkan.",
+        "medium": "Kombinasikan reksa dana pasar uang, reksa dana pendapatan tetap dan emas.",
+        "high": "Setelah dana darurat aman, investasikan sebagian di reksa dana saham untuk jangka panjang.",
+    }[_risk_level(toleransi_risiko)]
+
+    return {
+        "saving_strategies": saving,
+        "investment_strategies": investment,
+        "insurance_strategies": ("Prioritaskan BPJS Kesehatan dan BPJS Ketenagakerjaan (kecelakaan kerja), "
+                                 "lalu asuransi kendaraan bila anggaran memungkinkan."),
+    }
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from .cache_utils import MemoryCache
+from .metrics_utils import timed
+from .regressor_utils import (
+    parse_history,
+    features_from_history,
+    predict_forecast,
+    format_predictions,
+    recursive_from_history,
+)
+
+# How many trailing logs a request may have added to a known history and still
+# reuse its state; the frontend resends the same logs with at most a day appended.
+MAX_APPENDED_DAYS = 7
+
+# Approximate size of one cached `predictions` record (a dict of a date string
+# and two floats) and of a parsed history entry, for the byte bounds
+PREDICTION_RECORD_BYTES = 320
+STATE_OVERHEAD_BYTES = 512
+
+
+def predictions_size(predictions):
+    return len(predictions) * PREDICTION_RECORD_BYTES
+
+
+def state_size(state):
+    return state.hist_days.nbytes + state.hist_earnings.nbytes + STATE_OVERHEAD_BYTES
+
+
+def history_digests(hist_json, max_appended=MAX_APPENDED_DAYS):
+    """
+    Content hash of `daily_logs`, plus the hashes of its prefixes without the
+    last 1..max_appended logs. Only the fields the features read (day and
+    total_earnings) are hashed, so edits to other fields keep the same key.
+    Returns (digest, {logs_dropped: prefix digest}).
+    """
+    h = hashlib.sha256()
+    n = len(hist_json)
+    prefixes = {}
+    for i, log in enumerate(hist_json):
+        if n - i <= max_appended:
+            prefixes[n - i] = h.hexdigest()
+        h.update(f"{log.get('day')}|{log.get('total_earnings')}\n".encode("utf-8"))
+    return h.hexdigest(), prefixes
+
+
+class ForecastState:
+    """What is kept per driver history: the parsed, sorted history arrays."""
+
+    def __init__(self, hist_days, hist_earnings):
+        self.hist_days = hist_days
+        self.hist_earnings = hist_earnings
+
+
+class ForecastCache:
+    """
+    Cache in front of /predict/earnings.
+    - Identical requests (same history content, window, wellness score, mode and
+      model versions) return the stored predictions.
+    - Otherwise the parsed history of the same logs, or of a prefix of them when
+      logs were appended, is reused so only the appended logs are parsed
+      (counted as `prefix_hits`). This saves parsing only: every forecast row is
+      featurized and scored again, since every appended log moves the rolling
+      stats, which are features of every forecast day.
+    Both levels are LRU+TTL bounded by entry count and by approximate bytes,
+    about 320 bytes per cached forecast day and 16 bytes per parsed log.
+    """
+
+    def __init__(self, max_entries=1000, max_states=1000, ttl=3600, enabled=True,
+                 max_bytes=64 << 20, max_state_bytes=16 << 20):
+        self.enabled = enabled
+        self.results = MemoryCache(max_entries=max_entries, ttl=ttl, max_bytes=max_bytes, sizeof=predictions_size)
+        self.states = MemoryCache(max_entries=max_states, ttl=ttl, max_bytes=max_state_bytes, sizeof=state_size)
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, field, amount=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def forecast(self, hist_json, start, end, wellness_score, mode, models, versions):
+        """Return the `predictions` records for one /predict/earnings request."""
+        hist_json = hist_json or []
+        if not self.enabled:
+            return self._score(hist_json, start, end, wellness_score, mode, models)
+
+        digest, prefixes = history_digests(hist_json)
+        model_key = json.dumps(versions, sort_keys=True)
+        key = self._key(digest, start, end, wellness_score, mode, model_key)
+
+        predictions = self.results.get(key)
+        if predictions is not None:
+            self._count("hits")
+            return predictions
+
+        if mode == "recursive":
+            # Every day depends on the previous prediction, so there is nothing to reuse
+            self._count("misses")
+            predictions = self._score(hist_json, start, end, wellness_score, mode, models)
+        else:
+            predictions = self._score_from_prefix(
+                hist_json, digest, prefixes, model_key, start, end, wellness_score, models
+            )
+
+        self.results.set(key, predictions)
+        return predictions
+
+    def forecast_history(self, hist_days, hist_earnings, start, end, wellness_score, mode, models, versions,
+                         rolling=None):
+        """
+        forecast() for a history that is already parsed into sorted arrays, e.g. read
+        from the history store. Such histories are small, so only whole responses are cached.
+        `rolling` may carry precomputed rolling stats of the history.
+        """
+        if not self.enabled:
+            return self._score_history(hist_days, hist_earnings, start, end, wellness_score, mode, models, rolling)
+
+        digest = hashlib.sha256(hist_days.tobytes() + hist_earnings.tobytes()).hexdigest()
+        key = self._key(digest, start, end, wellness_score, mode, json.dumps(versions, sort_keys=True))
+        predictions = self.results.get(key)
+        if predictions is not None:
+            self._count("hits")
+            return predictions
+
+        self._count("misses")
+        predictions = self._score_history(hist_days, hist_earnings, start, end, wellness_score, mode, models, rolling)
+        self.results.set(key, predictions)
+        return predictions
+
+    def _key(self, digest, start, end, wellness_score, mode, model_key):
+        return hashlib.sha256(json.dumps(
+            [digest, str(start), str(end), wellness_score, mode, model_key]
+        ).encode("utf-8")).hexdigest()
+
+    def _score(self, hist_json, start, end, wellness_score, mode, models):
+        with timed("features"):
+            hist_days, hist_earnings = parse_history(hist_json)
+        return self._score_history(hist_days, hist_earnings, start, end, wellness_score, mode, models)
+
+    def _score_history(self, hist_days, hist_earnings, start, end, wellness_score, mode, models, rolling=None):
+        if mode == "recursive":
+            with timed("forecast_recursive"):
+                X_pred = recursive_from_history(
+                    hist_days, hist_earnings, start, end, wellness_score, models["earnings"], models["hours"]
+                )
+        else:
+            with timed("features"):
+                X_pred = features_from_history(hist_days, hist_earnings, start, end, wellness_score, rolling)
+            with timed("predict"):
+                predict_forecast(X_pred, models["earnings"], models["hours"])
+        with timed("serialize"):
+            return format_predictions(X_pred)
+
+    def _find_state(self, digest, prefixes, model_key):
+        """Return (state, logs appended since it) for the longest known prefix."""
+        state = self.states.get(f"{model_key}:{digest}")
+        if state is not None:
+            return state, 0
+        for dropped in sorted(prefixes):
+            state = self.states.get(f"{model_key}:{prefixes[dropped]}")
+            if state is not None:
+                return state, dropped
+        return None, None
+
+    def _score_from_prefix(self, hist_json, digest, prefixes, model_key, start, end, wellness_score, models):
+        state, appended = self._find_state(digest, prefixes, model_key)
+        self._count("misses" if state is None else "prefix_hits")
+
+        with timed("features"):
+            if state is None:
+                hist_days, hist_earnings = parse_history(hist_json)
+            elif appended:
+                new_days, new_earnings = parse_history(hist_json[-appended:])
+                hist_days = np.concatenate([state.hist_days, new_days])
+                hist_earnings = np.concatenate([state.hist_earnings, new_earnings])
+                # Stable, so equal days keep request order, exactly as parse_history would
+                order = np.argsort(hist_days, kind='stable')
+                hist_days, hist_earnings = hist_days[order], hist_earnings[order]
+            else:
+                hist_days, hist_earnings = state.hist_days, state.hist_earnings
+            X_pred = features_from_history(hist_days, hist_earnings, start, end, wellness_score)
+
+        with timed("predict"):
+            predict_forecast(X_pred, models["earnings"], models["hours"])
+
+        self.states.set(f"{model_key}:{digest}", ForecastState(hist_days, hist_earnings))
+        with timed("serialize"):
+            return format_predictions(X_pred)
+
+    def stats(self):
+        lookups = self.hits + self.prefix_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.results),
+            "states": len(self.states),
+            "hits": self.hits,
+            "prefix_hits": self.prefix_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes": self.results.bytes,
+            "state_bytes": self.states.bytes,
+        }
+
+
+def forecast_cache_from_env():
+    """
+    FORECAST_CACHE: "on" (default) or "off"
+    FORECAST_CACHE_MAX_ENTRIES: LRU bound on cached responses
+    FORECAST_CACHE_MAX_STATES: LRU bound on parsed histories
+    FORECAST_CACHE_MAX_MB / FORECAST_CACHE_MAX_STATE_MB: approximate memory bounds of each
+    FORECAST_CACHE_TTL: lifetime of both in seconds
+    """
+    return ForecastCache(
+        max_entries=int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "1000")),
+        max_states=int(os.getenv("FORECAST_CACHE_MAX_STATES", "1000")),
+        ttl=float(os.getenv("FORECAST_CACHE_TTL", "3600")),
+        max_bytes=int(float(os.getenv("FORECAST_CACHE_MAX_MB", "64")) * (1 << 20)),
+        max_state_bytes=int(float(os.getenv("FORECAST_CACHE_MAX_STATE_MB", "16")) * (1 << 20)),
+        enabled=os.getenv("FORECAST_CACHE", "on") != "off",
+    )
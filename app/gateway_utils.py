@@ -0,0 +1,316 @@
+import asyncio
+import atexit
+import json
+import math
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+GENERATION_PATH = "/services/aigc/text-generation/generation"
+
+
+def load_client():
+    """aiohttp, imported when a gateway first opens its session rather than with the app."""
+    import aiohttp
+
+    return aiohttp
+
+
+class GatewayOverloaded(Exception):
+    """An endpoint's LLM queue is full; the request should be retried later."""
+
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f"LLM queue for '{endpoint}' is full, retry in {retry_after}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def parse_body(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return {"code": "InvalidResponse", "message": text[:200]}
+
+
+def to_namespace(value):
+    """Turn a decoded JSON body into attribute-access objects like the dashscope SDK returns."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: to_namespace(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(v) for v in value]
+    return value
+
+
+def to_response(status, body):
+    """Shape a raw text-generation reply like a dashscope GenerationResponse."""
+    ok = status == 200 and "output" in body
+    return SimpleNamespace(
+        status_code=status,
+        request_id=body.get("request_id", ""),
+        code=body.get("code", ""),
+        message=body.get("message", ""),
+        output=to_namespace(body["output"]) if ok else None,
+        usage=to_namespace(body.get("usage") or {}),
+    )
+
+
+class GatewayStream:
+    """
+    Incremental responses of one streaming call, read from the gateway loop.
+    The call holds its endpoint queue slot and concurrency permit until the
+    stream ends or close() is called, e.g. when the client disconnects.
+    """
+
+    def __init__(self, gateway, future, chunks, endpoint, started, timeout):
+        self._gateway = gateway
+        self._future = future
+        self._chunks = chunks
+        self._endpoint = endpoint
+        self._started = started
+        self._deadline = started + timeout
+        self._timeout = timeout
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            item = self._chunks.get(timeout=max(0.0, self._deadline - time.monotonic()))
+        except queue.Empty:
+            self.close()
+            raise TimeoutError(f"LLM stream exceeded its {self._timeout:.1f}s timeout")
+        if item is None:
+            try:
+                # The coroutine finishes right after its sentinel; raises whatever ended it early
+                self._future.result(max(1.0, self._deadline - time.monotonic()))
+            finally:
+                self.close()
+            raise StopIteration
+        return to_response(*item)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._future.cancel()
+        self._gateway._release(self._endpoint, self._started)
+
+    def __del__(self):
+        # A stream dropped without being read still gives its slot back
+        self.close()
+
+
+class LLMGateway:
+    """
+    Runs LLM HTTP calls on one asyncio loop in a background thread.
+    Request threads hand over a call and wait for its result, so many completions
+    can be in flight from a single worker while a pooled aiohttp session reuses
+    keep-alive connections. Streaming calls share the same pool and limits.
+    A global semaphore caps upstream concurrency and every endpoint has a bound on
+    requests waiting or in flight; past it calls fail fast with GatewayOverloaded.
+
+    A WSGI request thread still waits for its LLM reply, so `total_queue_limit`
+    bounds the calls waiting or in flight across all endpoints: keep it below the
+    gunicorn thread count and the remaining threads always serve other routes.
+    """
+
+    def __init__(self, base_url, max_concurrency=16, queue_limit=32, queue_limits=None, default_timeout=120,
+                 total_queue_limit=None):
+        self.url = base_url.rstrip("/") + GENERATION_PATH
+        self.max_concurrency = max_concurrency
+        self.queue_limit = queue_limit
+        self.queue_limits = queue_limits or {}
+        self.default_timeout = default_timeout
+        self.total_queue_limit = total_queue_limit
+
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._shed = defaultdict(int)
+        self._in_flight = 0
+        self._avg_latency = 1.0
+        self._loop = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Started lazily so each forked worker gets its own loop and connection pool
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+            asyncio.run_coroutine_threadsafe(self._open(), loop).result()
+            self._loop = loop
+            self._pid = os.getpid()
+            atexit.register(self.close)
+            return loop
+
+    def close(self):
+        """Close pooled connections and stop the loop thread."""
+        loop, self._loop = self._loop, None
+        if loop is None or self._pid != os.getpid():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result(5)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+
+    async def _open(self):
+        aiohttp = load_client()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60),
+        )
+
+    def _headers(self, stream=False):
+        headers = {"Authorization": f"Bearer {os.getenv('MODEL_STUDIO_KEY', '')}"}
+        if stream:
+            headers["X-DashScope-SSE"] = "enable"
+        return headers
+
+    async def _post(self, payload, timeout):
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                async with self._session.post(
+                    self.url,
+                    json=payload,
+                    headers=self._headers(),
+                    timeout=load_client().ClientTimeout(total=timeout),
+                ) as resp:
+                    return resp.status, parse_body(await resp.text())
+            finally:
+                self._in_flight -= 1
+
+    async def _post_stream(self, payload, timeout, chunks):
+        """Put (status, body) of every server-sent event on `chunks`, then None."""
+        try:
+            async with self._semaphore:
+                self._in_flight += 1
+                try:
+                    async with self._session.post(
+                        self.url,
+                        json=payload,
+                        headers=self._headers(stream=True),
+                        timeout=load_client().ClientTimeout(total=timeout),
+                    ) as resp:
+                        if resp.content_type != "text/event-stream":
+                            chunks.put((resp.status, parse_body(await resp.text())))
+                            return
+                        status = resp.status
+                        async for raw in resp.content:
+                            line = raw.decode("utf-8").strip()
+                            # dashscope sends each event's own status as ":HTTP_STATUS/<code>"
+                            if line.startswith(":HTTP_STATUS/"):
+                                status = int(line.split("/", 1)[1])
+                            elif line.startswith("data:"):
+                                chunks.put((status, parse_body(line[5:])))
+                finally:
+                    self._in_flight -= 1
+        finally:
+            chunks.put(None)
+
+    def _retry_after(self, endpoint):
+        waiting = self._pending[endpoint]
+        return max(1, math.ceil(self._avg_latency * waiting / self.max_concurrency))
+
+    def _admit(self, endpoint):
+        """Take a queue slot for `endpoint` or raise GatewayOverloaded; returns the start time."""
+        limit = self.queue_limits.get(endpoint, self.queue_limit)
+        with self._lock:
+            full = self._pending[endpoint] >= limit
+            if not full and self.total_queue_limit is not None:
+                full = sum(self._pending.values()) >= self.total_queue_limit
+            if full:
+                self._shed[endpoint] += 1
+                raise GatewayOverloaded(endpoint, self._retry_after(endpoint))
+            self._pending[endpoint] += 1
+        return time.monotonic()
+
+    def _release(self, endpoint, started):
+        with self._lock:
+            self._pending[endpoint] -= 1
+            self._avg_latency = 0.9 * self._avg_latency + 0.1 * (time.monotonic() - started)
+
+    def _payload(self, messages, model, stream=False):
+        parameters = {"result_format": "message"}
+        if stream:
+            parameters["incremental_output"] = True
+        return {"model": model, "input": {"messages": messages}, "parameters": parameters}
+
+    def call(self, messages, model="qwen-plus", endpoint="default", timeout=None):
+        """
+        Blocking text-generation call through the shared loop.
+        Returns a dashscope-shaped response; raises GatewayOverloaded when the
+        endpoint's queue is full and TimeoutError when `timeout` passes.
+        """
+        timeout = timeout or self.default_timeout
+        started = self._admit(endpoint)
+        try:
+            loop = self._ensure_started()
+            future = asyncio.run_coroutine_threadsafe(self._post(self._payload(messages, model), timeout), loop)
+            try:
+                status, body = future.result(timeout)
+            except Exception:
+                future.cancel()
+                raise
+        finally:
+            self._release(endpoint, started)
+        return to_response(status, body)
+
+    def stream(self, messages, model="qwen-plus", endpoint="default", timeout=None):
+        """
+        Streaming text-generation call through the shared loop, under the same
+        limits as call(). Admission happens here, before anything is sent, so a full
+        queue raises GatewayOverloaded to the caller rather than inside the stream.
+        Returns a GatewayStream of incremental dashscope-shaped responses.
+        """
+        timeout = timeout or self.default_timeout
+        started = self._admit(endpoint)
+        try:
+            loop = self._ensure_started()
+            chunks = queue.Queue()
+            future = asyncio.run_coroutine_threadsafe(
+                self._post_stream(self._payload(messages, model, stream=True), timeout, chunks), loop
+            )
+        except Exception:
+            self._release(endpoint, started)
+            raise
+        return GatewayStream(self, future, chunks, endpoint, started, timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "total_queue_limit": self.total_queue_limit,
+                "in_flight": self._in_flight,
+                "pending": dict(self._pending),
+                "shed": dict(self._shed),
+                "avg_latency_s": self._avg_latency,
+            }
+
+
+def gateway_from_env(base_url):
+    """
+    LLM_MAX_CONCURRENCY: upstream calls in flight per worker
+    LLM_QUEUE_LIMIT: requests waiting or in flight per endpoint before shedding
+    LLM_QUEUE_LIMITS: JSON object of per-endpoint overrides, e.g. {"chatbot": 8}
+    LLM_TOTAL_QUEUE_LIMIT: requests waiting or in flight across all endpoints, i.e. the
+        most request threads the LLM can hold; keep it below gunicorn's --threads
+    LLM_TIMEOUT_SECONDS: timeout for calls that do not bring their own deadline
+    """
+    queue_limits = os.getenv("LLM_QUEUE_LIMITS")
+    total_queue_limit = os.getenv("LLM_TOTAL_QUEUE_LIMIT", "24")
+    return LLMGateway(
+        base_url,
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+        queue_limit=int(os.getenv("LLM_QUEUE_LIMIT", "32")),
+        queue_limits=json.loads(queue_limits) if queue_limits else None,
+        default_timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "120")),
+        total_queue_limit=int(total_queue_limit) if total_queue_limit != "off" else None,
+    )
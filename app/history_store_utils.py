@@ -0,0 +1,221 @@
+import datetime
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .regressor_utils import N_LAGS
+
+LOG_FIELDS = ("total_earnings", "total_trips", "total_distance", "total_fare", "total_tip")
+
+
+class UnknownDriver(Exception):
+    pass
+
+
+def session_day(timestamp):
+    """Calendar day (YYYY-MM-DD) of a session timestamp such as '2025-04-24 16:20:07'."""
+    return datetime.datetime.fromisoformat(str(timestamp)).date().isoformat()
+
+
+class HistoryStore:
+    """
+    Daily logs of every driver in a local SQLite file, clustered on (driver_id, day)
+    so a forecast reads only the rows its features need through the primary key.
+    A day is stored once per driver; ingesting it again replaces it.
+    Raw sessions can be folded into the daily totals with add_sessions().
+    Every write bumps a per-driver revision so in-memory state built from the
+    store can tell when another worker changed it.
+    """
+
+    def __init__(self, path, table="driver_daily_logs"):
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        columns = ", ".join(f"{field} REAL" for field in LOG_FIELDS)
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f" driver_id TEXT NOT NULL, day TEXT NOT NULL, {columns},"
+                " PRIMARY KEY (driver_id, day)) WITHOUT ROWID"
+            )
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table}_sessions ("
+                " driver_id TEXT NOT NULL, timestamp TEXT NOT NULL,"
+                " earnings REAL, rides_completed REAL, hours_worked REAL,"
+                " PRIMARY KEY (driver_id, timestamp)) WITHOUT ROWID"
+            )
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table}_revisions ("
+                " driver_id TEXT PRIMARY KEY, revision INTEGER NOT NULL) WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        # One connection per thread (and per process, since workers fork after init)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def ingest(self, driver_id, logs):
+        """
+        Insert or replace daily logs ({"day": "YYYY-MM-DD", "total_earnings": ..., ...})
+        of one driver. Raises ValueError on a malformed day. Returns the number of rows written.
+        """
+        rows = []
+        for log in logs:
+            day = datetime.date.fromisoformat(str(log.get("day"))[:10]).isoformat()
+            values = [log.get(field) for field in LOG_FIELDS]
+            rows.append([str(driver_id), day] + [None if v is None else float(v) for v in values])
+        if not rows:
+            return 0
+
+        placeholders = ", ".join("?" * (2 + len(LOG_FIELDS)))
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (driver_id, day, {', '.join(LOG_FIELDS)})"
+                f" VALUES ({placeholders})",
+                rows,
+            )
+            self._bump(conn, driver_id)
+        return len(rows)
+
+    def _bump(self, conn, driver_id):
+        return conn.execute(
+            f"INSERT INTO {self.table}_revisions (driver_id, revision) VALUES (?, 1)"
+            " ON CONFLICT (driver_id) DO UPDATE SET revision = revision + 1 RETURNING revision",
+            (str(driver_id),),
+        ).fetchone()[0]
+
+    def revision(self, driver_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT revision FROM {self.table}_revisions WHERE driver_id = ?", (str(driver_id),)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def add_sessions(self, driver_id, sessions):
+        """
+        Fold work sessions ({"timestamp", "earnings", "rides_completed", "hours_worked"})
+        into the driver's daily totals, in any order. A session already seen (same
+        driver and timestamp) is ignored, so redelivered batches are not double counted.
+        Raises ValueError on a malformed timestamp.
+        Returns (revision, {day: (earnings added, rides added)}, sessions counted).
+        """
+        rows = []
+        for session in sessions:
+            timestamp = str(session.get("timestamp"))
+            day = session_day(timestamp)
+            values = [session.get(field) for field in ("earnings", "rides_completed", "hours_worked")]
+            rows.append((day, timestamp, *[0.0 if v is None else float(v) for v in values]))
+
+        deltas = {}
+        counted = 0
+        with self._connect() as conn:
+            for day, timestamp, earnings, rides, hours in rows:
+                inserted = conn.execute(
+                    f"INSERT OR IGNORE INTO {self.table}_sessions"
+                    " (driver_id, timestamp, earnings, rides_completed, hours_worked) VALUES (?, ?, ?, ?, ?)",
+                    (str(driver_id), timestamp, earnings, rides, hours),
+                ).rowcount
+                if inserted:
+                    counted += 1
+                    total = deltas.get(day, (0.0, 0.0))
+                    deltas[day] = (total[0] + earnings, total[1] + rides)
+
+            conn.executemany(
+                f"INSERT INTO {self.table} (driver_id, day, total_earnings, total_trips) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (driver_id, day) DO UPDATE SET"
+                " total_earnings = COALESCE(total_earnings, 0) + excluded.total_earnings,"
+                " total_trips = COALESCE(total_trips, 0) + excluded.total_trips",
+                [(str(driver_id), day, earnings, rides) for day, (earnings, rides) in deltas.items()],
+            )
+            revision = self._bump(conn, driver_id) if deltas else self.revision(driver_id)
+        return revision, deltas, counted
+
+    def tail(self, driver_id, n=N_LAGS):
+        """
+        The driver's last `n` logged days as (revision, [(day, total_earnings), ...]),
+        oldest first, read in one transaction.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            rows = conn.execute(
+                f"SELECT day, total_earnings FROM {self.table} WHERE driver_id = ? ORDER BY day DESC LIMIT ?",
+                (str(driver_id), n),
+            ).fetchall()
+            row = conn.execute(
+                f"SELECT revision FROM {self.table}_revisions WHERE driver_id = ?", (str(driver_id),)
+            ).fetchone()
+        return (row[0] if row else 0), rows[::-1]
+
+    def window(self, driver_id, forecast_start, forecast_end):
+        """
+        The part of a driver's history that features for [forecast_start, forecast_end]
+        depend on, as sorted (days datetime64[ns], total_earnings float64) arrays like
+        parse_history returns:
+        - every day from N_LAGS days before the start up to the day before the end (lags),
+        - the latest day before that range (as-of lag fallback),
+        - the last N_LAGS days overall (rolling stats).
+        Raises UnknownDriver when the driver has no logs.
+        """
+        low = (pd.Timestamp(forecast_start) - pd.Timedelta(days=N_LAGS)).strftime("%Y-%m-%d")
+        high = (pd.Timestamp(forecast_end) - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT day, total_earnings FROM {self.table}"
+                f" WHERE driver_id = :driver AND day BETWEEN :low AND :high"
+                f" UNION SELECT * FROM (SELECT day, total_earnings FROM {self.table}"
+                f"  WHERE driver_id = :driver AND day < :low ORDER BY day DESC LIMIT 1)"
+                f" UNION SELECT * FROM (SELECT day, total_earnings FROM {self.table}"
+                f"  WHERE driver_id = :driver ORDER BY day DESC LIMIT :tail)"
+                f" ORDER BY day",
+                {"driver": str(driver_id), "low": low, "high": high, "tail": N_LAGS},
+            ).fetchall()
+
+        if not rows:
+            raise UnknownDriver(f"No history for driver {driver_id}")
+        days = np.array([row[0] for row in rows], dtype="datetime64[ns]")
+        earnings = np.array([row[1] for row in rows], dtype=np.float64)
+        return days, earnings
+
+    def logs(self, driver_id, since=None):
+        """A driver's stored daily logs, oldest first, optionally from `since` (YYYY-MM-DD) on."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"SELECT day, {', '.join(LOG_FIELDS)} FROM {self.table}"
+                f" WHERE driver_id = ? AND day >= ? ORDER BY day",
+                (str(driver_id), since or ""),
+            )
+            return [dict(zip(("day",) + LOG_FIELDS, row)) for row in cursor.fetchall()]
+
+    def delete(self, driver_id):
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table}_sessions WHERE driver_id = ?", (str(driver_id),))
+            self._bump(conn, driver_id)
+            return conn.execute(f"DELETE FROM {self.table} WHERE driver_id = ?", (str(driver_id),)).rowcount
+
+    def stats(self):
+        with self._connect() as conn:
+            drivers, rows = conn.execute(
+                f"SELECT COUNT(DISTINCT driver_id), COUNT(*) FROM {self.table}"
+            ).fetchone()
+        return {"backend": "sqlite", "drivers": drivers, "rows": rows}
+
+
+def history_store_from_env():
+    """
+    HISTORY_STORE: "sqlite" (default) or "off"
+    HISTORY_STORE_PATH: SQLite file holding the daily logs
+    """
+    kind = os.getenv("HISTORY_STORE", "sqlite")
+    if kind == "off":
+        return None
+    if kind != "sqlite":
+        raise ValueError(f"Unknown HISTORY_STORE: {kind}")
+    return HistoryStore(os.getenv("HISTORY_STORE_PATH", "./driver_history.sqlite3"))
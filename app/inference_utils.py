@@ -0,0 +1,242 @@
+import json
+import weakref
+
+import numpy as np
+
+SUPPORTED_OBJECTIVES = ("reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror")
+
+
+class TreeEnsemble:
+    """
+    Flat NumPy export of an XGBoost regression booster.
+    All trees are concatenated into one set of node arrays and every row walks
+    every tree at once, one tree level per step, straight from a float32 matrix.
+    Split nodes send a row left when x < threshold, or when x is NaN and the
+    node defaults left; leaves have an infinite threshold and point to themselves.
+    NumPy pays per tree level and row what XGBoost's C++ loop does not, so this
+    is a small-batch path: it beats the booster's per-call overhead below about
+    50 rows with the 750-tree models, and is 2-3x slower than it on a 365-row
+    forecast. With `large_batch_model` set, matrices over LARGE_BATCH_ROWS rows
+    are delegated to that model instead. The node arrays are small (about 0.2 MB
+    per bundled model), but they come on top of the booster, not instead of it.
+    """
+
+    # Rows evaluated at once: bounds the (rows x trees) node and value temporaries
+    # (about 8 bytes per tree and row each) and keeps them in cache
+    BLOCK_ROWS = 256
+    LARGE_BATCH_ROWS = 64
+
+    def __init__(self, feature, threshold, left, default_left, value, roots, base_score, max_depth,
+                 n_features, feature_names=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.base_score = base_score
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.feature_names = feature_names
+        self.large_batch_model = None
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Export an `xgboost.Booster` (or anything with `get_booster()`)."""
+        if hasattr(booster, "get_booster"):
+            booster = booster.get_booster()
+
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in SUPPORTED_OBJECTIVES:
+            raise ValueError(f"Unsupported objective for native backend: {objective}")
+
+        gbm = learner["gradient_booster"]
+        if gbm["name"] != "gbtree":
+            raise ValueError(f"Unsupported booster for native backend: {gbm['name']}")
+        if int(learner["learner_model_param"].get("num_target", "1")) > 1:
+            raise ValueError("Multi-target models are not supported by the native backend")
+
+        trees = gbm["model"]["trees"]
+        best_iteration = booster.attributes().get("best_iteration")
+        if best_iteration is not None:
+            num_parallel_tree = int(gbm["model"]["gbtree_model_param"]["num_parallel_tree"])
+            trees = trees[:(int(best_iteration) + 1) * num_parallel_tree]
+
+        feature, threshold, left, default_left, value, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported by the native backend")
+
+            lc = np.asarray(tree["left_children"], dtype=np.int32)
+            rc = np.asarray(tree["right_children"], dtype=np.int32)
+            is_leaf = lc == -1
+            if np.any(rc[~is_leaf] != lc[~is_leaf] + 1):
+                raise ValueError("Expected right children to directly follow left children")
+            cond = np.asarray(tree["split_conditions"], dtype=np.float32)
+            node_ids = np.arange(len(lc), dtype=np.int32) + offset
+
+            # Leaves always "go left" to themselves so finished rows stay put
+            feature.append(np.where(is_leaf, 0, tree["split_indices"]).astype(np.int32))
+            threshold.append(np.where(is_leaf, np.inf, cond).astype(np.float32))
+            left.append(np.where(is_leaf, node_ids, lc + offset))
+            default_left.append(is_leaf | np.asarray(tree["default_left"], dtype=bool))
+            value.append(np.where(is_leaf, cond, 0.0).astype(np.float32))
+            roots.append(offset)
+
+            max_depth = max(max_depth, _tree_depth(lc, rc))
+            offset += len(lc)
+
+        base_score = learner["learner_model_param"]["base_score"]
+        base_score = float(json.loads(base_score)[0] if base_score.startswith("[") else base_score)
+
+        return cls(
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            left=np.concatenate(left),
+            default_left=np.concatenate(default_left),
+            value=np.concatenate(value),
+            roots=np.asarray(roots, dtype=np.int32),
+            base_score=base_score,
+            max_depth=max_depth,
+            n_features=int(learner["learner_model_param"]["num_feature"]),
+            feature_names=learner.get("feature_names") or None,
+        )
+
+    def predict(self, X):
+        """
+        Predict for a 2-D feature matrix with columns in training order.
+        NaN is treated as missing and follows each node's default direction.
+        Rows are evaluated in blocks of BLOCK_ROWS, so memory does not grow with the batch.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError("Expected a 2-D feature matrix")
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        if self.large_batch_model is not None and X.shape[0] > self.LARGE_BATCH_ROWS:
+            return self.large_batch_model.predict(X)
+        out = np.empty(X.shape[0], dtype=np.float32)
+        for start in range(0, X.shape[0], self.BLOCK_ROWS):
+            block = X[start:start + self.BLOCK_ROWS]
+            out[start:start + len(block)] = self._predict_block(block)
+        return out
+
+    def predict_row(self, x):
+        """
+        Predict a single row given as a 1-D float32 array, e.g. one step of a
+        recursive forecast. Skips the validation and blocking of predict, and the
+        missing-value test when the row has no NaN, which halves the cost per row.
+        """
+        node = self.roots
+        missing = np.isnan(x).any()
+        for _ in range(self.max_depth):
+            v = x.take(self.feature.take(node))
+            go_left = v < self.threshold.take(node)
+            if missing:
+                go_left |= np.isnan(v) & self.default_left.take(node)
+            node = self.left.take(node) + ~go_left
+        return float(self.value.take(node).sum(dtype=np.float64) + self.base_score)
+
+    def _predict_block(self, X):
+        # Row-major offsets so the feature lookup is a single flat take
+        flat = X.ravel()
+        row_offsets = (np.arange(X.shape[0], dtype=np.int32) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            x = flat.take(row_offsets + self.feature.take(node))
+            go_left = (x < self.threshold.take(node)) | (np.isnan(x) & self.default_left.take(node))
+            # Right child is always left + 1
+            node = self.left.take(node) + ~go_left
+
+        margin = self.value.take(node).sum(axis=1, dtype=np.float64) + self.base_score
+        return margin.astype(np.float32)
+
+
+def _tree_depth(left_children, right_children):
+    depth = np.zeros(len(left_children), dtype=np.int32)
+    # Children always have larger ids than their parent
+    for nid in range(len(left_children)):
+        if left_children[nid] != -1:
+            depth[left_children[nid]] = depth[nid] + 1
+            depth[right_children[nid]] = depth[nid] + 1
+    return int(depth.max())
+
+
+def parity_rows(ensemble, n_rows=512, seed=0):
+    """
+    Synthetic rows that exercise the split thresholds of every feature,
+    including values exactly on a threshold and missing values.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n_rows, ensemble.n_features), dtype=np.float32)
+    for f in range(ensemble.n_features):
+        cuts = ensemble.threshold[(ensemble.feature == f) & np.isfinite(ensemble.threshold)]
+        if len(cuts) == 0:
+            continue
+        picks = rng.choice(cuts, n_rows)
+        X[:, f] = picks + rng.choice([-1.0, 0.0, 1.0], n_rows) * np.abs(picks) * 1e-3
+    X[rng.random(X.shape) < 0.05] = np.nan
+    return X
+
+
+def check_parity(model, ensemble, n_rows=512, rtol=1e-4, atol=1e-2):
+    """
+    Compare the native ensemble against the original model on synthetic rows.
+    Raises RuntimeError on mismatch.
+    """
+    X = parity_rows(ensemble, n_rows)
+    expected = model.predict(X)
+    actual = ensemble.predict(X)
+    if not np.allclose(actual, expected, rtol=rtol, atol=atol):
+        worst = float(np.max(np.abs(actual - expected)))
+        raise RuntimeError(f"Native backend does not match model predictions (max abs diff {worst})")
+    return True
+
+
+# Row-at-a-time exports of the models used with the xgboost backend, built on first use
+_row_exports = weakref.WeakKeyDictionary()
+
+
+def row_predictor(model):
+    """
+    Return a function scoring one 1-D float32 row with `model`.
+    XGBoost pays about half a millisecond of call overhead per predict, so unless
+    the model already is a TreeEnsemble it is exported (and parity-checked) once
+    and cached for the lifetime of the model; models the native backend cannot
+    export fall back to predict on a 1-row matrix.
+    """
+    if isinstance(model, TreeEnsemble):
+        return model.predict_row
+    ensemble = _row_exports.get(model)
+    if ensemble is None:
+        try:
+            ensemble = TreeEnsemble.from_booster(model)
+            check_parity(model, ensemble)
+        except (ValueError, RuntimeError, AttributeError):
+            ensemble = False
+        _row_exports[model] = ensemble
+    if ensemble is False:
+        return lambda x: float(model.predict(x[None, :])[0])
+    return ensemble.predict_row
+
+
+def select_backend(model, backend="xgboost"):
+    """
+    Return the object used for inference: the model itself for "xgboost",
+    or a parity-checked TreeEnsemble export of it for "native", which walks
+    matrices of up to LARGE_BATCH_ROWS rows itself and hands larger ones back
+    to the model. "native" trades memory (the booster is kept alongside the
+    node arrays) for lower latency on small batches, i.e. short forecast
+    windows; it is not faster on large ones.
+    """
+    if backend == "xgboost":
+        return model
+    if backend == "native":
+        ensemble = TreeEnsemble.from_booster(model)
+        check_parity(model, ensemble)
+        ensemble.large_batch_model = model
+        return ensemble
+    raise ValueError(f"Unknown inference backend: {backend}")
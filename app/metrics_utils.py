@@ -0,0 +1,242 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond feature work up to slow LLM retries
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) for the text exposition."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", key, (), value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in items:
+            for bound, n in zip(self.buckets, counts):
+                yield "_bucket", key, (("le", _number(float(bound))),), n
+            yield "_bucket", key, (("le", "+Inf"),), count
+            yield "_sum", key, (), total
+            yield "_count", key, (), count
+
+
+class MetricsRegistry:
+    """
+    Metrics of one worker process in the Prometheus text format.
+    Besides the metrics it owns, collectors registered with add_collector() are
+    called at scrape time to export counters that other modules already keep.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collect):
+        """`collect()` returns an iterable of metrics, e.g. built with stats_metric()."""
+        self._collectors.append(collect)
+
+    def render(self):
+        metrics = list(self._metrics)
+        for collect in self._collectors:
+            metrics.extend(collect())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, key, extra, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_labels(metric.labelnames, key, extra)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def stats_metric(name, kind, help, values, labelname=None):
+    """
+    Wrap a number, or a {label value: number} dict when `labelname` is given,
+    from an existing stats() snapshot as a counter or gauge for a collector.
+    """
+    metric = Counter(name, help) if kind == "counter" else Gauge(name, help)
+    if labelname is None:
+        metric._values[()] = values
+    else:
+        metric.labelnames = (labelname,)
+        metric._values = {(str(label),): value for label, value in values.items()}
+    return metric
+
+
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram(
+    "fairleap_http_request_duration_seconds", "HTTP request latency", ("route", "method", "status")
+)
+REQUESTS_IN_FLIGHT = metrics.gauge(
+    "fairleap_http_requests_in_flight", "HTTP requests being handled", ("route",)
+)
+STAGE_SECONDS = metrics.histogram(
+    "fairleap_stage_duration_seconds", "Latency of one stage of a request", ("route", "stage")
+)
+LLM_CALLS = metrics.counter(
+    "fairleap_llm_calls_total", "Upstream LLM calls by outcome", ("endpoint", "status")
+)
+LLM_TOKENS = metrics.counter(
+    "fairleap_llm_tokens_total", "LLM tokens reported by the upstream API", ("endpoint", "kind")
+)
+
+
+class RequestTrace:
+    """Stage timings of the request being handled, for the Server-Timing header."""
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.stages = []
+
+    def server_timing(self):
+        """Header value with per-stage totals (repeated stages such as retries are summed)."""
+        totals = {}
+        for stage, seconds in self.stages:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        totals["total"] = time.perf_counter() - self.started
+        return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in totals.items())
+
+
+_current_trace = contextvars.ContextVar("fairleap_request_trace", default=None)
+
+
+def start_trace(route):
+    trace = RequestTrace(route)
+    _current_trace.set(trace)
+    return trace
+
+
+def use_trace(trace):
+    """Attach an existing trace to the current context, e.g. inside a streamed response body."""
+    _current_trace.set(trace)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def end_trace():
+    _current_trace.set(None)
+
+
+def record_stage(stage, seconds):
+    """Observe a stage duration under the current request's route."""
+    trace = _current_trace.get()
+    STAGE_SECONDS.observe(seconds, route=trace.route if trace else "none", stage=stage)
+    if trace is not None:
+        trace.stages.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block, or a function when used as a decorator, as one stage of the current request:
+
+        with timed("features"):
+            ...
+
+        @timed("llm_call")
+        def call(...):
+            ...
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import joblib
+
+from .inference_utils import select_backend
+
+
+class ModelEntry:
+    """A loaded model together with the artifact it came from."""
+
+    def __init__(self, name, path, version, mtime, model):
+        self.name = name
+        self.path = path
+        self.version = version
+        self.mtime = mtime
+        self.model = model
+        self.loaded_at = time.time()
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "path": self.path,
+            "version": self.version,
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.loaded_at)),
+        }
+
+
+def resolve_artifact(path):
+    """
+    A model path is either a single .pkl file or a directory of versioned
+    artifacts, in which case the last one in name order wins
+    (e.g. earnings_model-20250601.pkl over earnings_model-20250501.pkl).
+    """
+    if os.path.isdir(path):
+        candidates = sorted(f for f in os.listdir(path) if f.endswith(".pkl"))
+        if not candidates:
+            raise FileNotFoundError(f"No .pkl artifacts in {path}")
+        return os.path.join(path, candidates[-1])
+    return path
+
+
+def artifact_version(path):
+    """
+    Version from the artifact's metadata sidecar (<artifact>.json) when present,
+    otherwise a content hash of the artifact itself.
+    """
+    meta_path = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            version = json.load(f).get("version")
+        if version:
+            return str(version)
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class ModelRegistry:
+    """
+    Named models loaded from per-model paths.
+    Reloads build a complete new set of entries and swap it in with a single
+    assignment, so a request that took a snapshot always sees one consistent
+    version of every model. A failed reload keeps serving the old models.
+    Models are loaded by load_all(), or else on the first snapshot.
+
+    Every gunicorn worker has its own registry, so a reload requested from one
+    worker is published to `signal_path`; the others see the file change on
+    their next snapshot and reload in a background thread, serving the current
+    models until the new set is swapped in. Models loaded after the fork are
+    private to each worker rather than shared copy-on-write with the master:
+    a reload costs every worker the size of the loaded set (about 8 MB for the
+    two bundled models, plus 0.4 MB of node arrays with the native backend,
+    which keeps the boosters for large batches), and twice that while requests
+    still hold the old snapshot.
+    """
+
+    def __init__(self, paths, backend="xgboost", reload_interval=0, signal_path=None):
+        self.paths = dict(paths)
+        self.backend = backend
+        self.reload_interval = reload_interval
+        self.signal_path = signal_path
+        self.last_error = None
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self._background = None
+        # Reloads published before this process started are already on disk
+        self._signal_mtime = self._signal_stat()
+        self._generation = (self._read_signal() or {}).get("generation")
+
+    def _load(self, name):
+        path = resolve_artifact(self.paths[name])
+        try:
+            mtime = os.path.getmtime(path)
+            model = select_backend(joblib.load(path), self.backend)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load {name} model from {path}: {e}")
+        return ModelEntry(name, path, artifact_version(path), mtime, model)
+
+    def _is_stale(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            return True
+        path = resolve_artifact(self.paths[name])
+        return path != entry.path or os.path.getmtime(path) != entry.mtime
+
+    def load_all(self):
+        """Load every model eagerly (call before workers fork to share them)."""
+        return self.reload(force=True)
+
+    def ensure_loaded(self):
+        """Load the models that are not loaded yet; a no-op once they all are."""
+        if len(self._entries) == len(self.paths):
+            return []
+        return self.reload()
+
+    def reload(self, force=False):
+        """
+        Reload models whose artifact changed (or all of them with force=True).
+        Returns the names that were swapped in.
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            stale = [name for name in self.paths if force or self._is_stale(name)]
+            if not stale:
+                return []
+            entries = dict(self._entries)
+            for name in stale:
+                entries[name] = self._load(name)
+            self._entries = entries
+            self.last_error = None
+            return stale
+
+    def _signal_stat(self):
+        if not self.signal_path:
+            return None
+        try:
+            return os.stat(self.signal_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read_signal(self):
+        if not self.signal_path:
+            return None
+        try:
+            with open(self.signal_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def publish_reload(self, force=False):
+        """Tell the other workers sharing `signal_path` to reload (with force=True, everything)."""
+        if not self.signal_path:
+            return False
+        generation = f"{os.getpid()}-{time.time_ns()}"
+        tmp_path = f"{self.signal_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"generation": generation, "force": bool(force)}, f)
+        os.replace(tmp_path, self.signal_path)
+        # This worker has already reloaded; don't pick up its own signal
+        self._generation = generation
+        self._signal_mtime = self._signal_stat()
+        return True
+
+    def _poll_signal(self):
+        """The `force` flag of a reload published since the last poll, or None."""
+        mtime = self._signal_stat()
+        if mtime is None or mtime == self._signal_mtime:
+            return None
+        self._signal_mtime = mtime
+        signal = self._read_signal()
+        if not signal or signal.get("generation") == self._generation:
+            return None
+        self._generation = signal.get("generation")
+        return bool(signal.get("force"))
+
+    def reload_in_background(self, force=False):
+        """Start reload(force) on a background thread unless one is running. Returns the thread or None."""
+        if self._background is not None and self._background.is_alive():
+            return None
+
+        def run():
+            try:
+                self.reload(force=force)
+            except Exception as e:
+                # Keep serving the models we have; /admin/models surfaces the error
+                self.last_error = str(e)
+
+        self._background = threading.Thread(target=run, name="model-reload", daemon=True)
+        self._background.start()
+        return self._background
+
+    def maybe_reload(self):
+        """
+        Start a background reload when another worker published one, or when the
+        artifacts are due a change check (at most once per `reload_interval` seconds).
+        Returns the reload thread, or None if none was started.
+        """
+        if self._background is not None and self._background.is_alive():
+            return None
+        force = self._poll_signal()
+        due = self.reload_interval > 0 and time.monotonic() - self._last_check >= self.reload_interval
+        if force is None and not due:
+            return None
+        if force is None:
+            self._last_check = time.monotonic()
+        return self.reload_in_background(force=bool(force))
+
+    def snapshot(self):
+        """Return {name: model} for one consistent set of model versions."""
+        return self.versioned_snapshot()[0]
+
+    def versioned_snapshot(self):
+        """Like snapshot(), plus {name: version} of the same models, e.g. for cache keys."""
+        self.ensure_loaded()
+        self.maybe_reload()
+        entries = self._entries
+        return (
+            {name: entry.model for name, entry in entries.items()},
+            {name: entry.version for name, entry in entries.items()},
+        )
+
+    def describe(self):
+        return [entry.describe() for entry in self._entries.values()]
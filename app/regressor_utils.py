@@ -1,103 +1,436 @@
+import json
+import math
+
 import pandas as pd
 import numpy as np
 
+from .inference_utils import row_predictor
+
+N_LAGS = 14
+LAG_COLUMNS = [f'lag_{lag}' for lag in range(1, N_LAGS + 1)]
+ROLLING_COLUMNS = ['rolling_mean_7', 'rolling_std_7', 'rolling_mean_14']
+FEATURE_COLUMNS = ['day_of_week', 'is_weekend', 'wellness_score'] + ROLLING_COLUMNS + LAG_COLUMNS
+
+ONE_DAY = np.timedelta64(1, 'D')
+
+# Positions of the history-derived blocks inside a FEATURE_COLUMNS row
+ROLLING_SLICE = slice(3, 3 + len(ROLLING_COLUMNS))
+LAG_SLICE = slice(3 + len(ROLLING_COLUMNS), None)
+# ...and of the calendar and wellness features
+DAY_OF_WEEK_COL, IS_WEEKEND_COL, WELLNESS_COL = 0, 1, 2
+
+
+def parse_history(hist_json):
+    """
+    Parse the `daily_logs` payload into sorted day/earnings arrays.
+    Returns (days as datetime64[ns], total_earnings as float64).
+    """
+    df_hist = pd.DataFrame(hist_json)
+    if df_hist.empty:
+        return np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.float64)
+
+    days = pd.to_datetime(df_hist["day"], format="%Y-%m-%d").to_numpy(dtype='datetime64[ns]')
+    earnings = pd.to_numeric(df_hist["total_earnings"]).to_numpy(dtype=np.float64)
+    order = np.argsort(days, kind='stable')
+    return days[order], earnings[order]
+
+
+def rolling_stats(hist_earnings):
+    """
+    Rolling features taken from the tail of the history.
+    Windows that are not full yet stay NaN.
+    """
+    rolling_mean_7 = rolling_std_7 = rolling_mean_14 = np.nan
+    if len(hist_earnings) >= 7:
+        rolling_mean_7 = hist_earnings[-7:].mean()
+        rolling_std_7 = hist_earnings[-7:].std()
+    if len(hist_earnings) >= 14:
+        rolling_mean_14 = hist_earnings[-14:].mean()
+    return rolling_mean_7, rolling_std_7, rolling_mean_14
+
+
+def lag_matrix(hist_days, hist_earnings, dates):
+    """
+    As-of lookup of the lag values for every forecast date.
+    lag_k for a date is the latest historical earnings on or before (date - k days),
+    NaN when that falls before the first logged day.
+    Returns an array of shape (len(dates), N_LAGS).
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    if len(hist_days) == 0:
+        return np.full((len(dates), N_LAGS), np.nan)
+
+    lag_dates = dates[:, None] - np.arange(1, N_LAGS + 1) * ONE_DAY
+    pos = np.searchsorted(hist_days, lag_dates, side='right') - 1
+    return np.where(pos >= 0, hist_earnings[np.maximum(pos, 0)], np.nan)
+
+
 def generate_features_for_forecast(hist_json, forecast_start, forecast_end, wellness_score):
     """
     Generate features for the requested forecast window.
     Uses historical earnings to create lags and rolling stats.
     Returns a DataFrame with one row per day.
     """
+    hist_days, hist_earnings = parse_history(hist_json)
+    return features_from_history(hist_days, hist_earnings, forecast_start, forecast_end, wellness_score)
+
+
+def features_from_history(hist_days, hist_earnings, forecast_start, forecast_end, wellness_score, rolling=None):
+    """
+    generate_features_for_forecast for a history that is already parsed
+    into sorted arrays (see parse_history).
+    `rolling` may carry precomputed rolling_stats of the history.
+    """
     # Create date range for prediction
-    date_range = pd.date_range(start=forecast_start, end=forecast_end, freq='D')
+    date_range = pd.date_range(start=forecast_start, end=forecast_end, freq='D', name='timestamp')
 
-    # Start from last known values
-    df_hist = pd.DataFrame(hist_json)
-    if not df_hist.empty:
-        df_hist["day"] = pd.to_datetime(df_hist["day"], format="%Y-%m-%d")
-        df_hist.set_index("day", inplace=True)
-        df_hist.sort_index(inplace=True)
-        # These are not used later in the function as provided, but good practice to handle
-        # last_known_row = df_hist.iloc[-1].copy()
-        # last_known_date = df_hist.index[-1]
-    
-    # print(df_hist) # Original print statement
-
-    # Initialize new dataframe
-    df_pred = pd.DataFrame(index=date_range)
-    df_pred.index.name = 'timestamp'
-
-    df_pred['earnings'] = np.nan 
-    # Generate time-based features
-    df_pred['day_of_week'] = df_pred.index.dayofweek
-    df_pred['is_weekend'] = df_pred['day_of_week'].apply(lambda x: 1 if x >= 5 else 0)
-    df_pred["wellness_score"] = wellness_score
-    
-    # Initialize placeholder for earnings and feature columns to NaN
-    df_pred['rolling_mean_7'] = np.nan
-    df_pred['rolling_std_7'] = np.nan
-    df_pred['rolling_mean_14'] = np.nan
-    for lag in range(1, 15):
-        df_pred[f'lag_{lag}'] = np.nan
-
-    # --- Original first lag calculation loop ---
-    # This loop appears redundant given the subsequent loop and has a potential bug
-    # (using 'earnings' from df_hist which might not exist, should be 'total_earnings').
-    # Commenting it out to rely on the corrected main loop below.
-    # If df_hist is not empty, this loop would attempt to fill lags.
-    # if not df_hist.empty:
-    #     min_hist_date_for_first_loop = df_hist.index[0]
-    #     for lag in range(1, 15):  # up to lag_14
-    #         col_name = f'lag_{lag}'
-    #         # This lambda needs 'total_earnings' and robust empty slice check before .iloc[-1]
-    #         df_pred[col_name] = df_pred.index.map(
-    #             lambda dt: (
-    #                 series := df_hist.loc[df_hist.index <= (lag_date := dt - pd.Timedelta(days=lag)), 'total_earnings'], # Corrected to 'total_earnings'
-    #                 series.iloc[-1] if not series.empty else np.nan
-    #             )[1] if lag_date >= min_hist_date_for_first_loop else np.nan 
-    #         )
-    # --- End of original first lag calculation loop ---
-
-    history = df_hist.copy() # Use a copy of the historical data
-
-    # Cache the minimum historical date if history is not empty
-    min_hist_date = history.index[0] if not history.empty else None
-
-    for idx in df_pred.index:
-        # --- Rolling features calculation ---
-        if not history.empty:
-            all_historical_earnings = history['total_earnings'] # This is a Series
-
-            # Rolling mean/std for 7 days
-            if len(all_historical_earnings) >= 7:
-                df_pred.loc[idx, 'rolling_mean_7'] = np.mean(all_historical_earnings.iloc[-7:])
-                df_pred.loc[idx, 'rolling_std_7'] = np.std(all_historical_earnings.iloc[-7:])
-            # Else, they remain np.nan (initialized earlier)
-
-            # Rolling mean for 14 days
-            if len(all_historical_earnings) >= 14:
-                df_pred.loc[idx, 'rolling_mean_14'] = np.mean(all_historical_earnings.iloc[-14:])
-            # Else, it remains np.nan (initialized earlier)
-        # If history is empty, rolling features remain np.nan as initialized.
-
-        # --- Lag features calculation (Corrected) ---
-        for lag in range(1, 15):
-            col_name = f'lag_{lag}'
-            val = np.nan # Default to NaN
-
-            if not history.empty and min_hist_date is not None:
-                lag_idx = idx - pd.Timedelta(days=lag)
-                
-                # Check if the lag_idx is before the earliest date in history
-                if lag_idx >= min_hist_date:
-                    # Filter history for dates less than or equal to lag_idx
-                    lag_values_series = history.loc[history.index <= lag_idx, 'total_earnings']
-                    if not lag_values_series.empty:
-                        val = lag_values_series.iloc[-1] # Get the latest value up to lag_idx
-                    # Else (lag_values_series is empty): val remains np.nan
-                    # This case means lag_idx is >= min_hist_date but the slice is empty (e.g., gaps in history).
-                # Else (lag_idx < min_hist_date): val remains np.nan
-            # Else (history is empty or min_hist_date is None): val remains np.nan
-            
-            df_pred.loc[idx, col_name] = val
-            
-    return df_pred
\ No newline at end of file
+    rolling_mean_7, rolling_std_7, rolling_mean_14 = rolling if rolling is not None else rolling_stats(hist_earnings)
+    lags = lag_matrix(hist_days, hist_earnings, date_range.values)
+
+    day_of_week = date_range.dayofweek
+    columns = {
+        'earnings': np.nan,
+        'day_of_week': day_of_week,
+        'is_weekend': (day_of_week >= 5).astype(np.int64),
+        'wellness_score': wellness_score,
+        'rolling_mean_7': rolling_mean_7,
+        'rolling_std_7': rolling_std_7,
+        'rolling_mean_14': rolling_mean_14,
+    }
+    for lag, col_name in enumerate(LAG_COLUMNS):
+        columns[col_name] = lags[:, lag]
+
+    return pd.DataFrame(columns, index=date_range)
+
+
+def predict_forecast(X_pred, earnings_model, hours_model):
+    """
+    Score a feature frame in place with both models.
+    The hours model consumes the predicted earnings as an extra feature.
+    Models are fed a contiguous float32 matrix rather than DataFrame slices.
+    """
+    X = np.ascontiguousarray(X_pred[FEATURE_COLUMNS].to_numpy(dtype=np.float32))
+    earnings = np.abs(earnings_model.predict(X))
+    X_pred['earnings'] = earnings
+    X_pred['predicted_hours_worked'] = np.abs(hours_model.predict(np.column_stack([earnings, X])))
+    return X_pred
+
+
+def format_predictions(X_pred):
+    """
+    Convert a scored frame into the `predictions` records returned by the API.
+    """
+    result = X_pred[['earnings', 'predicted_hours_worked']].reset_index()
+    result.rename(columns={'timestamp': 'date'}, inplace=True)
+    result['date'] = result['date'].dt.strftime('%Y-%m-%d')
+    return result.to_dict(orient="records")
+
+
+def _prediction_columns(X_pred):
+    dates = np.datetime_as_string(X_pred.index.values, unit='D').tolist()
+    return dates, X_pred['earnings'].tolist(), X_pred['predicted_hours_worked'].tolist()
+
+
+def format_ndjson(X_pred, driver_id=None):
+    """
+    A scored frame as NDJSON, one `predictions` record per line (with its
+    driver_id for batch forecasts), ready to write to a streamed response.
+    """
+    prefix = '{' if driver_id is None else f'{{"driver_id": {json.dumps(driver_id)}, '
+    return "".join(
+        f'{prefix}"date": "{date}", "earnings": {earnings!r}, "predicted_hours_worked": {hours!r}}}\n'
+        for date, earnings, hours in zip(*_prediction_columns(X_pred))
+    )
+
+
+def format_columns(X_pred, driver_id=None):
+    """A scored frame as one line of columnar JSON: a list per field instead of a dict per day."""
+    dates, earnings, hours = _prediction_columns(X_pred)
+    body = {"date": dates, "earnings": earnings, "predicted_hours_worked": hours}
+    if driver_id is not None:
+        body = {"driver_id": driver_id, **body}
+    return json.dumps(body) + "\n"
+
+
+def date_chunks(forecast_start, forecast_end, chunk_days):
+    """Split [forecast_start, forecast_end] into consecutive (start, end) ranges of at most `chunk_days` days."""
+    start, end = pd.Timestamp(forecast_start), pd.Timestamp(forecast_end)
+    step = pd.Timedelta(days=chunk_days)
+    while start <= end:
+        yield start, min(start + step - pd.Timedelta(days=1), end)
+        start += step
+
+
+def forecast_batch(drivers, earnings_model, hours_model):
+    """
+    Forecast many drivers at once.
+    `drivers` is a list of dicts with driver_id, daily_logs, start, end and wellness_score;
+    instead of daily_logs a driver may carry `history`, a parsed (days, earnings) pair.
+    Feature rows of every driver are stacked into one frame so each model runs once.
+    Returns {driver_id: scored DataFrame}.
+    """
+    if not drivers:
+        return {}
+
+    driver_ids = [d['driver_id'] for d in drivers]
+    frames = [
+        features_from_history(*d['history'], d['start'], d['end'], d['wellness_score'])
+        if 'history' in d else
+        generate_features_for_forecast(d.get('daily_logs'), d['start'], d['end'], d['wellness_score'])
+        for d in drivers
+    ]
+    X_pred = pd.concat(frames, keys=driver_ids, names=['driver_id'])
+    predict_forecast(X_pred, earnings_model, hours_model)
+
+    return {driver_id: X_pred.xs(driver_id, level='driver_id') for driver_id in driver_ids}
+
+
+def forecast_batch_chunks(drivers, earnings_model, hours_model, chunk_rows):
+    """
+    forecast_batch as a generator of chunks of at most `chunk_rows` forecast days.
+    Each driver's window is cut into date ranges that fill the current chunk, so a
+    chunk may hold several drivers and a long window may span several chunks.
+    Every chunk is featurized and scored (one call per model) only when the
+    previous one has been consumed, and is yielded as a list of
+    (driver_id, scored DataFrame) pieces in input order.
+    """
+    pieces, rows = [], 0
+    for d in drivers:
+        hist_days, hist_earnings = d['history'] if 'history' in d else parse_history(d.get('daily_logs'))
+        rolling = rolling_stats(hist_earnings)
+        start, end = pd.Timestamp(d['start']), pd.Timestamp(d['end'])
+        while start <= end:
+            piece_end = min(start + pd.Timedelta(days=chunk_rows - rows - 1), end)
+            pieces.append((d['driver_id'], features_from_history(
+                hist_days, hist_earnings, start, piece_end, d['wellness_score'], rolling
+            )))
+            rows += (piece_end - start).days + 1
+            start = piece_end + pd.Timedelta(days=1)
+            if rows >= chunk_rows:
+                yield _score_pieces(pieces, earnings_model, hours_model)
+                pieces, rows = [], 0
+    if pieces:
+        yield _score_pieces(pieces, earnings_model, hours_model)
+
+
+def _score_pieces(pieces, earnings_model, hours_model):
+    X_pred = predict_forecast(pd.concat([frame for _, frame in pieces]), earnings_model, hours_model)
+    bounds = np.cumsum([0] + [len(frame) for _, frame in pieces])
+    return [(driver_id, X_pred.iloc[a:b]) for (driver_id, _), a, b in zip(pieces, bounds[:-1], bounds[1:])]
+
+
+def forecast_scenarios(hist_days, hist_earnings, forecast_start, forecast_end, wellness_scores,
+                       earnings_model, hours_model, days_of_week=None, weekend_flags=None, rolling=None):
+    """
+    Static forecasts of one history under every combination of the given
+    wellness scores, day_of_week overrides and is_weekend overrides.
+    The history-derived features are built once and broadcast across the grid,
+    and each model scores the whole (scenarios x days) matrix in one call.
+    Without overrides the calendar values are used; a day_of_week override also
+    sets is_weekend, unless is_weekend is overridden too.
+    Returns (dates, scenarios, earnings, hours): `scenarios` holds one array per
+    grid axis (-1 where the calendar value is kept) and earnings/hours have
+    shape (len(scenarios), len(dates)).
+    """
+    base = features_from_history(hist_days, hist_earnings, forecast_start, forecast_end, 0, rolling)
+    X = base[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    n_days = len(X)
+
+    axes = np.meshgrid(
+        np.asarray(wellness_scores, dtype=np.float32),
+        np.asarray(days_of_week if days_of_week else [-1], dtype=np.float32),
+        np.asarray(weekend_flags if weekend_flags else [-1], dtype=np.float32),
+        indexing='ij',
+    )
+    wellness, day_of_week, is_weekend = (axis.ravel() for axis in axes)
+
+    grid = np.repeat(X[None, :, :], len(wellness), axis=0)
+    grid[:, :, WELLNESS_COL] = wellness[:, None]
+    override = day_of_week >= 0
+    grid[override, :, DAY_OF_WEEK_COL] = day_of_week[override, None]
+    grid[override, :, IS_WEEKEND_COL] = (day_of_week[override, None] >= 5)
+    override = is_weekend >= 0
+    grid[override, :, IS_WEEKEND_COL] = is_weekend[override, None]
+
+    X_grid = grid.reshape(-1, len(FEATURE_COLUMNS))
+    earnings = np.abs(earnings_model.predict(X_grid))
+    hours = np.abs(hours_model.predict(np.column_stack([earnings, X_grid])))
+
+    scenarios = {
+        'wellness_score': wellness.astype(np.int64),
+        'day_of_week': day_of_week.astype(np.int64),
+        'is_weekend': is_weekend.astype(np.int64),
+    }
+    return base.index, scenarios, earnings.reshape(-1, n_days), hours.reshape(-1, n_days)
+
+
+class RollingWindowState:
+    """
+    Ring buffer of the last N_LAGS daily earnings for recursive forecasting.
+    A running sum keeps rolling_mean_14 up to date in O(1) per pushed day; the
+    7-day mean and std are taken from the seven buffered days (two passes, so a
+    flat week has a std of 0 instead of the cancellation residue a running sum
+    of squares leaves after large values). A window that still holds a NaN day
+    reports NaN, the same as a window that is not full yet in the static path.
+    """
+
+    # Ring slots of the last 7 days, by the slot of the oldest value
+    _LAST_7 = (np.arange(N_LAGS)[:, None] + np.arange(N_LAGS - 7, N_LAGS)) % N_LAGS
+
+    def __init__(self, lags):
+        # Oldest value first: lag_14, ..., lag_1
+        self._buf = np.asarray(lags, dtype=np.float64)[::-1].copy()
+        self._head = 0  # slot of the oldest value, i.e. the next one to overwrite
+        self._lag_offsets = np.arange(1, N_LAGS + 1)
+
+        self._valid_7 = np.count_nonzero(~np.isnan(self._buf[-7:]))
+        self._sum_14 = np.nansum(self._buf)
+        self._valid_14 = np.count_nonzero(~np.isnan(self._buf))
+
+    def push(self, value):
+        """Append the earnings of the next day, evicting the oldest one."""
+        leaving_14 = self._buf[self._head]
+        leaving_7 = self._buf[(self._head + 7) % N_LAGS]
+
+        if not np.isnan(leaving_14):
+            self._sum_14 -= leaving_14
+            self._valid_14 -= 1
+        if not np.isnan(leaving_7):
+            self._valid_7 -= 1
+        if not np.isnan(value):
+            self._sum_14 += value
+            self._valid_14 += 1
+            self._valid_7 += 1
+
+        self._buf[self._head] = value
+        self._head = (self._head + 1) % N_LAGS
+
+    def lags(self):
+        """Current lag_1..lag_14 values."""
+        return self._buf[(self._head - self._lag_offsets) % N_LAGS]
+
+    def rolling(self):
+        """Current (rolling_mean_7, rolling_std_7, rolling_mean_14)."""
+        rolling_mean_7 = rolling_std_7 = rolling_mean_14 = np.nan
+        if self._valid_7 == 7:
+            last_7 = self._buf.take(self._LAST_7[self._head]).tolist()
+            rolling_mean_7 = sum(last_7) / 7
+            rolling_std_7 = math.sqrt(sum((value - rolling_mean_7) ** 2 for value in last_7) / 7)
+        if self._valid_14 == N_LAGS:
+            rolling_mean_14 = self._sum_14 / N_LAGS
+        return rolling_mean_7, rolling_std_7, rolling_mean_14
+
+
+def forecast_recursive(hist_json, forecast_start, forecast_end, wellness_score, earnings_model, hours_model):
+    """
+    Autoregressive forecast: every predicted day is fed back as lag_1 of the next one.
+    The window is seeded with the as-of lags of the first forecast day, so with a
+    contiguous history ending the day before `forecast_start` the first row matches
+    generate_features_for_forecast exactly.
+    Returns a scored DataFrame in the same layout as predict_forecast.
+    """
+    hist_days, hist_earnings = parse_history(hist_json)
+    return recursive_from_history(
+        hist_days, hist_earnings, forecast_start, forecast_end, wellness_score, earnings_model, hours_model
+    )
+
+
+def recursive_from_history(hist_days, hist_earnings, forecast_start, forecast_end, wellness_score,
+                           earnings_model, hours_model):
+    """
+    forecast_recursive for a history that is already parsed into sorted arrays.
+    """
+    X_pred = features_from_history(hist_days, hist_earnings, forecast_start, forecast_end, wellness_score)
+    if X_pred.empty:
+        X_pred['predicted_hours_worked'] = np.nan
+        return X_pred
+
+    X = X_pred[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    return _score_recursive(X_pred, X, RollingWindowState(X[0, LAG_SLICE]), earnings_model, hours_model)
+
+
+def _score_recursive(X_pred, X, state, earnings_model, hours_model):
+    """
+    Score the feature rows `X` of `X_pred` day by day, advancing `state` past them.
+    Each day is scored through row_predictor, the hours model once for all days.
+    """
+    X32 = np.empty(X.shape, dtype=np.float32)
+    earnings = np.empty(len(X), dtype=np.float32)
+    predict_row = row_predictor(earnings_model)
+
+    for i in range(len(X)):
+        X[i, ROLLING_SLICE] = state.rolling()
+        X[i, LAG_SLICE] = state.lags()
+        X32[i] = X[i]
+        earnings[i] = abs(predict_row(X32[i]))
+        state.push(float(earnings[i]))
+
+    X_pred[ROLLING_COLUMNS + LAG_COLUMNS] = X[:, ROLLING_SLICE.start:]
+    X_pred['earnings'] = earnings
+    X_pred['predicted_hours_worked'] = np.abs(hours_model.predict(np.column_stack([earnings, X32])))
+    return X_pred
+
+
+def forecast_chunks(hist_days, hist_earnings, forecast_start, forecast_end, wellness_score, mode,
+                    earnings_model, hours_model, chunk_days, rolling=None):
+    """
+    Yield the forecast of one driver as scored frames of at most `chunk_days`
+    consecutive days, each one as soon as it is scored. Together the chunks equal
+    the whole-window forecast: static chunks share the history's rolling stats,
+    and in recursive mode the rolling window state carries over from chunk to chunk.
+    """
+    rolling = rolling if rolling is not None else rolling_stats(hist_earnings)
+    state = None
+    for start, end in date_chunks(forecast_start, forecast_end, chunk_days):
+        X_pred = features_from_history(hist_days, hist_earnings, start, end, wellness_score, rolling)
+        if mode != "recursive":
+            yield predict_forecast(X_pred, earnings_model, hours_model)
+            continue
+        X = X_pred[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+        if state is None:
+            state = RollingWindowState(X[0, LAG_SLICE])
+        yield _score_recursive(X_pred, X, state, earnings_model, hours_model)
+
+
+def training_features(daily):
+    """
+    Training rows from per-driver daily totals, with the same feature definitions
+    as the serving path: for each logged day, lag_k is the as-of earnings of
+    (day - k days) and the rolling stats cover the driver's previous 7/14 logged
+    days, i.e. exactly what features_from_history computes when that day is the
+    first one forecast. Lags and windows never cross drivers.
+    `daily` has one row per driver and day with driver_id, day, total_earnings and
+    wellness_score. Returns it sorted by driver and day with FEATURE_COLUMNS added.
+    """
+    daily = daily.sort_values(['driver_id', 'day'], kind='stable').reset_index(drop=True)
+    groups = pd.factorize(daily['driver_id'])[0]
+    days = daily['day'].to_numpy(dtype='datetime64[ns]')
+    earnings = daily['total_earnings'].to_numpy(dtype=np.float64)
+
+    # One searchsorted for all drivers: offset every driver's days far enough apart
+    # that a lag date before its first day cannot reach the previous driver
+    day_numbers = (days - days.min()) // ONE_DAY if len(days) else days.astype(np.int64)
+    span = int(day_numbers.max()) + N_LAGS + 1 if len(days) else 1
+    keys = groups.astype(np.int64) * span + day_numbers
+    lag_keys = keys[:, None] - np.arange(1, N_LAGS + 1)
+    pos = np.searchsorted(keys, lag_keys, side='right') - 1
+    safe = np.maximum(pos, 0)
+    lags = np.where((pos >= 0) & (groups[safe] == groups[:, None]), earnings[safe], np.nan)
+
+    # Windows over the previous logged days; population std like rolling_stats
+    previous = pd.Series(earnings).groupby(groups).shift(1)
+    windows = previous.groupby(groups)
+    rolling = {
+        'rolling_mean_7': windows.rolling(7).mean(),
+        'rolling_std_7': windows.rolling(7).std(ddof=0),
+        'rolling_mean_14': windows.rolling(N_LAGS).mean(),
+    }
+
+    day_index = pd.DatetimeIndex(days)
+    daily['day_of_week'] = day_index.dayofweek
+    daily['is_weekend'] = (day_index.dayofweek >= 5).astype(np.int64)
+    for name, values in rolling.items():
+        daily[name] = values.reset_index(level=0, drop=True).sort_index().to_numpy()
+    for lag, col_name in enumerate(LAG_COLUMNS):
+        daily[col_name] = lags[:, lag]
+    return daily
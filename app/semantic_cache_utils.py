@@ -0,0 +1,268 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+# Function words (English and Indonesian) that paraphrases add, drop or swap freely;
+# every other word of a question is a content term that a cached question must share
+STOPWORDS = frozenset("""
+a an the is are was were be been am do does did i me my you your we our it its this that these those
+to of in on at for with by from about as and or but if so what which who whom how why when where
+can could would should will shall may might must please there their them they he she his her
+apa apakah bagaimana gimana gmn kenapa mengapa siapa kapan dimana di ke dari pada untuk buat
+bagi dengan yang dan atau tapi tetapi jika kalau saat ketika sedang akan sudah telah bisa dapat
+boleh harus mau ingin saya aku kami kita anda kamu ini itu tersebut ada adalah ya tidak nggak
+gak dong sih kah nya agar supaya juga lagi saja aja
+""".split())
+
+
+def normalize_question(text):
+    """Lowercase, drop punctuation and collapse whitespace, so trivial variants look alike."""
+    return _SPACES.sub(" ", _PUNCTUATION.sub(" ", text.lower())).strip()
+
+
+# Shortest content term that is matched despite a typo; shorter words must be exact
+MIN_TYPO_TERM_LENGTH = 5
+
+
+def content_terms(key):
+    """The words of a normalized question that are not function words."""
+    return frozenset(word for word in key.split() if word not in STOPWORDS)
+
+
+def deletion_variants(word):
+    """The word and every string one deleted character away from it."""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def within_one_edit(a, b):
+    """True if a and b differ by at most one insertion, deletion, substitution or adjacent swap."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diff = [i for i in range(len(a)) if a[i] != b[i]]
+        return len(diff) == 1 or (
+            len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+        )
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class SemanticEntry:
+    def __init__(self, question, answer, vector, terms, expires_at):
+        self.question = question
+        self.answer = answer
+        self.vector = vector  # 1 x n_features raw term counts
+        self.terms = terms
+        self.expires_at = expires_at
+
+
+class SemanticCache:
+    """
+    In-process cache of chatbot answers looked up by question similarity.
+    Questions are hashed into character n-gram counts (no vocabulary to fit, no
+    network) and compared by cosine similarity of their TF-IDF vectors, with IDF
+    taken from the cached questions themselves. The weighted, normalized index is
+    a sparse matrix rebuilt lazily after entries change, so a lookup is one sparse
+    matrix-vector product. Entries are LRU-evicted beyond `max_entries` and expire
+    after `ttl` seconds.
+    Character n-grams score questions that differ in one word highly ("car
+    insurance" / "life insurance" 0.82, "heavy rain" / "heavy fog" 0.83), so with
+    `match_terms` a hit also needs the same content terms (see STOPWORDS): the
+    similarity absorbs word order and function words, the terms guard the topic.
+    Typos are absorbed before either check: a content term of at least
+    MIN_TYPO_TERM_LENGTH letters that no cached question uses is replaced by the one
+    cached term within one edit of it ("drivng" -> "driving"), if there is exactly
+    one. Shorter words and terms with several such neighbours must match exactly.
+    scikit-learn and SciPy are imported on first use (or by warm()), so importing
+    the app stays fast when the cache is off.
+    """
+
+    def __init__(self, threshold=0.8, max_entries=2000, ttl=86_400, n_features=2 ** 18, enabled=True,
+                 match_terms=True):
+        self.threshold = threshold
+        self.match_terms = match_terms
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self.n_features = n_features
+        self._vectorizer = None
+        self._entries = OrderedDict()
+        self._index = None
+        self._idf = None
+        self._keys = []
+        self._terms = {}  # deletion variant -> cached terms it comes from
+        self._next_expiry = float("inf")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.term_mismatches = 0
+        self.typo_corrections = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+
+            self._vectorizer = HashingVectorizer(
+                analyzer="char_wb", ngram_range=(3, 5), n_features=self.n_features,
+                alternate_sign=False, norm=None, lowercase=False,
+            )
+        return self._vectorizer
+
+    def _vectorize(self, question):
+        return self.vectorizer.transform([question]).tocsr()
+
+    def warm(self):
+        """Import and exercise the vectorizer ahead of the first question."""
+        if self.enabled:
+            self._vectorize("warm up")
+
+    def _purge_expired(self, now):
+        if now < self._next_expiry:
+            return
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+        self._index = None
+        self._next_expiry = min((entry.expires_at for entry in self._entries.values()), default=float("inf"))
+
+    def _rebuild(self):
+        import scipy.sparse as sp
+
+        self._keys = list(self._entries)
+        counts = sp.vstack([self._entries[key].vector for key in self._keys], format="csr")
+        # Smoothed IDF like sklearn's TfidfTransformer, over the cached questions
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        self._idf = np.log((1 + len(self._keys)) / (1 + df)) + 1
+        weighted = counts.multiply(self._idf).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        self._index = (sp.diags(1 / norms) @ weighted).tocsr()
+
+        self._terms = {}
+        for term in set().union(*(self._entries[key].terms for key in self._keys)):
+            if len(term) >= MIN_TYPO_TERM_LENGTH:
+                for variant in deletion_variants(term):
+                    self._terms.setdefault(variant, set()).add(term)
+
+    def _correct(self, key, terms):
+        """Replace unknown terms of `key` by their single cached neighbour; returns (key, terms)."""
+        corrections = {}
+        for term in terms:
+            if len(term) < MIN_TYPO_TERM_LENGTH or term in self._terms.get(term, ()):
+                continue
+            neighbours = {
+                known for variant in deletion_variants(term) for known in self._terms.get(variant, ())
+                if within_one_edit(term, known)
+            }
+            if len(neighbours) == 1:
+                corrections[term] = neighbours.pop()
+        if not corrections:
+            return key, terms
+        self.typo_corrections += len(corrections)
+        key = " ".join(corrections.get(word, word) for word in key.split())
+        return key, content_terms(key)
+
+    def _query(self, vector):
+        """Dense, normalized TF-IDF weights of one question under the current IDF."""
+        weights = vector.data * self._idf[vector.indices]
+        norm = np.linalg.norm(weights)
+        dense = np.zeros(vector.shape[1])
+        dense[vector.indices] = weights / norm if norm else weights
+        return dense
+
+    def get(self, question):
+        """Return (answer, similarity) of the closest cached question above the threshold, else None."""
+        if not self.enabled:
+            return None
+        key = normalize_question(question)
+        vector = self._vectorize(key)
+        with self._lock:
+            self._purge_expired(time.time())
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._index is None:
+                self._rebuild()
+            corrected, terms = self._correct(key, content_terms(key))
+            if corrected != key:
+                vector = self._vectorize(corrected)
+            scores = self._index @ self._query(vector)
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for i in candidates[np.argsort(-scores[candidates], kind="stable")]:
+                entry = self._entries[self._keys[i]]
+                if self.match_terms and entry.terms != terms:
+                    continue
+                self.hits += 1
+                self._entries.move_to_end(self._keys[i])
+                return entry.answer, float(scores[i])
+            if len(candidates):
+                self.term_mismatches += 1
+            self.misses += 1
+            return None
+
+    def set(self, question, answer):
+        if not self.enabled:
+            return
+        key = normalize_question(question)
+        if not key:
+            return
+        vector = self._vectorize(key)
+        with self._lock:
+            expires_at = time.time() + self.ttl
+            self._entries[key] = SemanticEntry(question, answer, vector, content_terms(key), expires_at)
+            self._entries.move_to_end(key)
+            self._next_expiry = min(self._next_expiry, expires_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._index = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "term_mismatches": self.term_mismatches,
+            "typo_corrections": self.typo_corrections,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def semantic_cache_from_env():
+    """
+    SEMANTIC_CACHE: "on" (default) or "off"
+    SEMANTIC_CACHE_THRESHOLD: cosine similarity a question needs to reuse a cached answer
+    SEMANTIC_CACHE_MAX_ENTRIES: LRU bound on cached question/answer pairs
+    SEMANTIC_CACHE_TTL: lifetime of an answer in seconds
+    """
+    return SemanticCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000")),
+        ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+        enabled=os.getenv("SEMANTIC_CACHE", "on") != "off",
+    )
@@ -0,0 +1,120 @@
+import json
+import math
+import os
+import uuid
+
+from .cache_utils import MemoryCache, SQLiteCache
+
+# Rough size of a token for budget purposes; no tokenizer is needed to keep
+# history bounded, only a stable, slightly pessimistic estimate.
+CHARS_PER_TOKEN = 4
+MAX_TOPICS = 10
+TOPIC_CHARS = 80
+
+
+def estimate_tokens(message):
+    return math.ceil(len(message["content"]) / CHARS_PER_TOKEN) + 4
+
+
+def compact_history(turns, budget):
+    """
+    Keep the most recent user/assistant turns that fit in `budget` tokens.
+    The newest message is always kept and the kept history starts at a user turn.
+    Returns (kept, dropped).
+    """
+    used = 0
+    start = len(turns)
+    for i in range(len(turns) - 1, -1, -1):
+        cost = estimate_tokens(turns[i])
+        if used + cost > budget and start < len(turns):
+            break
+        used += cost
+        start = i
+    while start < len(turns) - 1 and turns[start]["role"] != "user":
+        start += 1
+    return turns[start:], turns[:start]
+
+
+class ChatSessions:
+    """
+    Server-side chatbot history keyed by session id.
+    A session stores the system prompt, the recent turns that fit the token budget
+    and, with summarize=True, short notes of the user questions that were dropped.
+    Sessions expire after `idle_ttl` seconds without a new turn.
+    """
+
+    def __init__(self, backend, token_budget=3000, summarize=True):
+        self.backend = backend
+        self.token_budget = token_budget
+        self.summarize = summarize
+
+    def load(self, session_id):
+        """Return (session_id, state); unknown or expired ids start a new session."""
+        raw = self.backend.get(session_id) if session_id else None
+        if raw is None:
+            return uuid.uuid4().hex, {"system": None, "topics": [], "turns": []}
+        return session_id, json.loads(raw)
+
+    def save(self, session_id, state):
+        self.backend.set(session_id, json.dumps(state, ensure_ascii=False))
+
+    def delete(self, session_id):
+        self.backend.delete(session_id)
+
+    def _system_message(self, state):
+        content = state["system"]["content"]
+        if self.summarize and state["topics"]:
+            content += "\n\nEarlier in this conversation the driver asked about: " + "; ".join(state["topics"])
+        return {"role": "system", "content": content}
+
+    def add_user_turn(self, state, system_message, query):
+        """
+        Append the new question, compact the history to the token budget and
+        return the messages to send to the LLM.
+        """
+        if state["system"] is None:
+            state["system"] = system_message
+        state["turns"].append({"role": "user", "content": query})
+
+        budget = self.token_budget - estimate_tokens(self._system_message(state))
+        kept, dropped = compact_history(state["turns"], budget)
+        if dropped and self.summarize:
+            topics = state["topics"] + [m["content"][:TOPIC_CHARS] for m in dropped if m["role"] == "user"]
+            state["topics"] = topics[-MAX_TOPICS:]
+        state["turns"] = kept
+
+        return [self._system_message(state)] + state["turns"]
+
+    def add_reply(self, session_id, state, reply):
+        state["turns"].append({"role": "assistant", "content": reply})
+        self.save(session_id, state)
+
+
+def sessions_from_env():
+    """
+    CHAT_SESSION_BACKEND: "memory" (default) or "sqlite"
+    CHAT_SESSION_PATH: SQLite file for the sqlite backend
+    CHAT_SESSION_IDLE_TTL: seconds a session survives without a new turn
+    CHAT_SESSION_MAX: LRU bound on stored sessions
+    CHAT_HISTORY_TOKEN_BUDGET: estimated prompt tokens kept per session
+    CHAT_HISTORY_COMPACTION: "summarize" (default) or "drop"
+    """
+    kind = os.getenv("CHAT_SESSION_BACKEND", "memory")
+    idle_ttl = float(os.getenv("CHAT_SESSION_IDLE_TTL", "1800"))
+    max_sessions = int(os.getenv("CHAT_SESSION_MAX", "10000"))
+
+    if kind == "memory":
+        backend = MemoryCache(max_entries=max_sessions, ttl=idle_ttl)
+    elif kind == "sqlite":
+        backend = SQLiteCache(
+            os.getenv("CHAT_SESSION_PATH", "./chat_sessions.sqlite3"),
+            max_entries=max_sessions, ttl=idle_ttl, table="chat_sessions",
+        )
+    else:
+        raise ValueError(f"Unknown CHAT_SESSION_BACKEND: {kind}")
+
+    return ChatSessions(
+        backend,
+        token_budget=int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000")),
+        summarize=os.getenv("CHAT_HISTORY_COMPACTION", "summarize") == "summarize",
+    )
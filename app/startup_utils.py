@@ -0,0 +1,55 @@
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from .regressor_utils import generate_features_for_forecast, predict_forecast, format_predictions
+
+WARMUP_HISTORY_DAYS = 28
+WARMUP_FORECAST_DAY = pd.Timestamp("2024-01-29")
+
+
+class StartupReport:
+    """
+    Start-up phases of this process and their durations, for the readiness probe.
+    `pid` is the process that imported the app: gunicorn workers forked from a
+    --preload master have their own pid and report themselves as preloaded.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.phases = {}
+        self.ready = False
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def describe(self):
+        return {
+            "ready": self.ready,
+            "pid": os.getpid(),
+            "preloaded": os.getpid() != self.pid,
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+        }
+
+
+def warm_models(earnings_model, hours_model):
+    """
+    Forecast one day from a synthetic history with the same code as /predict/earnings,
+    so pandas' date parsing, the feature code and both models pay their one-time
+    initialization here instead of in the first request.
+    """
+    days = pd.date_range(end=WARMUP_FORECAST_DAY - pd.Timedelta(days=1), periods=WARMUP_HISTORY_DAYS, freq="D")
+    earnings = np.linspace(100_000, 200_000, WARMUP_HISTORY_DAYS)
+    hist_json = [
+        {"day": day.strftime("%Y-%m-%d"), "total_earnings": float(value)} for day, value in zip(days, earnings)
+    ]
+    X = generate_features_for_forecast(hist_json, WARMUP_FORECAST_DAY, WARMUP_FORECAST_DAY, 50)
+    return format_predictions(predict_forecast(X, earnings_model, hours_model))
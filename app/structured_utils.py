@@ -0,0 +1,290 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from . import chatbot_utils
+from .cache_utils import SingleFlight, cache_key
+from .gateway_utils import GatewayOverloaded
+
+logger = logging.getLogger(__name__)
+
+# How much of a rejected LLM output to keep in the debug log
+LOGGED_OUTPUT_CHARS = 200
+
+FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+# A value or closing bracket at the end of a line followed by a new key on the next one
+MISSING_COMMA_RE = re.compile(r'(["}\]\d]|true|false|null)(\s*\n\s*)(")')
+
+# Per-endpoint response schemas (a small JSON-schema subset: type, required,
+# properties and additionalProperties)
+FIN_TIPS_SCHEMA = {
+    "type": "object",
+    "required": ["saving_strategies", "investment_strategies", "insurance_strategies"],
+}
+WELLNESS_SCHEMA = {
+    "type": "object",
+    "required": ["rest_advice", "hydration_tip", "relaxation_techniques",
+                 "wellness_score", "general_wellness_status"],
+    "properties": {
+        "relaxation_techniques": {"type": ["array", "string"]},
+        "wellness_score": {"type": ["number", "string"]},
+        "general_wellness_status": {"type": "string"},
+    },
+}
+INVEST_SCHEMA = {
+    "type": "object",
+    "additionalProperties": {"type": "object"},
+}
+
+JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+class StructuredOutputError(Exception):
+    """The LLM did not produce a valid structured answer within the retry/latency budget."""
+
+
+class CircuitOpenError(StructuredOutputError):
+    """The endpoint's circuit breaker is open, so the LLM was not called."""
+
+
+def validate(value, schema, path="$"):
+    """Return a list of schema violations (empty when valid)."""
+    errors = []
+    expected = schema.get("type")
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        is_bool = isinstance(value, bool)
+        if not any(isinstance(value, JSON_TYPES[t]) and (t == "boolean" or not is_bool) for t in types):
+            return [f"{path}: expected {'/'.join(types)}"]
+
+    if isinstance(value, dict):
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}: missing '{key}'")
+        properties = schema.get("properties", {})
+        extra = schema.get("additionalProperties")
+        for key, item in value.items():
+            if key in properties:
+                errors.extend(validate(item, properties[key], f"{path}.{key}"))
+            elif isinstance(extra, dict):
+                errors.extend(validate(item, extra, f"{path}.{key}"))
+    return errors
+
+
+def _close_brackets(text):
+    """Append whatever closing quotes/brackets a truncated JSON document is missing."""
+    stack = []
+    in_string = escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    return text + ('"' if in_string else "") + "".join(reversed(stack))
+
+
+def extract_json(text):
+    """
+    Pull a JSON object out of an LLM answer.
+    Handles ```json fences, prose around the object, trailing commas, missing commas
+    between lines and output truncated before the closing braces.
+    Returns (parsed_value, repaired) or raises ValueError.
+    """
+    if not isinstance(text, str):
+        raise ValueError("LLM output is not text")
+
+    fenced = FENCE_RE.search(text)
+    body = fenced.group(1) if fenced else text
+    start = body.find("{")
+    if start == -1:
+        raise ValueError("No JSON object in LLM output")
+    body = body[start:].rstrip()
+    end = body.rfind("}")
+    candidate = body[:end + 1] if end != -1 else body
+
+    try:
+        return json.loads(candidate), candidate != text.strip()
+    except ValueError:
+        pass
+
+    def fix_commas(doc):
+        return MISSING_COMMA_RE.sub(r"\1,\2\3", TRAILING_COMMA_RE.sub(r"\1", doc))
+
+    try:
+        return json.loads(fix_commas(candidate)), True
+    except ValueError:
+        pass
+
+    # Truncated output: close whatever is still open after the last complete token
+    return json.loads(fix_commas(_close_brackets(body.rstrip(",")))), True
+
+
+class StructuredStats:
+    """Per-endpoint counters for structured LLM calls."""
+
+    FIELDS = ("requests", "llm_calls", "retries", "wasted_calls", "repaired", "cache_hits",
+              "coalesced", "failures", "budget_exhausted", "short_circuits", "fallbacks")
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def incr(self, endpoint, field, amount=1):
+        with self._lock:
+            counts = self._counts.setdefault(endpoint, dict.fromkeys(self.FIELDS, 0))
+            counts[field] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._counts.items()}
+
+
+structured_stats = StructuredStats()
+
+# Identical prompts in flight at the same time share one upstream completion
+structured_flights = SingleFlight()
+
+
+class StructuredSpec:
+    """
+    How one endpoint asks for structured output: its schema, a retry cap, a
+    wall-clock budget covering every attempt and optionally a circuit breaker
+    (see fallback_utils.CircuitBreaker) that skips the LLM while it keeps failing.
+    """
+
+    def __init__(self, name, schema, max_attempts=None, deadline=None, breaker=None):
+        self.name = name
+        self.schema = schema
+        self.max_attempts = max_attempts or int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+        self.deadline = deadline or float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+        self.breaker = breaker
+
+
+def _parse(spec, text):
+    """Return (value, repaired) for a schema-valid answer, or None."""
+    try:
+        value, repaired = extract_json(text)
+    except ValueError:
+        return None
+    if validate(value, spec.schema):
+        return None
+    return value, repaired
+
+
+def call_structured(spec, messages, cache=None, model="qwen-plus"):
+    """
+    Ask the LLM for a JSON answer matching `spec.schema`.
+    Retries on malformed or invalid output until `spec.max_attempts` calls were made
+    or `spec.deadline` seconds passed, then raises StructuredOutputError.
+    Concurrent requests with the same prompt wait for a single completion.
+    Valid answers are stored in `cache` in canonical JSON form.
+    Raises CircuitOpenError without calling the LLM while `spec.breaker` is open.
+    """
+    structured_stats.incr(spec.name, "requests")
+
+    if cache is not None:
+        cached = cache.get(model, messages)
+        if cached is not None:
+            parsed = _parse(spec, cached)
+            if parsed is not None:
+                structured_stats.incr(spec.name, "cache_hits")
+                return parsed[0]
+
+    breaker = spec.breaker
+    if breaker is not None and not breaker.allow():
+        structured_stats.incr(spec.name, "short_circuits")
+        raise CircuitOpenError(f"{spec.name}: LLM skipped after repeated failures")
+
+    def lead():
+        # Only the caller that actually calls the LLM reports to the breaker;
+        # callers coalesced onto its flight share the outcome, not the count
+        try:
+            value = _complete_structured(spec, messages, cache, model)
+        except GatewayOverloaded:
+            # Shed locally: says nothing about the health of the LLM
+            raise
+        except Exception:
+            if breaker is not None:
+                breaker.record_failure()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return value
+
+    try:
+        value, shared = structured_flights.do(cache_key(model, messages), lead, timeout=spec.deadline)
+    except TimeoutError:
+        structured_stats.incr(spec.name, "failures")
+        raise StructuredOutputError(f"{spec.name}: timed out waiting for an identical request")
+    finally:
+        # A half-open trial that was shed or only waited on another flight never
+        # produced an outcome; without this every later call would short-circuit
+        if breaker is not None:
+            breaker.release_trial()
+    if shared:
+        structured_stats.incr(spec.name, "coalesced")
+    return value
+
+
+def _complete_structured(spec, messages, cache, model):
+    started = time.monotonic()
+    last_error = "no attempt made"
+    for attempt in range(spec.max_attempts):
+        remaining = spec.deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            structured_stats.incr(spec.name, "budget_exhausted")
+            last_error = f"latency budget of {spec.deadline:g}s exhausted"
+            break
+        if attempt:
+            structured_stats.incr(spec.name, "retries")
+
+        structured_stats.incr(spec.name, "llm_calls")
+        try:
+            response = chatbot_utils.call_qwen(messages, model=model, timeout=remaining, endpoint=spec.name)
+            text = chatbot_utils.response_text(response)
+        except GatewayOverloaded:
+            # Shedding load: retrying here would only make the queue longer
+            structured_stats.incr(spec.name, "failures")
+            raise
+        except Exception as e:
+            structured_stats.incr(spec.name, "wasted_calls")
+            last_error = str(e)
+            continue
+
+        parsed = _parse(spec, text)
+        if parsed is None:
+            logger.debug("%s: discarding invalid output: %.*s", spec.name, LOGGED_OUTPUT_CHARS, text)
+            structured_stats.incr(spec.name, "wasted_calls")
+            last_error = "LLM output did not match the expected JSON structure"
+            continue
+
+        value, repaired = parsed
+        if repaired:
+            structured_stats.incr(spec.name, "repaired")
+        if cache is not None:
+            cache.set(model, messages, json.dumps(value, ensure_ascii=False))
+        return value
+
+    structured_stats.incr(spec.name, "failures")
+    raise StructuredOutputError(f"{spec.name}: {last_error}")
@@ -0,0 +1,191 @@
+"""
+Load test every route of create_app() and report latency percentiles and RPS.
+
+By default the app runs in-process against the local Qwen stand-in
+(LLM_BACKEND=fake), so no network or API key is needed:
+
+    python benchmarks/load_test.py --requests 200 --concurrency 16
+    python benchmarks/load_test.py --routes /predict/earnings /llm/wellness
+    FAKE_LLM_LATENCY=1.5 FAKE_LLM_FAILURE_RATE=0.1 python benchmarks/load_test.py
+
+Use --url to drive a running server instead (e.g. gunicorn started with
+LLM_BACKEND=fake, or pointed at `python -m app.fake_llm_utils` through
+DASHSCOPE_BASE_URL).
+
+Routes that change server state (MUTATING_ROUTES: model reloads and history
+ingestion) are skipped unless --include-mutating is passed. In-process runs
+keep their history store in a temporary directory and do not publish model
+reloads, so they never touch ./driver_history.sqlite3 or a server on the host.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADMIN_TOKEN = "bench-admin-token"
+MUTATING_ROUTES = ("/admin/models/reload", "/history/logs", "/history/sessions")
+
+
+def daily_logs(n_days, end="2025-05-12", seed=0):
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(end=end, periods=n_days, freq="D")
+    return [
+        {"day": d.strftime("%Y-%m-%d"), "total_earnings": float(rng.integers(50, 500) * 1000), "total_trips": 10}
+        for d in days
+    ]
+
+
+def route_payloads(history_days=60, window_days=30):
+    """Request body for every POST route; GET routes need none."""
+    logs = daily_logs(history_days)
+    start = "2025-05-13"
+    end = (pd.Timestamp(start) + pd.Timedelta(days=window_days - 1)).strftime("%Y-%m-%d")
+    forecast = {"start": start, "end": end, "wellness_score": 60, "daily_logs": logs}
+    money = {"pendapatan": 6000000, "pengeluaran": 4000000, "toleransi_risiko": "medium"}
+    wellness = {"energy_level": 6, "stress_level": 4, "sleep_quality": 5, "physical_condition": 7}
+    return {
+        "/llm/fin_tips": money,
+        "/llm/wellness": wellness,
+        "/llm/invest": money,
+        "/llm/chatbot": {"query": "Bagaimana cara mencegah kelelahan saat berkendara?"},
+        "/predict/earnings": forecast,
+        "/predict/earnings/batch": {
+            "drivers": [dict(forecast, driver_id=f"driver_{i}") for i in range(20)]
+        },
+        "/admin/models/reload": {},
+        "/history/logs": {"driver_id": "bench_driver", "daily_logs": logs},
+        "/history/sessions": {"driver_id": "bench_driver", "sessions": [
+            {"timestamp": f"{log['day']} 08:00:00", "earnings": log["total_earnings"],
+             "rides_completed": log["total_trips"], "hours_worked": 8}
+            for log in logs
+        ]},
+        "/predict/earnings/scenarios": dict(forecast, wellness_scores=list(range(0, 101))),
+        "/dashboard": dict(forecast, **money, **wellness),
+    }
+
+
+def discover_routes(app):
+    """(method, url) of every route without URL parameters."""
+    routes = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == "static" or rule.arguments:
+            continue
+        method = "POST" if "POST" in rule.methods else "GET"
+        routes.append((method, str(rule)))
+    return sorted(routes, key=lambda r: r[1])
+
+
+def in_process_client(app):
+    def send(method, url, payload):
+        client = app.test_client()
+        resp = client.open(url, method=method, json=payload, headers={"X-Admin-Token": ADMIN_TOKEN})
+        resp.get_data()
+        return resp.status_code
+    return send
+
+
+def http_client(base_url):
+    def send(method, url, payload):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(
+            base_url.rstrip("/") + url, data=data, method=method,
+            headers={"Content-Type": "application/json", "X-Admin-Token": os.getenv("ADMIN_TOKEN", "")},
+        )
+        try:
+            with urllib.request.urlopen(req) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+    return send
+
+
+def run_route(send, method, url, payload, n_requests, concurrency):
+    def one(_):
+        started = time.perf_counter()
+        try:
+            status = send(method, url, payload)
+        except Exception:
+            status = 0
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array([r[0] for r in results]) * 1000
+    statuses = [r[1] for r in results]
+    return {
+        "route": url,
+        "method": method,
+        "requests": n_requests,
+        "errors": sum(1 for s in statuses if not 200 <= s < 300),
+        "status_counts": {str(s): statuses.count(s) for s in sorted(set(statuses))},
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "rps": n_requests / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--routes", nargs="*", help="only these route URLs")
+    parser.add_argument("--history-days", type=int, default=60)
+    parser.add_argument("--window-days", type=int, default=30)
+    parser.add_argument("--url", help="base URL of a running server instead of the in-process app")
+    parser.add_argument("--include-mutating", action="store_true",
+                        help="also run MUTATING_ROUTES (reloads models and writes history on --url servers)")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    payloads = route_payloads(args.history_days, args.window_days)
+    if args.url:
+        send = http_client(args.url)
+        routes = [("POST" if url in payloads else "GET", url) for url in (args.routes or ["/", *payloads])]
+    else:
+        os.environ.setdefault("LLM_BACKEND", "fake")
+        os.environ.setdefault("ADMIN_TOKEN", ADMIN_TOKEN)
+        os.environ.setdefault("LLM_CACHE_BACKEND", "memory")
+        # Never write into the real history store or signal reloads to a server on this host
+        store_dir = tempfile.TemporaryDirectory(prefix="fairleap-load-test-")
+        os.environ["HISTORY_STORE_PATH"] = os.path.join(store_dir.name, "driver_history.sqlite3")
+        os.environ["MODEL_RELOAD_SIGNAL"] = "off"
+        from app import create_app
+
+        app = create_app()
+        send = in_process_client(app)
+        routes = [r for r in discover_routes(app) if not args.routes or r[1] in args.routes]
+    if not args.include_mutating:
+        routes = [r for r in routes if r[1] not in MUTATING_ROUTES]
+
+    print(f"{'route':<28}{'method':<8}{'ok':>6}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>9}")
+    results = []
+    for method, url in routes:
+        result = run_route(send, method, url, payloads.get(url), args.requests, args.concurrency)
+        results.append(result)
+        print(
+            f"{url:<28}{method:<8}{result['requests'] - result['errors']:>6}{result['errors']:>6}"
+            f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['rps']:>9.1f}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"concurrency": args.concurrency, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Micro-benchmarks for the forecast hot path: feature generation and model
+predict at 7/30/90/365-day windows over different history lengths.
+
+    python benchmarks/micro_bench.py            # compare against baselines.json
+    python benchmarks/micro_bench.py --save     # record new baselines
+
+Exits non-zero when a case is slower than --tolerance times its baseline, or
+slower than its budget in TARGETS_MS.
+Baselines are machine-specific; re-record them on the machine that runs the check.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import model_registry
+from app.inference_utils import TreeEnsemble
+from app.regressor_utils import generate_features_for_forecast, predict_forecast, forecast_recursive
+from benchmarks.load_test import daily_logs
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+WINDOWS = [7, 30, 90, 365]
+HISTORIES = [14, 90, 365]
+FORECAST_START = pd.Timestamp("2025-05-13")
+# Absolute budgets in ms by case and window, checked on top of the baselines:
+# a full year of recursive forecasting on the default backend
+TARGETS_MS = {
+    "recursive_xgboost/window=365": 50.0,
+}
+
+
+def timeit(fn, repeat):
+    """Median wall time in milliseconds after one warm-up call."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return float(np.median(times) * 1000)
+
+
+def run(repeat):
+    models = model_registry.snapshot()
+    xgb = (models["earnings"], models["hours"])
+    native = tuple(m if isinstance(m, TreeEnsemble) else TreeEnsemble.from_booster(m) for m in xgb)
+
+    results = {}
+    for history in HISTORIES:
+        logs = daily_logs(history, end=FORECAST_START - pd.Timedelta(days=1))
+        for window in WINDOWS:
+            end = FORECAST_START + pd.Timedelta(days=window - 1)
+            X = generate_features_for_forecast(logs, FORECAST_START, end, 60)
+            cases = {
+                "features": lambda: generate_features_for_forecast(logs, FORECAST_START, end, 60),
+                "predict_xgboost": lambda: predict_forecast(X.copy(), *xgb),
+                "predict_native": lambda: predict_forecast(X.copy(), *native),
+                "recursive_xgboost": lambda: forecast_recursive(logs, FORECAST_START, end, 60, *xgb),
+                "recursive_native": lambda: forecast_recursive(logs, FORECAST_START, end, 60, *native),
+            }
+            for name, fn in cases.items():
+                key = f"{name}/window={window}/history={history}"
+                results[key] = timeit(fn, repeat)
+                print(f"{key:<45}{results[key]:>10.3f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--save", action="store_true", help="write results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    over_target = [
+        (key, target, value) for key, value in results.items()
+        for prefix, target in TARGETS_MS.items()
+        if key.startswith(prefix + "/") and value > target
+    ]
+    for key, target, value in over_target:
+        print(f"OVER TARGET {key}: {value:.3f} ms > {target:.3f} ms")
+
+    if args.save:
+        with open(args.baselines, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} baselines to {args.baselines}")
+        return
+
+    if not os.path.exists(args.baselines):
+        print(f"No baselines at {args.baselines}; run with --save first")
+        sys.exit(1 if over_target else 0)
+
+    with open(args.baselines) as f:
+        baselines = json.load(f)
+    regressions = [
+        (key, baselines[key], value) for key, value in results.items()
+        if key in baselines and value > baselines[key] * args.tolerance
+    ]
+    for key, before, after in regressions:
+        print(f"REGRESSION {key}: {before:.3f} ms -> {after:.3f} ms")
+    if regressions or over_target:
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance}x")
+
+
+if __name__ == "__main__":
+    main()
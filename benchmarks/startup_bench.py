@@ -0,0 +1,97 @@
+"""
+Cold-start benchmark: how long a fresh process takes from `python` to its first
+forecast, split into the phases a restarted or scaled-up container goes through.
+
+    import_app       import app (module-level stores, caches and clients)
+    create_app       create_app(): load and warm the models
+    first_forecast   the first /predict/earnings request
+    second_forecast  the same request again, i.e. steady state
+    process          wall time of the whole child process, interpreter start included
+
+Every run is a new interpreter started from the repo root, so no import or
+model is reused between runs; the medians over --runs are reported.
+
+Only the optional clients (dashscope, aiohttp, scikit-learn/SciPy) are deferred
+past import_app. numpy and pandas are still imported eagerly, because
+regressor_utils and the history stores use them at module level and every
+forecast needs them. Together with Flask they make up most of import_app
+(pandas alone is about 0.3 s of 0.65 s on one core; see `python -X importtime
+-c "import app"`).
+
+    python benchmarks/startup_bench.py
+    python benchmarks/startup_bench.py --runs 10 --env STARTUP_WARMUP=off
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import route_payloads
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ["import_app", "create_app", "first_forecast", "second_forecast"]
+
+CHILD = """
+import json, sys, time
+payload = json.loads(sys.stdin.read())
+timings = {}
+started = time.perf_counter()
+import app
+timings["import_app"] = time.perf_counter() - started
+mark = time.perf_counter()
+client = app.create_app().test_client()
+timings["create_app"] = time.perf_counter() - mark
+for phase in ("first_forecast", "second_forecast"):
+    mark = time.perf_counter()
+    response = client.post("/predict/earnings", json=payload)
+    timings[phase] = time.perf_counter() - mark
+    assert response.status_code == 200, response.get_data(as_text=True)
+print(json.dumps(timings))
+"""
+
+
+def run_once(payload, env):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], input=json.dumps(payload), capture_output=True, text=True,
+        cwd=ROOT, env=env,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise SystemExit(f"Startup run failed:\n{result.stderr}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["process"] = elapsed
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra environment for the child processes, repeatable")
+    args = parser.parse_args()
+
+    # The forecast cache would turn the second request into a lookup; measure the model path
+    env = dict(os.environ, HISTORY_STORE="off", FORECAST_CACHE="off", LLM_BACKEND="fake")
+    env.update(item.split("=", 1) for item in args.env)
+    payload = route_payloads()["/predict/earnings"]
+
+    runs = []
+    for i in range(args.runs):
+        runs.append(run_once(payload, env))
+        print(f"run {i + 1}/{args.runs}: " + "  ".join(f"{k} {v * 1000:.0f}ms" for k, v in runs[-1].items()),
+              file=sys.stderr)
+
+    print(f"{'phase':<20}{'median ms':>12}{'max ms':>12}")
+    for phase in PHASES + ["process"]:
+        values = [run[phase] * 1000 for run in runs]
+        print(f"{phase:<20}{statistics.median(values):>12.1f}{max(values):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Forecast every driver in a dataset offline, in parallel.
+
+Histories are read from a CSV/Parquet file or a partitioned directory holding
+either daily logs (driver_id, day, total_earnings) or raw work sessions
+(driver_id, timestamp, earnings, as written by data_gen.py), which are folded
+into daily totals. Drivers are sorted and cut into fixed-size shards; a pool of
+worker processes scores the shards with forecast_batch, the same features and
+models as /predict/earnings, and writes one output partition per shard:
+
+    <output>/shard=00000/part-00000.csv   driver_id, date, earnings, predicted_hours_worked
+    <output>/_job.json                    the job parameters
+
+Each worker imports the app package once and loads the models from
+EARNINGS_MODEL_PATH / HOURS_MODEL_PATH on its first shard, and scores its shards single-threaded
+so the pool scales with --workers.
+Partitions are written to a temporary file and renamed, so after a crash the
+same command skips the shards that are already done and scores the rest.
+
+    python model_prototyping/batch_score.py --data data/sessions --output forecasts --days 30
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Histories come from the input files; the scorer has no use for the history store
+os.environ.setdefault("HISTORY_STORE", "off")
+
+from app import model_registry
+from app.regressor_utils import forecast_batch
+from model_prototyping.train import input_files
+
+OUTPUT_COLUMNS = ['driver_id', 'date', 'earnings', 'predicted_hours_worked']
+
+
+def _daily_chunk(chunk):
+    """Per-chunk (driver_id, day) earnings sums of daily logs or raw sessions."""
+    if 'day' in chunk:
+        days = pd.to_datetime(chunk['day'], format="%Y-%m-%d")
+        earnings = chunk['total_earnings']
+    else:
+        days = pd.to_datetime(chunk['timestamp']).dt.normalize()
+        earnings = chunk['earnings']
+    return pd.DataFrame({'driver_id': chunk['driver_id'].astype(str), 'day': days, 'total_earnings': earnings}) \
+        .groupby(['driver_id', 'day'], sort=False)['total_earnings'].sum(min_count=1)
+
+
+def load_histories(path, chunk_rows):
+    """Daily totals of every driver as a (driver_id, day) indexed Series, sorted."""
+    partials = []
+    for file in input_files(path):
+        if file.endswith('.parquet'):
+            partials.append(_daily_chunk(pd.read_parquet(file)))
+        else:
+            partials.extend(_daily_chunk(chunk) for chunk in pd.read_csv(file, chunksize=chunk_rows))
+    return pd.concat(partials).groupby(level=['driver_id', 'day']).sum(min_count=1).sort_index()
+
+
+def make_shards(daily, shard_size):
+    """
+    Cut the sorted drivers into shards of `shard_size`; each shard is a list of
+    (driver_id, days, earnings) so it pickles compactly to a worker.
+    """
+    driver_ids = daily.index.get_level_values('driver_id')
+    days = daily.index.get_level_values('day').to_numpy(dtype='datetime64[ns]')
+    earnings = daily.to_numpy(dtype=np.float64)
+    # Rows are sorted by driver, so each driver is one contiguous slice
+    drivers, starts = np.unique(driver_ids, return_index=True)
+    ends = np.append(starts[1:], len(daily))
+    histories = [(driver, days[s:e], earnings[s:e]) for driver, s, e in zip(drivers, starts, ends)]
+    return [histories[i:i + shard_size] for i in range(0, len(histories), shard_size)]
+
+
+def partition_path(output, shard, fmt):
+    return os.path.join(output, f"shard={shard:05d}", f"part-{shard:05d}.{fmt}")
+
+
+def score_shard(task):
+    """Forecast one shard and write its partition. Returns (shard, drivers, rows)."""
+    shard, histories, job = task
+    models = model_registry.snapshot()
+    drivers = [
+        {'driver_id': driver_id, 'history': (days, earnings), 'start': job['start'], 'end': job['end'],
+         'wellness_score': job['wellness_score']}
+        for driver_id, days, earnings in histories
+    ]
+    scored = forecast_batch(drivers, models['earnings'], models['hours'])
+    frame = pd.concat(scored, names=['driver_id', 'date']).reset_index()
+    frame['date'] = frame['date'].dt.strftime('%Y-%m-%d')
+    frame = frame[OUTPUT_COLUMNS]
+
+    path = partition_path(job['output'], shard, job['format'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    if job['format'] == 'parquet':
+        frame.to_parquet(tmp_path, index=False)
+    else:
+        frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return shard, len(drivers), len(frame)
+
+
+def check_job(output, job):
+    """
+    Record the job parameters, or check them against the ones of the run being
+    resumed: shards only line up when the input and sharding are the same.
+    """
+    path = os.path.join(output, "_job.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != job:
+            raise SystemExit(f"{output} holds a different job ({path}); use a new --output or remove it")
+        return
+    os.makedirs(output, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(job, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', required=True, help='CSV/Parquet file or directory of daily logs or sessions')
+    parser.add_argument('--output', default='forecasts')
+    parser.add_argument('--start', help='first forecast day, default the day after the last day in the data')
+    parser.add_argument('--days', type=int, default=30, help='forecast days per driver')
+    parser.add_argument('--wellness-score', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--shard-size', type=int, default=1000, help='drivers per shard / output partition')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000, help='CSV rows read per chunk')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    daily = load_histories(args.data, args.chunk_rows)
+    if daily.empty:
+        raise SystemExit(f"No histories in {args.data}")
+    start = pd.Timestamp(args.start) if args.start else daily.index.get_level_values('day').max() + pd.Timedelta(days=1)
+    shards = make_shards(daily, args.shard_size)
+    drivers = sum(len(shard) for shard in shards)
+    print(f"Loaded {drivers} drivers ({len(daily)} daily rows) in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    _, versions = model_registry.versioned_snapshot()
+    job = {
+        'data': os.path.abspath(args.data),
+        'start': start.strftime('%Y-%m-%d'),
+        'end': (start + pd.Timedelta(days=args.days - 1)).strftime('%Y-%m-%d'),
+        'wellness_score': args.wellness_score,
+        'shard_size': args.shard_size,
+        'shards': len(shards),
+        'drivers': drivers,
+        'format': args.format,
+        'output': os.path.abspath(args.output),
+        'models': versions,
+    }
+    check_job(args.output, job)
+
+    pending = [i for i in range(len(shards)) if not os.path.exists(partition_path(args.output, i, args.format))]
+    if len(pending) < len(shards):
+        print(f"Resuming: {len(shards) - len(pending)} of {len(shards)} shards already written", file=sys.stderr)
+    tasks = ((i, shards[i], job) for i in pending)
+
+    # spawn: workers import the app (and load the models) themselves instead of
+    # inheriting a forked XGBoost/OpenMP state. One OpenMP thread per worker;
+    # the pool provides the parallelism.
+    os.environ["OMP_NUM_THREADS"] = "1"
+    total_drivers = sum(len(shards[i]) for i in pending)
+    started = time.perf_counter()
+    done_drivers = done_rows = 0
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.workers) as pool:
+        for n, (shard, n_drivers, n_rows) in enumerate(pool.imap_unordered(score_shard, tasks), start=1):
+            done_drivers += n_drivers
+            done_rows += n_rows
+            elapsed = time.perf_counter() - started
+            rate = done_drivers / elapsed if elapsed else 0.0
+            eta = (total_drivers - done_drivers) / rate if rate else 0.0
+            print(f"[{n}/{len(pending)}] shard {shard:05d}: {done_drivers}/{total_drivers} drivers, "
+                  f"{rate:.0f} drivers/s, eta {eta:.0f}s", file=sys.stderr)
+
+    print(f"Scored {done_drivers} drivers ({done_rows} rows) in {time.perf_counter() - started:.1f}s "
+          f"with {args.workers} workers -> {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,117 +1,161 @@
-import pandas as pd
-import numpy as np
-import random
+"""
+Synthetic driver session data.
+
+Every driver gets `sessions` work sessions, each 30 minutes to 4 hours after the
+previous one, starting from a common start time. Rows are generated with NumPy
+in chunks of whole drivers, so memory stays bounded by --chunk-rows no matter
+how many drivers are requested.
+
+    python data_gen.py                                    # 10 drivers x 50 sessions -> synthetic_driver_data.csv
+    python data_gen.py --drivers 50000 --sessions 200 --seed 7 \\
+        --format parquet --partition-by date --output data/sessions
+
+Partitioned output is a directory of hive-style partitions
+(`date=2025-04-25/part-00000.parquet` or `driver_bucket=017/part-00000.csv`).
+Parquet output needs pyarrow.
+"""
+import argparse
+import os
 from datetime import datetime, timedelta
 
+import numpy as np
+import pandas as pd
+
 # Define possible values
-locations = ['Jakarta', 'Bandung', 'Surabaya', 'Semarang', 'Banten']
-drivers = [f'driver_{i}' for i in range(1, 11)]  # 10 drivers
-
-# --- MODIFICATION: Dictionary to track the last timestamp for each driver ---
-last_driver_timestamps = {}
-
-# Initialize last_driver_timestamps with a starting point for each driver
-initial_start_time = datetime.now() - timedelta(days=30)
-for driver_id in drivers:
-    last_driver_timestamps[driver_id] = initial_start_time
-
-# Generate dummy data
-data = []
-for driver_id in drivers:
-    # current_time for this driver starts from their last known timestamp
-    # or the initial start if it's their first set of sessions
-    current_driver_session_time = last_driver_timestamps[driver_id]
-
-    for _ in range(50):  # Each driver has 50 sessions
-        # --- MODIFICATION: Ensure new timestamp is after the driver's last session ---
-        # Add a random number of minutes (and seconds for more granularity)
-        # to the driver's last recorded session time
-        time_increment_minutes = random.randint(30, 240) # Sessions can be 30 mins to 4 hours apart
-        time_increment_seconds = random.randint(1, 59)
-        current_driver_session_time += timedelta(minutes=time_increment_minutes, seconds=time_increment_seconds)
-
-        ts = current_driver_session_time  # This is now the unique timestamp for this session
-        hour_of_day = ts.hour
-        day_of_week = ts.weekday() # Monday=0, Sunday=6
-        location = random.choice(locations)
-
-        # Generate realistic features
-        # Ensure hours_worked is plausible given the time between sessions
-        # For simplicity, we'll keep it random but bounded.
-        # A more complex model could base hours_worked on the next session's start time.
-        hours_worked = round(random.uniform(1, 8), 2) # Max 8 hours per session for this model
-        
-        # Ensure hours_worked doesn't exceed time until next *potential* session start
-        # This is a simplification; in reality, you'd know the session end time.
-        # For now, we'll assume a session doesn't last longer than the typical minimum gap.
-        hours_worked = min(hours_worked, (time_increment_minutes / 60) * 0.8) # e.g., work at most 80% of the gap
-        hours_worked = round(max(0.5, hours_worked), 2) # Min 0.5 hours
-
-
-        rides = random.randint(max(1, int(hours_worked * 1)), max(2, int(hours_worked * 5))) # 1-5 rides per hour
-        
-        # Earnings: base per ride + bonus for hours_worked (e.g. longer engagement)
-        base_ride_earning = random.uniform(10000, 25000) # 10k-25k per ride
-        hourly_bonus_factor = 1 + (hours_worked / 10) # Small bonus for longer hours
-        earnings = round(rides * base_ride_earning * hourly_bonus_factor / 1000) * 1000 # Round to nearest 1000
-
-        avg_ride_duration_minutes = 0
-        if rides > 0:
-            avg_ride_duration_minutes = round((hours_worked * 60) / rides, 2)
-            
-        wellness_score = int(random.uniform(0,100))
-
-        data.append([
-            driver_id,
-            ts.strftime('%Y-%m-%d %H:%M:%S'),  # With seconds
-            day_of_week,
-            hour_of_day,
-            location,
-            hours_worked,
-            rides,
-            earnings,
-            wellness_score,
-            random.choice(locations),  # preferred_location (can be different from current)
-            avg_ride_duration_minutes # In minutes for better readability
-        ])
-    
-    # --- MODIFICATION: Update the global last timestamp for this driver ---
-    last_driver_timestamps[driver_id] = current_driver_session_time
-
-
-# Create DataFrame
+locations = np.array(['Jakarta', 'Bandung', 'Surabaya', 'Semarang', 'Banten'])
+
 columns = [
     'driver_id', 'timestamp', 'day_of_week', 'hour_of_day',
     'location_cluster', 'hours_worked', 'rides_completed',
     'earnings', 'wellness_score', 'preferred_location', 'avg_ride_duration_minutes'
 ]
-df = pd.DataFrame(data, columns=columns)
-
-# Convert to datetime and sort by driver + time (already implicitly sorted by driver, but good practice)
-df['timestamp'] = pd.to_datetime(df['timestamp'])
-df = df.sort_values(by=['driver_id', 'timestamp']).reset_index(drop=True)
-
-# --- Verification (Optional) ---
-def check_timestamp_uniqueness_per_driver(dataframe):
-    all_unique = True
-    for did, group in dataframe.groupby('driver_id'):
-        if not group['timestamp'].is_unique:
-            print(f"Timestamps are NOT unique for driver {did}")
-            all_unique = False
-        # Check if timestamps are sorted
-        if not group['timestamp'].is_monotonic_increasing:
-            print(f"Timestamps are NOT strictly increasing for driver {did}")
-            all_unique = False # Or a different flag for sorted
-    return all_unique
-
-if check_timestamp_uniqueness_per_driver(df):
-    print("✅ Timestamps are unique and strictly increasing per driver.")
-else:
-    print("⚠️ Issue with timestamp uniqueness or order per driver.")
-
-
-# Save to CSV
-df.to_csv('synthetic_driver_data.csv', index=False)
-
-print("✅ Synthetic data generated with unique and sequential timestamps per driver, saved to 'synthetic_driver_data_v2.csv'")
-print(df.head())
\ No newline at end of file
+
+SECONDS_PER_DAY = 86_400
+
+
+def generate_chunk(rng, first_driver, n_drivers, sessions, start):
+    """
+    Sessions of drivers first_driver+1 .. first_driver+n_drivers as a DataFrame,
+    sorted by driver and timestamp.
+    """
+    shape = (n_drivers, sessions)
+
+    # Sessions are 30 min to 4 h apart (plus seconds for granularity); the cumulative
+    # offsets make timestamps unique and strictly increasing per driver
+    gap_minutes = rng.integers(30, 241, size=shape)
+    gap_seconds = gap_minutes * 60 + rng.integers(1, 60, size=shape)
+    timestamps = np.datetime64(start, 's') + np.cumsum(gap_seconds, axis=1).astype('timedelta64[s]')
+
+    # A session lasts at most 80% of the gap before it, between 0.5 and 8 hours
+    hours_worked = np.round(rng.uniform(1, 8, size=shape), 2)
+    hours_worked = np.minimum(hours_worked, (gap_minutes / 60) * 0.8)
+    hours_worked = np.round(np.maximum(0.5, hours_worked), 2)
+
+    # 1-5 rides per hour
+    low = np.maximum(1, (hours_worked * 1).astype(np.int64))
+    high = np.maximum(2, (hours_worked * 5).astype(np.int64))
+    rides = rng.integers(low, high + 1)
+
+    # Earnings: base per ride + bonus for longer engagement, rounded to 1000
+    base_ride_earning = rng.uniform(10000, 25000, size=shape)
+    hourly_bonus_factor = 1 + (hours_worked / 10)
+    earnings = (np.round(rides * base_ride_earning * hourly_bonus_factor / 1000) * 1000).astype(np.int64)
+
+    avg_ride_duration_minutes = np.round((hours_worked * 60) / rides, 2)
+    wellness_score = rng.uniform(0, 100, size=shape).astype(np.int64)
+
+    seconds = timestamps.astype(np.int64)
+    driver_numbers = np.arange(first_driver + 1, first_driver + n_drivers + 1)
+    return pd.DataFrame({
+        'driver_id': np.repeat(np.char.add('driver_', driver_numbers.astype(str)), sessions),
+        'timestamp': timestamps.ravel(),
+        # 1970-01-01 was a Thursday; Monday=0, Sunday=6
+        'day_of_week': ((seconds // SECONDS_PER_DAY + 3) % 7).ravel(),
+        'hour_of_day': (seconds % SECONDS_PER_DAY // 3600).ravel(),
+        'location_cluster': locations[rng.integers(0, len(locations), size=shape)].ravel(),
+        'hours_worked': hours_worked.ravel(),
+        'rides_completed': rides.ravel(),
+        'earnings': earnings.ravel(),
+        'wellness_score': wellness_score.ravel(),
+        # preferred_location can be different from current
+        'preferred_location': locations[rng.integers(0, len(locations), size=shape)].ravel(),
+        'avg_ride_duration_minutes': avg_ride_duration_minutes.ravel(),
+    }, columns=columns)
+
+
+def generate_chunks(drivers=10, sessions=50, seed=None, start=None, chunk_rows=1_000_000):
+    """
+    Yield DataFrames of whole drivers with about `chunk_rows` rows each.
+    Output is reproducible for the same seed, start and chunk_rows.
+    """
+    rng = np.random.default_rng(seed)
+    start = start or datetime.now().replace(microsecond=0) - timedelta(days=30)
+    drivers_per_chunk = max(1, chunk_rows // max(sessions, 1))
+    for first in range(0, drivers, drivers_per_chunk):
+        yield generate_chunk(rng, first, min(drivers_per_chunk, drivers - first), sessions, start)
+
+
+def _write(df, path, fmt, header=True):
+    if fmt == 'parquet':
+        try:
+            df.to_parquet(path, index=False)
+        except ImportError as e:
+            raise SystemExit(f"Parquet output needs pyarrow ({e}); use --format csv") from e
+    else:
+        df.to_csv(path, index=False, header=header, mode='w' if header else 'a')
+
+
+def write_dataset(chunks, output, fmt='csv', partition_by='none', buckets=64):
+    """
+    Stream chunks to `output`. Without partitioning, CSV goes to a single file and
+    Parquet to one part file per chunk in the `output` directory. With partitioning,
+    every chunk adds one part file to each date or driver-bucket partition it touches.
+    Returns the number of rows written.
+    """
+    rows = 0
+    for i, df in enumerate(chunks):
+        rows += len(df)
+        if partition_by == 'none':
+            if fmt == 'csv':
+                _write(df, output, fmt, header=i == 0)
+            else:
+                os.makedirs(output, exist_ok=True)
+                _write(df, os.path.join(output, f'part-{i:05d}.parquet'), fmt)
+            continue
+
+        if partition_by == 'date':
+            keys = df['timestamp'].dt.strftime('%Y-%m-%d').to_numpy()
+            name = 'date'
+        else:
+            numbers = df['driver_id'].str.slice(len('driver_')).astype(np.int64).to_numpy()
+            keys = np.char.zfill((numbers % buckets).astype(str), len(str(buckets - 1)))
+            name = 'driver_bucket'
+        for key in np.unique(keys):
+            directory = os.path.join(output, f'{name}={key}')
+            os.makedirs(directory, exist_ok=True)
+            _write(df[keys == key], os.path.join(directory, f'part-{i:05d}.{fmt}'), fmt)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drivers', type=int, default=10)
+    parser.add_argument('--sessions', type=int, default=50, help='sessions per driver')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--start', type=datetime.fromisoformat, default=None,
+                        help='time sessions start after, default 30 days ago')
+    parser.add_argument('--output', default='synthetic_driver_data.csv')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--partition-by', choices=['none', 'date', 'driver'], default='none')
+    parser.add_argument('--buckets', type=int, default=64, help='driver buckets for --partition-by driver')
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000, help='rows generated per chunk')
+    args = parser.parse_args()
+
+    chunks = generate_chunks(args.drivers, args.sessions, args.seed, args.start, args.chunk_rows)
+    rows = write_dataset(chunks, args.output, args.format, args.partition_by, args.buckets)
+    print(f"✅ Generated {rows} sessions for {args.drivers} drivers with unique and sequential "
+          f"timestamps per driver, saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+Train the earnings and hours models from session data.
+
+Sessions are read in chunks from a CSV/Parquet file or a partitioned directory
+(as written by data_gen.py) and folded into per-driver daily totals. Features
+come from app.regressor_utils.training_features, the same definitions the API
+serves with. Both models are XGBoost regressors trained with the multi-threaded
+`hist` tree method and written as versioned artifacts with a metadata sidecar:
+
+    <output>/earnings/earnings_model-<version>.pkl  (+ .json)
+    <output>/hours/hours_model-<version>.pkl        (+ .json)
+
+Point EARNINGS_MODEL_PATH / HOURS_MODEL_PATH at the two directories and the
+model registry serves the latest version.
+
+    python model_prototyping/train.py --data model_prototyping/synthetic_driver_data.csv
+    python model_prototyping/train.py --data data/sessions --output artifacts --seed 42
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Training reads sessions from files; importing the app must not open the history store.
+# The serving models themselves are only loaded on first use.
+os.environ.setdefault("HISTORY_STORE", "off")
+
+from app.regressor_utils import FEATURE_COLUMNS, training_features
+
+SESSION_COLUMNS = ['driver_id', 'timestamp', 'earnings', 'hours_worked', 'wellness_score']
+HOURS_FEATURES = ['earnings'] + FEATURE_COLUMNS
+
+
+def input_files(path):
+    """A single data file, or every CSV/Parquet file below a (partitioned) directory."""
+    if os.path.isdir(path):
+        files = sorted(
+            glob.glob(os.path.join(path, '**', '*.csv'), recursive=True)
+            + glob.glob(os.path.join(path, '**', '*.parquet'), recursive=True)
+        )
+        if not files:
+            raise FileNotFoundError(f"No .csv or .parquet files in {path}")
+        return files
+    return [path]
+
+
+def read_chunks(path, chunk_rows):
+    for file in input_files(path):
+        if file.endswith('.parquet'):
+            yield pd.read_parquet(file, columns=SESSION_COLUMNS)
+        else:
+            yield from pd.read_csv(file, usecols=SESSION_COLUMNS, chunksize=chunk_rows)
+
+
+def daily_totals(chunks):
+    """
+    Fold sessions into one row per driver and day. Each chunk is reduced on its own
+    and the partial sums are combined, so a day split across chunks or partitions
+    still adds up and only the (much smaller) daily table is kept in memory.
+    """
+    partials = []
+    sessions = 0
+    for chunk in chunks:
+        sessions += len(chunk)
+        chunk = chunk.assign(day=pd.to_datetime(chunk['timestamp']).dt.normalize())
+        partials.append(
+            chunk.groupby(['driver_id', 'day'], sort=False)
+            .agg(total_earnings=('earnings', 'sum'), total_hours=('hours_worked', 'sum'),
+                 wellness_sum=('wellness_score', 'sum'), sessions=('earnings', 'size'))
+        )
+    daily = pd.concat(partials).groupby(level=['driver_id', 'day']).sum().reset_index()
+    # The API is sent an integer wellness score per forecast
+    daily['wellness_score'] = np.round(daily['wellness_sum'] / daily['sessions']).astype(np.int64)
+    return daily.drop(columns='wellness_sum'), sessions
+
+
+def time_split(frame, test_size):
+    """Hold out the last `test_size` fraction of calendar days (time-aware, all drivers)."""
+    days = np.sort(frame['day'].unique())
+    cutoff = days[int(len(days) * (1 - test_size))] if len(days) > 1 else days[-1] + np.timedelta64(1, 'D')
+    train = frame['day'] < cutoff
+    return frame[train], frame[~train], pd.Timestamp(cutoff)
+
+
+def fit(X_train, y_train, X_test, y_test, params):
+    # Imported here so batch_score can reuse this module's file helpers without them
+    from sklearn.metrics import mean_absolute_error, r2_score
+    from xgboost import XGBRegressor
+
+    model = XGBRegressor(**params)
+    model.fit(X_train, y_train)
+    metrics = {}
+    if len(X_test):
+        preds = model.predict(X_test)
+        metrics = {"mae": float(mean_absolute_error(y_test, preds)), "r2": float(r2_score(y_test, preds))}
+    return model, metrics
+
+
+def save_artifact(model, output, name, version, metadata):
+    """Write <output>/<name>/<name>_model-<version>.pkl and its .json sidecar."""
+    directory = os.path.join(output, name)
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, f"{name}_model-{version}")
+    joblib.dump(model, base + ".pkl")
+    with open(base + ".json", "w") as f:
+        json.dump(dict(metadata, name=name, version=version), f, indent=2)
+    return base + ".pkl"
+
+
+def peak_memory_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main():
+    import xgboost
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'synthetic_driver_data.csv'))
+    parser.add_argument('--output', default='artifacts')
+    parser.add_argument('--version', help='artifact version, default a UTC timestamp')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000, help='CSV rows read per chunk')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--n-estimators', type=int, default=750)
+    parser.add_argument('--learning-rate', type=float, default=0.3)
+    parser.add_argument('--max-depth', type=int, default=3)
+    parser.add_argument('--n-jobs', type=int, default=-1, help='training threads, -1 for all cores')
+    args = parser.parse_args()
+
+    version = args.version or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    params = {
+        "n_estimators": args.n_estimators,
+        "learning_rate": args.learning_rate,
+        "max_depth": args.max_depth,
+        "tree_method": "hist",
+        "n_jobs": args.n_jobs,
+        "random_state": args.seed,
+    }
+    timings = {}
+
+    started = time.perf_counter()
+    daily, sessions = daily_totals(read_chunks(args.data, args.chunk_rows))
+    timings["load_seconds"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    frame = training_features(daily)
+    train, test, cutoff = time_split(frame, args.test_size)
+    timings["features_seconds"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    earnings_model, earnings_metrics = fit(
+        train[FEATURE_COLUMNS].astype(np.float32), train['total_earnings'],
+        test[FEATURE_COLUMNS].astype(np.float32), test['total_earnings'], params,
+    )
+    timings["earnings_train_seconds"] = time.perf_counter() - started
+
+    # The hours model sees the earnings as its first feature, like predict_forecast feeds it
+    started = time.perf_counter()
+    hours_train = train[train['total_hours'] > 0]
+    hours_test = test[test['total_hours'] > 0]
+    hours_model, hours_metrics = fit(
+        hours_train[['total_earnings'] + FEATURE_COLUMNS].set_axis(HOURS_FEATURES, axis=1).astype(np.float32),
+        hours_train['total_hours'],
+        hours_test[['total_earnings'] + FEATURE_COLUMNS].set_axis(HOURS_FEATURES, axis=1).astype(np.float32),
+        hours_test['total_hours'], params,
+    )
+    timings["hours_train_seconds"] = time.perf_counter() - started
+
+    metadata = {
+        "created_at": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "data": os.path.abspath(args.data),
+        "sessions": sessions,
+        "drivers": int(daily['driver_id'].nunique()),
+        "daily_rows": len(frame),
+        "train_rows": len(train),
+        "test_rows": len(test),
+        "test_from": cutoff.strftime('%Y-%m-%d'),
+        "params": params,
+        "timings": {name: round(seconds, 3) for name, seconds in timings.items()},
+        "peak_memory_mb": round(peak_memory_mb(), 1),
+        "xgboost": xgboost.__version__,
+        "python": platform.python_version(),
+    }
+    paths = [
+        save_artifact(earnings_model, args.output, "earnings", version,
+                      dict(metadata, features=FEATURE_COLUMNS, target="total_earnings", metrics=earnings_metrics)),
+        save_artifact(hours_model, args.output, "hours", version,
+                      dict(metadata, features=HOURS_FEATURES, target="total_hours", metrics=hours_metrics)),
+    ]
+
+    print(f"Sessions: {sessions}  drivers: {metadata['drivers']}  daily rows: {len(frame)} "
+          f"(train {len(train)}, test {len(test)} from {metadata['test_from']})")
+    print(f"Earnings: {earnings_metrics}")
+    print(f"Hours:    {hours_metrics}")
+    for name, seconds in metadata["timings"].items():
+        print(f"{name:<24}{seconds:>10.3f}")
+    print(f"{'peak_memory_mb':<24}{metadata['peak_memory_mb']:>10.1f}")
+    for path in paths:
+        print(f"Saved {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Tests run against the app package from the repo root, offline: no history
+# database on disk, no shared reload signal and the local Qwen stand-in instead of dashscope
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault("HISTORY_STORE", "off")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FAKE_LLM_LATENCY", "0")
+os.environ.setdefault("MODEL_RELOAD_SIGNAL", "off")
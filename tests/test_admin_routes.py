@@ -0,0 +1,66 @@
+"""Routes that expose driver data or change server state require the admin token."""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture(scope="module")
+def client():
+    return app_module.create_app().test_client()
+
+
+@pytest.mark.parametrize("method,path", [
+    ("GET", "/history/features/driver_1"),
+    ("GET", "/history/logs/driver_1"),
+    ("DELETE", "/history/logs/driver_1"),
+    ("POST", "/history/logs"),
+    ("POST", "/history/sessions"),
+    ("GET", "/history/stats"),
+    ("GET", "/admin/models"),
+    ("POST", "/admin/models/reload"),
+])
+@pytest.mark.parametrize("token", [None, "wrong"])
+def test_requires_admin_token(client, monkeypatch, method, path, token):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": token} if token else {}
+    response = client.open(path, method=method, headers=headers, json={})
+    assert response.status_code == 403
+
+
+def test_admin_token_accepted(client, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    # Authorized, but the history store is off in tests
+    response = client.get("/history/features/driver_1", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 404
+
+
+FORECAST = {"start": "2025-05-13", "end": "2025-05-20", "wellness_score": 60}
+DASHBOARD = dict(
+    FORECAST, pendapatan=6000000, pengeluaran=4000000, toleransi_risiko="medium",
+    energy_level=6, stress_level=4, sleep_quality=5, physical_condition=7,
+)
+
+
+@pytest.mark.parametrize("path,body", [
+    ("/predict/earnings", dict(FORECAST, driver_id="driver_1")),
+    ("/predict/earnings/scenarios", dict(FORECAST, driver_id="driver_1")),
+    ("/dashboard", dict(DASHBOARD, driver_id="driver_1")),
+])
+def test_stored_history_requires_admin_token(client, monkeypatch, path, body):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    assert client.post(path, json=body).status_code == 403
+    # Authorized, but the history store is off in tests
+    assert client.post(path, json=body, headers={"X-Admin-Token": "secret"}).status_code == 400
+
+
+def test_batch_stored_history_requires_admin_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(app_module, "session_aggregator", object())
+    body = {"drivers": [dict(FORECAST, driver_id="driver_1")]}
+    assert client.post("/predict/earnings/batch", json=body).status_code == 403
+
+
+def test_daily_logs_need_no_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+    logs = [{"day": "2025-05-12", "total_earnings": 250000.0}]
+    assert client.post("/predict/earnings", json=dict(FORECAST, daily_logs=logs)).status_code == 200
@@ -0,0 +1,135 @@
+"""Bucketing of prompt inputs and coalescing of identical in-flight LLM calls."""
+import threading
+import time
+
+import pytest
+
+from app.cache_utils import MemoryCache, SingleFlight, normalize_inputs
+
+
+@pytest.mark.parametrize("income,bucket", [
+    (0, 0),
+    (3_400, 3_000),
+    (37_000, 40_000),
+    (120_000, 100_000),
+    (249_999, 200_000),
+    (260_000, 300_000),
+    (1_240_000, 1_000_000),
+    (1_260_000, 1_500_000),
+    (-180_000, -200_000),
+])
+def test_money_buckets(income, bucket):
+    assert normalize_inputs({"pendapatan": income})["pendapatan"] == bucket
+
+
+def test_small_values_never_round_to_zero():
+    for income in (1, 900, 50_000, 249_000):
+        assert normalize_inputs({"pendapatan": income})["pendapatan"] > 0
+
+
+def test_strings():
+    assert normalize_inputs({"pendapatan": " 1300000 ", "goal": "  Rumah "}) == {"pendapatan": 1_500_000, "goal": "rumah"}
+
+
+def start_flights(flights, n, key, fn, timeout=None):
+    """Call flights.do(key, fn) from n threads; returns the threads and their outcomes."""
+    outcomes = [None] * n
+
+    def run(i):
+        try:
+            outcomes[i] = flights.do(key, fn, timeout=timeout)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def wait_for_followers(flights, n):
+    deadline = time.monotonic() + 5
+    while flights.stats()["followers"] < n and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_single_flight_one_upstream_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    threads, outcomes = start_flights(flights, 8, "key", upstream)
+    wait_for_followers(flights, 7)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(outcomes, key=lambda o: o[1]) == [("answer", False)] + [("answer", True)] * 7
+    assert flights.stats() == {"leaders": 1, "followers": 7, "timeouts": 0, "in_flight": 0}
+
+
+def test_single_flight_shares_the_leaders_exception():
+    flights = SingleFlight()
+    release = threading.Event()
+    error = RuntimeError("LLM call failed: InternalError")
+
+    def upstream():
+        release.wait(5)
+        raise error
+
+    threads, outcomes = start_flights(flights, 5, "key", upstream)
+    wait_for_followers(flights, 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(outcome is error for outcome in outcomes)
+    # The failed flight is gone; the next caller leads a new one
+    assert flights.do("key", lambda: "retry") == ("retry", False)
+
+
+def test_single_flight_follower_timeout_leaves_the_leader_running():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader, leader_outcome = start_flights(flights, 1, "key", lambda: release.wait(5) and "answer")
+    while flights.stats()["in_flight"] == 0:
+        time.sleep(0.005)
+
+    with pytest.raises(TimeoutError):
+        flights.do("key", lambda: "not called", timeout=0.05)
+    assert flights.stats()["timeouts"] == 1
+    assert flights.stats()["in_flight"] == 1
+
+    release.set()
+    leader[0].join()
+    assert leader_outcome == [("answer", False)]
+
+
+def test_single_flight_keys_are_independent():
+    flights = SingleFlight()
+    assert flights.do("a", lambda: 1) == (1, False)
+    assert flights.do("b", lambda: 2) == (2, False)
+    assert flights.stats()["followers"] == 0
+
+
+def test_memory_cache_byte_bound():
+    cache = MemoryCache(max_entries=100, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "yyyy")
+    assert cache.get("a") == "xxxx"
+    cache.set("c", "zzzz")
+    # "b" was the least recently used
+    assert (cache.get("b"), cache.bytes, len(cache)) == (None, 8, 2)
+
+    cache.set("a", "x")
+    assert cache.bytes == 5
+    cache.set("huge", "w" * 11)
+    assert cache.get("huge") is None and cache.bytes == 5
+    cache.delete("c")
+    assert cache.bytes == 1
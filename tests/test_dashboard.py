@@ -0,0 +1,86 @@
+"""/dashboard sections that miss their deadline."""
+import threading
+
+import numpy as np
+import pytest
+
+import app as app_module
+from app import chatbot_utils
+from app.fallback_utils import CircuitBreaker
+
+from test_regressor_features import random_history
+
+LLM_SECTIONS = ["wellness", "fin_tips", "invest"]
+
+
+@pytest.fixture(scope="module")
+def client():
+    return app_module.create_app().test_client()
+
+
+@pytest.fixture
+def slow_llm(monkeypatch):
+    """LLM calls that take 0.5s against 0.1s section deadlines, one run per section at a time."""
+    fake = chatbot_utils.get_fake_llm()
+    monkeypatch.setattr(fake, "latency", 0.5)
+    monkeypatch.setattr(fake, "tokens_per_sec", 1e6)
+    for name in LLM_SECTIONS:
+        monkeypatch.setitem(app_module.DASHBOARD_DEADLINES, name, 0.1)
+        monkeypatch.setitem(app_module.dashboard_slots, name, threading.BoundedSemaphore(1))
+    return fake
+
+
+def dashboard_body(pendapatan):
+    return {
+        "start": "2025-05-13", "end": "2025-05-26", "wellness_score": 60,
+        "daily_logs": random_history(np.random.default_rng(0), 30),
+        "pendapatan": pendapatan, "pengeluaran": 4_000_000, "toleransi_risiko": "medium",
+        "energy_level": 6, "stress_level": 4, "sleep_quality": 5, "physical_condition": 7,
+    }
+
+
+def wait_for_slots():
+    for name in LLM_SECTIONS:
+        slot = app_module.dashboard_slots[name]
+        assert slot.acquire(timeout=5), f"{name} never finished"
+        slot.release()
+
+
+def test_timed_out_sections_hold_their_slot(client, slow_llm):
+    body = dashboard_body(7_000_000)
+
+    first = client.post("/dashboard", json=body).get_json()
+    assert first["status"] == "partial"
+    assert first["sections"]["forecast"]["status"] == "success"
+    for name in LLM_SECTIONS:
+        assert first["sections"][name]["status"] == "timeout"
+
+    # The timed-out calls are still running: no second run is stacked behind them
+    calls = slow_llm.calls
+    second = client.post("/dashboard", json=body).get_json()
+    assert second["sections"]["forecast"]["status"] == "success"
+    for name in LLM_SECTIONS:
+        assert second["sections"][name]["status"] == "overloaded"
+        assert second["sections"][name]["retry_after"] >= 1
+    assert slow_llm.calls == calls
+
+    # Once they finish the slots are free, and their answers were cached
+    wait_for_slots()
+    third = client.post("/dashboard", json=body).get_json()
+    for name in LLM_SECTIONS:
+        assert third["sections"][name]["status"] == "success"
+
+
+def test_slot_released_on_failure(client, slow_llm, monkeypatch):
+    monkeypatch.setattr(slow_llm, "latency", 0)
+    monkeypatch.setattr(slow_llm, "failure_rate", 1.0)
+    monkeypatch.setattr(app_module, "LLM_FALLBACK", False)
+    # Keep these failures out of the shared breakers
+    for spec in (app_module.FIN_TIPS_SPEC, app_module.WELLNESS_SPEC):
+        monkeypatch.setattr(spec, "breaker", CircuitBreaker(spec.name))
+    body = dashboard_body(11_000_000)
+
+    for _ in range(2):
+        sections = client.post("/dashboard", json=body).get_json()["sections"]
+        assert sections["invest"]["status"] == "error"
+    wait_for_slots()
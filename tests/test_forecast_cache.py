@@ -0,0 +1,52 @@
+"""Forecast cache hits, prefix reuse and memory bounds."""
+import numpy as np
+
+from app import model_registry
+from app.forecast_cache_utils import PREDICTION_RECORD_BYTES, ForecastCache
+
+from test_regressor_features import random_history
+
+START, END = "2025-05-13", "2025-08-10"
+
+
+def forecast(cache, logs, start=START, end=END, mode="static"):
+    models, versions = model_registry.versioned_snapshot()
+    return cache.forecast(logs, start, end, 60, mode, models, versions)
+
+
+def test_appended_logs_reuse_the_parsed_prefix():
+    logs = random_history(np.random.default_rng(0), 60, gaps=True)
+    cache = ForecastCache()
+    forecast(cache, logs[:-1])
+    predictions = forecast(cache, logs)
+
+    assert cache.stats()["prefix_hits"] == 1
+    assert predictions == forecast(ForecastCache(enabled=False), logs)
+    assert forecast(cache, logs) is predictions
+    assert cache.stats()["hits"] == 1
+
+
+def test_recursive_forecasts_are_cached_whole():
+    logs = random_history(np.random.default_rng(2), 60)
+    cache = ForecastCache()
+    forecast(cache, logs[:-1], mode="recursive")
+    predictions = forecast(cache, logs, mode="recursive")
+
+    assert predictions == forecast(ForecastCache(enabled=False), logs, mode="recursive")
+    assert predictions != forecast(cache, logs)
+    assert forecast(cache, logs, mode="recursive") is predictions
+    stats = cache.stats()
+    assert (stats["hits"], stats["prefix_hits"], stats["misses"]) == (1, 0, 3)
+
+
+def test_byte_bound():
+    logs = random_history(np.random.default_rng(1), 30)
+    window_days = 90
+    cache = ForecastCache(max_bytes=2 * window_days * PREDICTION_RECORD_BYTES)
+    for offset in range(4):
+        forecast(cache, logs[offset:])
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] == 2 * window_days * PREDICTION_RECORD_BYTES
+    assert stats["state_bytes"] > 0
@@ -0,0 +1,62 @@
+"""Numerical parity of the native TreeEnsemble backend with the XGBoost models it is exported from."""
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.inference_utils import TreeEnsemble, parity_rows, select_backend
+from app.regressor_utils import FEATURE_COLUMNS, generate_features_for_forecast
+
+MODEL_PATHS = {"earnings": "./app/earnings_model.pkl", "hours": "./app/hours_model.pkl"}
+
+
+@pytest.fixture(scope="module", params=sorted(MODEL_PATHS))
+def exported(request):
+    model = joblib.load(MODEL_PATHS[request.param])
+    return model, TreeEnsemble.from_booster(model)
+
+
+def assert_parity(actual, expected):
+    np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-2)
+
+
+@pytest.mark.parametrize("n_rows", [1, 7, TreeEnsemble.BLOCK_ROWS, TreeEnsemble.BLOCK_ROWS * 3 + 5])
+def test_matches_xgboost_on_threshold_rows(exported, n_rows):
+    """Values on and around every split threshold, 5% missing, across block boundaries."""
+    model, ensemble = exported
+    X = parity_rows(ensemble, n_rows, seed=n_rows)
+    assert_parity(ensemble.predict(X), model.predict(X))
+
+
+def test_matches_xgboost_on_forecast_features(exported):
+    model, ensemble = exported
+    rng = np.random.default_rng(0)
+    days = pd.date_range(end="2025-05-12", periods=90, freq="D")
+    logs = [{"day": d.strftime("%Y-%m-%d"), "total_earnings": float(rng.integers(50, 500) * 1000)} for d in days]
+    X = generate_features_for_forecast(logs, "2025-05-13", "2026-05-12", 60)[FEATURE_COLUMNS].to_numpy(np.float32)
+    if ensemble.n_features == X.shape[1] + 1:
+        # The hours model takes the predicted earnings first
+        X = np.column_stack([rng.uniform(5e4, 5e5, len(X)).astype(np.float32), X])
+    assert_parity(ensemble.predict(X), model.predict(X))
+
+
+def test_empty_matrix(exported):
+    _, ensemble = exported
+    assert ensemble.predict(np.empty((0, ensemble.n_features), dtype=np.float32)).shape == (0,)
+
+
+@pytest.mark.parametrize("delta", [-1, 1])
+def test_rejects_wrong_width(exported, delta):
+    _, ensemble = exported
+    with pytest.raises(ValueError, match="features"):
+        ensemble.predict(np.zeros((3, ensemble.n_features + delta), dtype=np.float32))
+
+
+def test_selected_backend_delegates_large_matrices(exported):
+    model, _ = exported
+    ensemble = select_backend(model, "native")
+    X = parity_rows(ensemble, TreeEnsemble.LARGE_BATCH_ROWS + 1)
+    assert ensemble.large_batch_model is model
+    np.testing.assert_array_equal(ensemble.predict(X), model.predict(X))
+    small = X[:TreeEnsemble.LARGE_BATCH_ROWS]
+    assert_parity(ensemble.predict(small), model.predict(small))
@@ -0,0 +1,152 @@
+"""LLMGateway against a local fake of dashscope's text-generation endpoint."""
+import threading
+import time
+
+import pytest
+
+from app import chatbot_utils
+from app.chatbot_utils import response_text, stream_qwen
+from app.fake_llm_utils import FAKE_CHAT_ANSWER, FakeLLM, FakeServer
+from app.gateway_utils import GatewayOverloaded, LLMGateway
+
+MESSAGES = [{"role": "user", "content": "Bagaimana cara mencegah kelelahan?"}]
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = FakeServer(FakeLLM(latency=0.3, tokens_per_sec=1000)).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def gateway(server):
+    server.stats["max_in_flight"] = 0
+    gateway = LLMGateway(server.base_url, max_concurrency=4, queue_limit=6, queue_limits={"chatbot": 2},
+                         total_queue_limit=8)
+    yield gateway
+    gateway.close()
+
+
+def in_parallel(n, fn):
+    """Run fn(i) on n threads at once; returns results and exceptions by index."""
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = fn(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_call(gateway):
+    response = gateway.call(MESSAGES, endpoint="fin_tips")
+    assert response.status_code == 200
+    assert response_text(response) == FAKE_CHAT_ANSWER
+    assert response.usage.output_tokens > 0
+
+
+def test_concurrency_cap(gateway, server):
+    results = in_parallel(6, lambda i: response_text(gateway.call(MESSAGES, endpoint="fin_tips")))
+    assert results == [FAKE_CHAT_ANSWER] * 6
+    assert server.stats["max_in_flight"] == 4
+
+
+def test_sheds_past_endpoint_queue_limit(gateway):
+    results = in_parallel(10, lambda i: gateway.call(MESSAGES, endpoint="fin_tips"))
+    shed = [r for r in results if isinstance(r, GatewayOverloaded)]
+    assert len(shed) == 4
+    assert all(r.retry_after >= 1 for r in shed)
+    assert gateway.stats()["shed"] == {"fin_tips": 4}
+    assert gateway.stats()["pending"]["fin_tips"] == 0
+
+
+def test_total_queue_limit_spans_endpoints(gateway):
+    endpoints = ["fin_tips", "wellness", "invest"]
+    results = in_parallel(12, lambda i: gateway.call(MESSAGES, endpoint=endpoints[i % 3]))
+    assert sum(isinstance(r, GatewayOverloaded) for r in results) == 4
+
+
+def test_timeout_frees_the_slot(gateway):
+    with pytest.raises(Exception) as error:
+        gateway.call(MESSAGES, endpoint="fin_tips", timeout=0.05)
+    assert isinstance(error.value, TimeoutError)
+    assert gateway.stats()["pending"]["fin_tips"] == 0
+
+
+def test_stream(gateway):
+    chunks = list(gateway.stream(MESSAGES, endpoint="chatbot"))
+    assert "".join(response_text(chunk) for chunk in chunks) == FAKE_CHAT_ANSWER
+    assert chunks[-1].usage.output_tokens == len(chunks)
+    assert gateway.stats()["pending"]["chatbot"] == 0
+
+
+def test_streams_count_against_the_queue(gateway):
+    streams = [gateway.stream(MESSAGES, endpoint="chatbot") for _ in range(2)]
+    with pytest.raises(GatewayOverloaded):
+        gateway.stream(MESSAGES, endpoint="chatbot")
+    with pytest.raises(GatewayOverloaded):
+        gateway.call(MESSAGES, endpoint="chatbot")
+
+    # Closing a stream early, e.g. on client disconnect, gives its slot back
+    next(streams[0])
+    streams[0].close()
+    assert response_text(gateway.call(MESSAGES, endpoint="chatbot")) == FAKE_CHAT_ANSWER
+    streams[1].close()
+    assert gateway.stats()["pending"]["chatbot"] == 0
+
+
+def test_stream_timeout(gateway):
+    stream = gateway.stream(MESSAGES, endpoint="chatbot", timeout=0.05)
+    with pytest.raises(TimeoutError):
+        list(stream)
+    assert gateway.stats()["pending"]["chatbot"] == 0
+
+
+def test_stream_error_event(monkeypatch):
+    failing = FakeServer(FakeLLM(latency=0, tokens_per_sec=1000, failure_rate=1.0)).start()
+    gateway = LLMGateway(failing.base_url)
+    monkeypatch.setenv("LLM_BACKEND", "dashscope")
+    monkeypatch.setattr(chatbot_utils, "_gateway", gateway)
+    try:
+        with pytest.raises(RuntimeError, match="InternalError"):
+            list(stream_qwen(MESSAGES))
+        assert gateway.stats()["pending"]["chatbot"] == 0
+    finally:
+        gateway.close()
+        failing.stop()
+
+
+def test_chatbot_stream_is_shed_with_429(gateway, monkeypatch):
+    import app as app_module
+
+    monkeypatch.setenv("LLM_BACKEND", "dashscope")
+    monkeypatch.setattr(chatbot_utils, "_gateway", gateway)
+    client = app_module.create_app().test_client()
+    body = {"query": "Tips asuransi kendaraan?", "stream": True,
+            "messages": [{"role": "system", "content": "test"}, {"role": "user", "content": "Halo"},
+                         {"role": "assistant", "content": "Halo!"}]}
+
+    response = client.post("/llm/chatbot", json=body)
+    assert response.status_code == 200
+    assert FAKE_CHAT_ANSWER.split(" ")[0] in response.get_data(as_text=True)
+
+    held = [gateway.stream(MESSAGES, endpoint="chatbot") for _ in range(2)]
+    try:
+        started = time.monotonic()
+        response = client.post("/llm/chatbot", json=body)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert time.monotonic() - started < 0.3
+    finally:
+        for stream in held:
+            stream.close()
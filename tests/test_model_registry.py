@@ -0,0 +1,90 @@
+"""Model reloads reaching every worker through the shared signal file."""
+import json
+import shutil
+import threading
+
+import pytest
+
+from app import registry_utils
+from app.registry_utils import ModelRegistry
+
+ARTIFACTS = {"earnings": "./app/earnings_model.pkl", "hours": "./app/hours_model.pkl"}
+
+
+def set_version(artifact_dir, name, version):
+    with open(artifact_dir / f"{name}.json", "w") as f:
+        json.dump({"version": version}, f)
+
+
+@pytest.fixture
+def artifact_dir(tmp_path):
+    artifacts = tmp_path / "models"
+    artifacts.mkdir()
+    for name, path in ARTIFACTS.items():
+        shutil.copy(path, artifacts / f"{name}.pkl")
+        set_version(artifacts, name, "v1")
+    return artifacts
+
+
+def worker(artifact_dir, tmp_path):
+    """A registry as one gunicorn worker would hold it."""
+    paths = {name: str(artifact_dir / f"{name}.pkl") for name in ARTIFACTS}
+    registry = ModelRegistry(paths, signal_path=str(tmp_path / "reload.json"))
+    registry.load_all()
+    return registry
+
+
+def test_published_reload_reaches_other_workers(artifact_dir, tmp_path):
+    workers = [worker(artifact_dir, tmp_path) for _ in range(3)]
+    set_version(artifact_dir, "earnings", "v2")
+
+    # An admin reload lands on the first worker only
+    assert workers[0].reload(force=True) == list(ARTIFACTS)
+    assert workers[0].publish_reload(force=True)
+    assert workers[0].maybe_reload() is None
+
+    for other in workers[1:]:
+        assert other.versioned_snapshot()[1]["earnings"] == "v1"
+        other._background.join()
+        assert other.versioned_snapshot()[1]["earnings"] == "v2"
+        # Seen once, not reloaded on every following request
+        assert other.maybe_reload() is None
+
+
+def test_signals_from_before_start_are_ignored(artifact_dir, tmp_path):
+    worker(artifact_dir, tmp_path).publish_reload()
+    late = worker(artifact_dir, tmp_path)
+    assert late.maybe_reload() is None
+
+
+def test_requests_keep_serving_while_loading(artifact_dir, tmp_path, monkeypatch):
+    registry = worker(artifact_dir, tmp_path)
+    old_models = registry.snapshot()
+    loading, release = threading.Event(), threading.Event()
+    load = registry_utils.joblib.load
+
+    def slow_load(path):
+        loading.set()
+        release.wait(5)
+        return load(path)
+
+    monkeypatch.setattr(registry_utils.joblib, "load", slow_load)
+    thread = registry.reload_in_background(force=True)
+    assert loading.wait(5)
+
+    assert registry.snapshot() == old_models
+    assert registry.reload_in_background(force=True) is None
+    release.set()
+    thread.join()
+    assert registry.snapshot()["earnings"] is not old_models["earnings"]
+
+
+def test_failed_background_reload_keeps_old_models(artifact_dir, tmp_path):
+    registry = worker(artifact_dir, tmp_path)
+    old_models = registry.snapshot()
+    (artifact_dir / "earnings.pkl").write_bytes(b"not a pickle")
+
+    registry.reload_in_background(force=True).join()
+
+    assert registry.snapshot() == old_models
+    assert "earnings" in registry.last_error
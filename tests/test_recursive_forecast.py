@@ -0,0 +1,112 @@
+"""
+Recursive forecasting against a naive per-day recompute: the O(1) rolling
+window state, and whole forecasts scored one XGBoost predict call per day.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import model_registry
+from app.regressor_utils import (
+    FEATURE_COLUMNS,
+    LAG_COLUMNS,
+    N_LAGS,
+    RollingWindowState,
+    forecast_chunks,
+    forecast_recursive,
+    lag_matrix,
+    parse_history,
+)
+from tests.test_regressor_features import random_history
+
+START, END = pd.Timestamp("2025-05-13"), pd.Timestamp("2025-08-10")
+
+
+def naive_rolling(window):
+    """Rolling stats recomputed from the full list of days, oldest first."""
+    last_7, last_14 = np.asarray(window[-7:]), np.asarray(window[-N_LAGS:])
+    rolling_mean_7 = rolling_std_7 = rolling_mean_14 = np.nan
+    if not np.isnan(last_7).any():
+        rolling_mean_7, rolling_std_7 = last_7.mean(), last_7.std()
+    if not np.isnan(last_14).any():
+        rolling_mean_14 = last_14.mean()
+    return rolling_mean_7, rolling_std_7, rolling_mean_14
+
+
+def naive_lags(window):
+    return np.asarray(window[::-1][:N_LAGS])
+
+
+SEEDS = {
+    # lag_1..lag_14 the state starts from
+    "full": np.arange(1, N_LAGS + 1) * 10_000.0,
+    # Fewer than 14 logged days: the oldest lags are missing
+    "short_history": np.r_[np.arange(1, 6) * 10_000.0, [np.nan] * 9],
+    # Missing days inside the window
+    "gaps": np.r_[[120_000.0, np.nan, 80_000.0], [95_000.0] * 6, [np.nan, 70_000.0], [60_000.0] * 3],
+    "empty": np.full(N_LAGS, np.nan),
+}
+
+
+@pytest.mark.parametrize("seed_lags", SEEDS.values(), ids=SEEDS.keys())
+def test_window_state_matches_naive_recompute(seed_lags):
+    rng = np.random.default_rng(0)
+    state = RollingWindowState(seed_lags)
+    window = list(seed_lags[::-1])
+    pushed = np.r_[rng.integers(50, 500, size=10) * 1000.0, [np.nan], rng.integers(50, 500, size=20) * 1000.0]
+
+    for value in pushed:
+        np.testing.assert_array_equal(state.lags(), naive_lags(window))
+        np.testing.assert_allclose(state.rolling(), naive_rolling(window), rtol=1e-9, atol=1e-6)
+        state.push(value)
+        window.append(value)
+
+
+def test_window_state_std_of_constant_values():
+    """Running sums of squares must not leave a cancellation residue (or a negative variance) on flat weeks."""
+    state = RollingWindowState(np.full(N_LAGS, 250_000.0))
+    window = [250_000.0] * N_LAGS
+    for value in [250_000.0] * 5 + [333_333.3] * 20 + [0.1] * 10:
+        _, rolling_std_7, _ = state.rolling()
+        if len(set(window[-7:])) == 1:
+            assert 0.0 <= rolling_std_7 <= 1e-12 * window[-1]
+        state.push(value)
+        window.append(value)
+
+
+def naive_recursive(logs, start, end, wellness_score, earnings_model):
+    """Recompute every day's features from the seed window plus the predictions so far."""
+    hist_days, hist_earnings = parse_history(logs)
+    dates = pd.date_range(start, end, freq="D")
+    window = list(lag_matrix(hist_days, hist_earnings, dates[:1])[0][::-1])
+    rows, earnings = [], []
+    for date in dates:
+        row = [date.dayofweek, int(date.dayofweek >= 5), wellness_score, *naive_rolling(window), *naive_lags(window)]
+        prediction = abs(float(earnings_model.predict(np.asarray([row], dtype=np.float32))[0]))
+        rows.append(row)
+        earnings.append(prediction)
+        window.append(prediction)
+    return np.asarray(rows), np.asarray(earnings)
+
+
+@pytest.mark.parametrize("n_days,gaps", [(0, False), (5, False), (10, True), (60, False), (40, True)])
+def test_recursive_matches_naive_loop(n_days, gaps):
+    models = model_registry.snapshot()
+    logs = random_history(np.random.default_rng(n_days), n_days, gaps=gaps)
+
+    expected_rows, expected_earnings = naive_recursive(logs, START, END, 60, models["earnings"])
+    actual = forecast_recursive(logs, START, END, 60, models["earnings"], models["hours"])
+
+    np.testing.assert_allclose(actual[FEATURE_COLUMNS].to_numpy(), expected_rows, rtol=1e-4)
+    np.testing.assert_allclose(actual["earnings"], expected_earnings, rtol=1e-4)
+    assert actual["predicted_hours_worked"].notna().all()
+
+
+def test_recursive_chunks_carry_the_window_state():
+    models = model_registry.snapshot()
+    logs = random_history(np.random.default_rng(7), 30, gaps=True)
+    whole = forecast_recursive(logs, START, END, 60, models["earnings"], models["hours"])
+    chunks = pd.concat(forecast_chunks(
+        *parse_history(logs), START, END, 60, "recursive", models["earnings"], models["hours"], chunk_days=7
+    ))
+    pd.testing.assert_frame_equal(chunks[LAG_COLUMNS + ["earnings"]], whole[LAG_COLUMNS + ["earnings"]], check_freq=False)
@@ -0,0 +1,176 @@
+"""
+Parity of the vectorized feature engine with the original per-row loop.
+`baseline_features` is generate_features_for_forecast as it was before the
+rewrite, kept here verbatim apart from the commented-out code.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import model_registry
+from app.regressor_utils import (
+    FEATURE_COLUMNS,
+    features_from_history,
+    generate_features_for_forecast,
+    parse_history,
+    predict_forecast,
+    training_features,
+)
+
+
+def baseline_features(hist_json, forecast_start, forecast_end, wellness_score):
+    date_range = pd.date_range(start=forecast_start, end=forecast_end, freq='D')
+
+    df_hist = pd.DataFrame(hist_json)
+    if not df_hist.empty:
+        df_hist["day"] = pd.to_datetime(df_hist["day"], format="%Y-%m-%d")
+        df_hist.set_index("day", inplace=True)
+        df_hist.sort_index(inplace=True)
+
+    df_pred = pd.DataFrame(index=date_range)
+    df_pred.index.name = 'timestamp'
+
+    df_pred['earnings'] = np.nan
+    df_pred['day_of_week'] = df_pred.index.dayofweek
+    df_pred['is_weekend'] = df_pred['day_of_week'].apply(lambda x: 1 if x >= 5 else 0)
+    df_pred["wellness_score"] = wellness_score
+
+    df_pred['rolling_mean_7'] = np.nan
+    df_pred['rolling_std_7'] = np.nan
+    df_pred['rolling_mean_14'] = np.nan
+    for lag in range(1, 15):
+        df_pred[f'lag_{lag}'] = np.nan
+
+    history = df_hist.copy()
+    min_hist_date = history.index[0] if not history.empty else None
+
+    for idx in df_pred.index:
+        if not history.empty:
+            all_historical_earnings = history['total_earnings']
+            if len(all_historical_earnings) >= 7:
+                df_pred.loc[idx, 'rolling_mean_7'] = np.mean(all_historical_earnings.iloc[-7:])
+                df_pred.loc[idx, 'rolling_std_7'] = np.std(all_historical_earnings.iloc[-7:])
+            if len(all_historical_earnings) >= 14:
+                df_pred.loc[idx, 'rolling_mean_14'] = np.mean(all_historical_earnings.iloc[-14:])
+
+        for lag in range(1, 15):
+            col_name = f'lag_{lag}'
+            val = np.nan
+            if not history.empty and min_hist_date is not None:
+                lag_idx = idx - pd.Timedelta(days=lag)
+                if lag_idx >= min_hist_date:
+                    lag_values_series = history.loc[history.index <= lag_idx, 'total_earnings']
+                    if not lag_values_series.empty:
+                        val = lag_values_series.iloc[-1]
+            df_pred.loc[idx, col_name] = val
+
+    return df_pred
+
+
+def baseline_predict(X_pred, earnings_model, hours_model):
+    X_pred['earnings'] = np.abs(earnings_model.predict(X_pred[X_pred.columns.drop(['earnings'])]))
+    X_pred['predicted_hours_worked'] = np.abs(hours_model.predict(X_pred[X_pred.columns]))
+    return X_pred
+
+
+def random_history(rng, n_days, gaps=False, duplicates=False, shuffle=False):
+    """Daily logs ending 2025-05-12; optionally with missing days, repeated days and out of order."""
+    days = pd.date_range(end="2025-05-12", periods=n_days * (3 if gaps else 1), freq="D")
+    if gaps:
+        days = days[np.sort(rng.choice(len(days), size=n_days, replace=False))]
+    days = list(days)
+    if duplicates and days:
+        # Repeated days keep distinct values; the later entry must win
+        days += [days[i] for i in rng.choice(len(days), size=max(1, n_days // 5))]
+        days.sort()
+    logs = [
+        {"day": day.strftime("%Y-%m-%d"), "total_earnings": float(rng.integers(50, 500) * 1000), "total_trips": 10}
+        for day in days
+    ]
+    if shuffle:
+        logs = [logs[i] for i in rng.permutation(len(logs))]
+    return logs
+
+
+CASES = [
+    # (history days, gaps, duplicates, shuffle, forecast window days)
+    (0, False, False, False, 7),
+    (1, False, False, False, 7),
+    (5, False, False, False, 30),
+    (13, False, False, False, 30),
+    (14, False, False, False, 30),
+    (60, False, False, False, 90),
+    (60, True, False, False, 30),
+    (40, False, True, False, 30),
+    (40, True, True, False, 45),
+    (90, True, False, True, 365),
+]
+
+
+@pytest.mark.parametrize("n_days,gaps,duplicates,shuffle,window", CASES)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_features_match_baseline_loop(n_days, gaps, duplicates, shuffle, window, seed):
+    rng = np.random.default_rng(seed)
+    logs = random_history(rng, n_days, gaps, duplicates, shuffle)
+    # Start right after the history, or a few days later to leave a gap before the window
+    start = pd.Timestamp("2025-05-13") + pd.Timedelta(days=int(rng.integers(0, 5)))
+    end = start + pd.Timedelta(days=window - 1)
+
+    expected = baseline_features(logs, start, end, 60)
+    actual = generate_features_for_forecast(logs, start, end, 60)
+
+    pd.testing.assert_frame_equal(actual, expected, check_freq=False)
+
+
+def test_features_from_parsed_history_match():
+    logs = random_history(np.random.default_rng(3), 50, gaps=True)
+    start, end = pd.Timestamp("2025-05-13"), pd.Timestamp("2025-08-10")
+    pd.testing.assert_frame_equal(
+        features_from_history(*parse_history(logs), start, end, 40),
+        baseline_features(logs, start, end, 40),
+        check_freq=False,
+    )
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_predictions_unchanged(seed):
+    models = model_registry.snapshot()
+    logs = random_history(np.random.default_rng(seed), 60, gaps=True, duplicates=True)
+    start, end = pd.Timestamp("2025-05-13"), pd.Timestamp("2025-08-10")
+
+    expected = baseline_predict(baseline_features(logs, start, end, 60), models["earnings"], models["hours"])
+    actual = predict_forecast(generate_features_for_forecast(logs, start, end, 60), models["earnings"], models["hours"])
+
+    np.testing.assert_allclose(actual["earnings"], expected["earnings"], rtol=1e-6)
+    np.testing.assert_allclose(actual["predicted_hours_worked"], expected["predicted_hours_worked"], rtol=1e-6)
+
+
+def test_training_features_match_first_forecast_day():
+    """Each training row equals the features of forecasting that day from the driver's earlier days."""
+    rng = np.random.default_rng(4)
+    frames = []
+    for driver, (n_days, gaps) in enumerate([(30, False), (25, True), (3, False)]):
+        logs = random_history(rng, n_days, gaps=gaps)
+        frames.append(pd.DataFrame({
+            "driver_id": f"d{driver}",
+            "day": pd.to_datetime([log["day"] for log in logs]),
+            "total_earnings": [log["total_earnings"] for log in logs],
+            "wellness_score": rng.integers(1, 100, size=len(logs)),
+        }))
+    # Interleave drivers so sorting and driver boundaries are exercised
+    daily = pd.concat(frames).sample(frac=1, random_state=0)
+
+    features = training_features(daily)
+
+    for _, row in features.iterrows():
+        driver_days = daily[(daily["driver_id"] == row["driver_id"]) & (daily["day"] < row["day"])]
+        logs = [
+            {"day": day.strftime("%Y-%m-%d"), "total_earnings": earnings}
+            for day, earnings in zip(driver_days["day"], driver_days["total_earnings"])
+        ]
+        expected = baseline_features(logs, row["day"], row["day"], row["wellness_score"]).iloc[0]
+        np.testing.assert_allclose(
+            row[FEATURE_COLUMNS].to_numpy(dtype=np.float64),
+            expected[FEATURE_COLUMNS].to_numpy(dtype=np.float64),
+            rtol=1e-9, equal_nan=True, err_msg=f"{row['driver_id']} {row['day']:%Y-%m-%d}",
+        )
@@ -0,0 +1,76 @@
+"""Chatbot semantic cache: paraphrases hit, questions about something else do not."""
+import pytest
+
+from app.semantic_cache_utils import SemanticCache
+
+CACHED = [
+    "Bagaimana cara mencegah kelelahan saat berkendara?",
+    "Apa asuransi kecelakaan yang cocok untuk driver ojek?",
+    "Bagaimana kondisi lalu lintas di Jakarta hari ini?",
+    "How do I claim car insurance?",
+    "Tips for driving in heavy rain",
+]
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache()
+    for question in CACHED:
+        cache.set(question, f"answer to {question}")
+    return cache
+
+
+@pytest.mark.parametrize("question,cached", [
+    ("Gimana cara mencegah kelelahan saat berkendara", CACHED[0]),
+    ("bagaimana cara mencegah kelelahan ketika berkendara?", CACHED[0]),
+    ("Cara mencegah kelelahan saat berkendara?", CACHED[0]),
+    ("Apa asuransi kecelakaan yang cocok buat driver ojek?", CACHED[1]),
+    ("how do i claim my car insurance", CACHED[3]),
+    ("tips for driving in heavy rain?", CACHED[4]),
+])
+def test_paraphrase_hits(cache, question, cached):
+    answer, similarity = cache.get(question)
+    assert answer == f"answer to {cached}"
+    assert similarity >= cache.threshold
+
+
+@pytest.mark.parametrize("question", [
+    "How do I claim life insurance?",
+    "Tips for driving in heavy fog",
+    "Bagaimana kondisi lalu lintas di Bandung hari ini?",
+    "Bagaimana cara mencegah kecelakaan saat berkendara?",
+])
+def test_near_misses(cache, question):
+    assert cache.get(question) is None
+
+
+def test_near_miss_is_similar_but_rejected_by_terms(cache):
+    assert cache.get("How do I claim life insurance?") is None
+    assert cache.stats()["term_mismatches"] == 1
+
+    # The n-gram similarity alone would have answered it with the car insurance answer
+    cache.match_terms = False
+    assert cache.get("How do I claim life insurance?")[0] == f"answer to {CACHED[3]}"
+
+
+@pytest.mark.parametrize("question,cached", [
+    ("Tips for drivng in heavy rain", CACHED[4]),
+    ("Tips for dirving in heavy rain", CACHED[4]),
+    ("How do I claim car insurnace?", CACHED[3]),
+    ("Apa asuransi kecelakan yang cocok untuk drivr ojek?", CACHED[1]),
+])
+def test_typos_hit(cache, question, cached):
+    answer, _ = cache.get(question)
+    assert answer == f"answer to {cached}"
+    assert cache.stats()["typo_corrections"] >= 1
+
+
+@pytest.mark.parametrize("question", [
+    # Short words are never corrected
+    "Tips for driving in heavy rian",
+    # A typo does not make a different question match
+    "How do I claim life insurnace?",
+    "Tips for drivng in heavy fog",
+])
+def test_typos_do_not_change_the_topic(cache, question):
+    assert cache.get(question) is None
@@ -0,0 +1,104 @@
+"""Circuit breaker bookkeeping of structured LLM calls."""
+import json
+import threading
+import time
+
+import pytest
+
+from app import chatbot_utils
+from app.fake_llm_utils import FAKE_ANSWERS
+from app.fallback_utils import CircuitBreaker
+from app.gateway_utils import GatewayOverloaded, to_response
+from app.structured_utils import (
+    FIN_TIPS_SCHEMA,
+    StructuredOutputError,
+    StructuredSpec,
+    call_structured,
+    structured_flights,
+)
+
+ANSWER = dict(FAKE_ANSWERS)["saving_strategies"]
+
+
+def ok_response():
+    return to_response(200, {"output": {"choices": [{"message": {"content": json.dumps(ANSWER)}}]}})
+
+
+def spec(**breaker_options):
+    breaker = CircuitBreaker("fin_tips", **breaker_options)
+    return StructuredSpec("fin_tips", FIN_TIPS_SCHEMA, max_attempts=1, deadline=5, breaker=breaker)
+
+
+def messages(text="Pendapatan 6000000"):
+    return [{"role": "user", "content": text}]
+
+
+def open_breaker(breaker):
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "open"
+
+
+def test_shed_trial_is_released(monkeypatch):
+    fin_tips = spec(failure_threshold=1, reset_timeout=0)
+    open_breaker(fin_tips.breaker)
+
+    def shed(*args, **kwargs):
+        raise GatewayOverloaded("fin_tips", 1)
+
+    monkeypatch.setattr(chatbot_utils, "call_qwen", shed)
+    with pytest.raises(GatewayOverloaded):
+        call_structured(fin_tips, messages())
+    assert fin_tips.breaker.stats()["state"] == "half_open"
+
+    # The next call is the trial again instead of short-circuiting forever
+    monkeypatch.setattr(chatbot_utils, "call_qwen", lambda *args, **kwargs: ok_response())
+    assert call_structured(fin_tips, messages()) == ANSWER
+    assert fin_tips.breaker.stats()["state"] == "closed"
+
+
+def test_release_trial_only_by_its_thread():
+    breaker = CircuitBreaker("fin_tips", failure_threshold=1, reset_timeout=0)
+    open_breaker(breaker)
+    assert breaker.allow()
+
+    thread = threading.Thread(target=breaker.release_trial)
+    thread.start()
+    thread.join()
+    assert not breaker.allow()
+
+    breaker.release_trial()
+    assert breaker.allow()
+
+
+def test_coalesced_followers_do_not_count_failures(monkeypatch):
+    fin_tips = spec(failure_threshold=3)
+    release = threading.Event()
+
+    def failing(*args, **kwargs):
+        release.wait(5)
+        raise RuntimeError("LLM call failed: InternalError")
+
+    monkeypatch.setattr(chatbot_utils, "call_qwen", failing)
+    errors = []
+
+    def ask():
+        try:
+            call_structured(fin_tips, messages("coalesced"))
+        except StructuredOutputError as e:
+            errors.append(e)
+
+    followers_before = structured_flights.stats()["followers"]
+    threads = [threading.Thread(target=ask) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while structured_flights.stats()["followers"] - followers_before < 4 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 5
+    assert fin_tips.breaker.stats() == {
+        "state": "closed", "consecutive_failures": 1, "opens": 0, "short_circuits": 0,
+    }
@@ -0,0 +1,42 @@
+"""Wellness inputs are 1-10 self-ratings: the routes reject anything else."""
+import pytest
+
+import app as app_module
+from app.fallback_utils import WELLNESS_SCALE, wellness_fallback
+
+from test_dashboard import dashboard_body
+
+LEVELS = {"energy_level": 6, "stress_level": 4, "sleep_quality": 5, "physical_condition": 7}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return app_module.create_app().test_client()
+
+
+@pytest.mark.parametrize("field", sorted(LEVELS))
+@pytest.mark.parametrize("value", [0, 11, -3, 100])
+def test_out_of_scale_is_rejected(client, field, value):
+    response = client.post("/llm/wellness", json=dict(LEVELS, **{field: value}))
+    assert response.status_code == 400
+    assert field in response.get_json()["error"]
+
+    response = client.post("/dashboard", json=dict(dashboard_body(6_000_000), **{field: value}))
+    assert response.status_code == 400
+    assert field in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("body", [{}, dict(LEVELS, energy_level=None), dict(LEVELS, sleep_quality="good")])
+def test_missing_or_non_numeric_is_rejected(client, body):
+    assert client.post("/llm/wellness", json=body).status_code == 400
+
+
+@pytest.mark.parametrize("value", WELLNESS_SCALE)
+def test_scale_bounds_are_accepted(client, value):
+    assert client.post("/llm/wellness", json=dict(LEVELS, energy_level=value)).status_code == 200
+
+
+def test_fallback_score_spans_the_scale():
+    low, high = WELLNESS_SCALE
+    assert wellness_fallback(low, high, low, low)["wellness_score"] == 0
+    assert wellness_fallback(high, low, high, high)["wellness_score"] == 100
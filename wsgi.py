@@ -1,3 +1,4 @@
+import gc
 import os
 import sys
 
@@ -9,7 +10,14 @@ load_dotenv()
 
 from app import create_app
 
+# Loads and warms the models and imports the LLM clients (see app.warm_up); with
+# `gunicorn --preload` this runs in the master, so workers fork ready to serve.
 app = create_app()
 
+# With `gunicorn --preload` this runs in the master before forking. Freezing the
+# loaded objects keeps the GC from touching their pages, so forked workers share
+# the model memory copy-on-write instead of each growing its own copy.
+gc.freeze()
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file